@@ -0,0 +1,34 @@
+# analytics/admin.py
+from django.contrib import admin
+from .models import DailyCategorySales, DailyProductSales, DailySales
+
+class RollupAdmin(admin.ModelAdmin):
+    date_hierarchy = 'date'
+    
+    # Rollups are maintained by analytics.rollups; rebuild them with the
+    # backfill_sales_rollups command rather than editing rows
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(DailySales)
+class DailySalesAdmin(RollupAdmin):
+    list_display = ['date', 'units', 'revenue', 'order_count']
+    ordering = ['-date']
+
+@admin.register(DailyCategorySales)
+class DailyCategorySalesAdmin(RollupAdmin):
+    list_display = ['date', 'category', 'units', 'revenue', 'order_count']
+    list_filter = ['category']
+    ordering = ['-date', 'category']
+
+@admin.register(DailyProductSales)
+class DailyProductSalesAdmin(RollupAdmin):
+    # product_id, since the product may have been deleted since
+    list_display = ['date', 'product_id', 'units', 'revenue', 'order_count']
+    ordering = ['-date', '-revenue']
@@ -0,0 +1,38 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from django.utils import timezone
+from analytics.rollups import rebuild_rollups
+from orders.models import OrderHistory
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily sales rollups from order history, a chunk of days at a time."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, help="First date (YYYY-MM-DD). Defaults to the first order.")
+        parser.add_argument('--end', type=date.fromisoformat, help="Last date (YYYY-MM-DD). Defaults to today.")
+        parser.add_argument(
+            '--chunk-days', type=int, default=31,
+            help="Days rebuilt per transaction; checkouts wait on each chunk."
+        )
+
+    def handle(self, **options):
+        bounds = OrderHistory.objects.aggregate(first=Min('created_at'), last=Max('created_at'))
+        if bounds['first'] is None and options['start'] is None:
+            self.stdout.write("No orders to roll up")
+            return
+        start = options['start'] or timezone.localdate(bounds['first'])
+        end = options['end'] or timezone.localdate()
+        if start > end:
+            raise CommandError("--start is after --end")
+
+        chunk = timedelta(days=options['chunk_days'])
+        day = start
+        while day <= end:
+            last = min(day + chunk - timedelta(days=1), end)
+            rebuild_rollups(day, last)
+            self.stdout.write(f"Rebuilt {day} to {last}")
+            day = last + timedelta(days=1)
+        self.stdout.write(self.style.SUCCESS(f"Rolled up sales from {start} to {end}"))
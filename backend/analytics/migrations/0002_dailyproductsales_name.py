@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:23
+
+from django.db import migrations, models
+
+# Existing rollup rows take the name from their product's latest order line
+BACKFILL_NAMES = """
+    UPDATE analytics_dailyproductsales s SET name = i.product_name
+    FROM (
+        SELECT DISTINCT ON (product_id) product_id, product_name
+        FROM orders_orderhistoryitem
+        ORDER BY product_id, order_id DESC
+    ) i
+    WHERE i.product_id = s.product_id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+        ('orders', '0005_order_line_product_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailyproductsales',
+            name='name',
+            field=models.CharField(default='', max_length=200),
+        ),
+        migrations.RunSQL(BACKFILL_NAMES, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,57 @@
+from django.db import models
+from store.models import Product
+
+# Daily sales rollups, maintained by analytics.rollups as orders move in
+# and out of the paid statuses. Dashboards read these instead of order lines.
+
+
+class DailySales(models.Model):
+    date = models.DateField(unique=True)
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    order_count = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['date']
+        verbose_name_plural = 'daily sales'
+
+    def __str__(self):
+        return f"{self.date}: {self.revenue}"
+
+class DailyCategorySales(models.Model):
+    date = models.DateField()
+    category = models.CharField(max_length=100)
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    order_count = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['date', 'category']
+        unique_together = ['date', 'category']
+        verbose_name_plural = 'daily category sales'
+
+    def __str__(self):
+        return f"{self.date} {self.category}: {self.revenue}"
+
+class DailyProductSales(models.Model):
+    date = models.DateField()
+    # No database constraint, so sales history outlives deleted products
+    product = models.ForeignKey(
+        Product, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+'
+    )
+    # The product's name on its latest order line counted here
+    name = models.CharField(max_length=200, default='')
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    order_count = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['date', 'product']
+        unique_together = ['date', 'product']
+        indexes = [
+            models.Index(fields=['product', 'date']),
+        ]
+        verbose_name_plural = 'daily product sales'
+
+    def __str__(self):
+        return f"{self.date} #{self.product_id}: {self.revenue}"
@@ -0,0 +1,108 @@
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+# Orders in these statuses have been paid for and count as sales
+COUNTED_STATUSES = ('processing', 'shipped', 'delivered')
+
+# (table, grouping columns, their expressions over the order lines,
+# snapshot columns and theirs). Snapshot columns take the order lines'
+# values from the latest order counted, so a rollup row still has a name
+# after its product is deleted or renamed.
+ROLLUPS = [
+    ('analytics_dailyproductsales', ['product_id'], ['i.product_id'], ['name'], ['i.product_name']),
+    ('analytics_dailycategorysales', ['category'], ['i.product_category'], [], []),
+    ('analytics_dailysales', [], [], [], []),
+]
+
+# The live order tables, and views adding the archived orders to them
+# (orders/migrations/0004). Orders are archived long after they're counted.
+LIVE_TABLES = ('orders_order', 'orders_orderitem')
+HISTORY_TABLES = ('orders_orderhistory', 'orders_orderhistoryitem')
+
+ROLLUP_SQL = """
+    INSERT INTO {table} (date, {columns}units, revenue, order_count)
+    SELECT
+        (o.created_at AT TIME ZONE %(tz)s)::date,
+        {expressions}%(sign)s * SUM(i.quantity),
+        %(sign)s * SUM(i.quantity * i.unit_price),
+        %(sign)s * COUNT(DISTINCT o.id)
+    FROM {items} i
+    JOIN {orders} o ON o.id = i.order_id
+    WHERE {where}
+    GROUP BY {group}
+    ORDER BY {group}
+    ON CONFLICT (date{conflict}) DO UPDATE SET
+        {snapshots}units = {table}.units + EXCLUDED.units,
+        revenue = {table}.revenue + EXCLUDED.revenue,
+        order_count = {table}.order_count + EXCLUDED.order_count
+"""
+
+
+def add_orders(where, params, sign=1, tables=LIVE_TABLES):
+    """
+    Add (sign=1) or subtract (sign=-1) the order lines in ``tables``
+    matching ``where`` to every rollup, one upsert per table. Rows are
+    written in key order so concurrent checkouts touching the same days
+    queue, not deadlock.
+    """
+    params = {**params, 'tz': settings.TIME_ZONE, 'sign': sign}
+    orders, items = tables
+    with connection.cursor() as cursor:
+        for table, columns, expressions, snapshots, snapshot_expressions in ROLLUPS:
+            cursor.execute(ROLLUP_SQL.format(
+                table=table,
+                orders=orders,
+                items=items,
+                columns=''.join(f'{column}, ' for column in [*columns, *snapshots]),
+                expressions=''.join(f'{expression}, ' for expression in expressions) + ''.join(
+                    f'(ARRAY_AGG({expression} ORDER BY o.id DESC))[1], '
+                    for expression in snapshot_expressions
+                ),
+                where=where,
+                group=', '.join(['1'] + [str(n) for n in range(2, len(columns) + 2)]),
+                conflict=''.join(f', {column}' for column in columns),
+                # Backing an order out keeps the current snapshot
+                snapshots=''.join(
+                    f'{column} = CASE WHEN %(sign)s > 0 THEN EXCLUDED.{column} ELSE {table}.{column} END, '
+                    for column in snapshots
+                ),
+            ), params)
+
+
+def record_order(order_id, sign):
+    """Count (1) or back out (-1) one order's lines in the rollups"""
+    add_orders('o.id = %(order_id)s', {'order_id': order_id}, sign)
+
+
+def day_bounds(start, end):
+    """Aware datetimes covering the local dates start..end inclusive"""
+    tz = timezone.get_default_timezone()
+    return (
+        timezone.make_aware(datetime.combine(start, time.min), tz),
+        timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min), tz),
+    )
+
+
+def rebuild_rollups(start, end):
+    """
+    Recompute the rollups for the dates start..end (inclusive) from the
+    order lines, archived ones included. The rollup tables are locked
+    against concurrent updates while this runs, so checkouts confirmed
+    meanwhile wait and then apply on top of the rebuilt rows.
+    """
+    low, high = day_bounds(start, end)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            'LOCK TABLE analytics_dailyproductsales, analytics_dailycategorysales, '
+            'analytics_dailysales IN SHARE ROW EXCLUSIVE MODE'
+        )
+        for table, *_ in ROLLUPS:
+            cursor.execute(f'DELETE FROM {table} WHERE date BETWEEN %s AND %s', [start, end])
+        add_orders(
+            'o.status = ANY(%(statuses)s) AND o.created_at >= %(low)s AND o.created_at < %(high)s',
+            {'statuses': list(COUNTED_STATUSES), 'low': low, 'high': high},
+            tables=HISTORY_TABLES,
+        )
@@ -0,0 +1,17 @@
+from rest_framework import serializers
+
+class SalesSerializer(serializers.Serializer):
+    units = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
+    order_count = serializers.IntegerField()
+
+class DailySalesSerializer(SalesSerializer):
+    date = serializers.DateField()
+
+class CategorySalesSerializer(SalesSerializer):
+    date = serializers.DateField(required=False)
+    category = serializers.CharField()
+
+class ProductSalesSerializer(SalesSerializer):
+    product_id = serializers.IntegerField()
+    name = serializers.CharField(allow_null=True)
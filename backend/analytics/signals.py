@@ -0,0 +1,39 @@
+from django.db.models.signals import post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from orders.models import Order
+from .rollups import COUNTED_STATUSES, record_order
+
+
+@receiver(pre_save, sender=Order)
+def remember_previous_status(sender, instance, update_fields=None, **kwargs):
+    if instance._state.adding:
+        instance._previous_status = None
+    elif update_fields is not None and 'status' not in update_fields:
+        instance._previous_status = instance.status
+    elif getattr(instance, '_loaded_status', None) is not None:
+        instance._previous_status = instance._loaded_status
+    else:
+        # Built by hand or loaded without its status; ask the database
+        instance._previous_status = (
+            Order.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Order)
+def update_rollups(sender, instance, created, **kwargs):
+    was_counted = instance._previous_status in COUNTED_STATUSES
+    is_counted = instance.status in COUNTED_STATUSES
+    # Runs in the saving transaction, so the rollups move with the status
+    if is_counted and not was_counted:
+        record_order(instance.pk, 1)
+    elif was_counted and not is_counted:
+        record_order(instance.pk, -1)
+    instance._loaded_status = instance.status
+
+
+@receiver(pre_delete, sender=Order)
+def back_out_deleted_order(sender, instance, **kwargs):
+    # The lines are still there before the delete cascades
+    status = getattr(instance, '_loaded_status', None) or instance.status
+    if status in COUNTED_STATUSES:
+        record_order(instance.pk, -1)
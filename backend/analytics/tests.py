@@ -0,0 +1,185 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.factories import make_order, make_product
+from orders.models import Order, OrderItem
+from .models import DailyCategorySales, DailyProductSales, DailySales
+
+
+def rollups():
+    return {
+        'daily': list(DailySales.objects.values_list('units', 'revenue', 'order_count')),
+        'categories': sorted(DailyCategorySales.objects.values_list('category', 'units', 'revenue', 'order_count')),
+        'products': sorted(DailyProductSales.objects.values_list('name', 'units', 'revenue', 'order_count')),
+    }
+
+
+class SalesRollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', password='secret-pass-123')
+        self.lamp = make_product(name='Lamp', category='Home', price=Decimal('20.00'))
+        self.rug = make_product(name='Rug', category='Home', price=Decimal('50.00'))
+        self.mug = make_product(name='Mug', category='Kitchen', price=Decimal('8.00'))
+
+    def pay(self, order):
+        order.status = 'processing'
+        order.save(update_fields=['status', 'updated_at'])
+
+    def test_paid_orders_are_counted_once(self):
+        first = make_order(self.user, [(self.lamp, 2), (self.mug, 1)])
+        second = make_order(self.user, [(self.lamp, 1), (self.rug, 1)])
+        self.assertEqual(rollups()['daily'], [])
+
+        self.pay(first)
+        self.pay(second)
+        second.status = 'shipped'
+        second.save()
+
+        self.assertEqual(rollups(), {
+            'daily': [(5, Decimal('118.00'), 2)],
+            'categories': [('Home', 4, Decimal('110.00'), 2), ('Kitchen', 1, Decimal('8.00'), 1)],
+            'products': [
+                ('Lamp', 3, Decimal('60.00'), 2),
+                ('Mug', 1, Decimal('8.00'), 1),
+                ('Rug', 1, Decimal('50.00'), 1),
+            ],
+        })
+
+    def test_cancelled_and_deleted_orders_are_backed_out(self):
+        first = make_order(self.user, [(self.lamp, 2), (self.mug, 1)])
+        second = make_order(self.user, [(self.rug, 1)])
+        self.pay(first)
+        self.pay(second)
+
+        # As the admin's list_editable would: a fresh instance from the database
+        cancelled = Order.objects.get(pk=first.pk)
+        cancelled.status = 'cancelled'
+        cancelled.save()
+        Order.objects.filter(pk=second.pk).delete()
+
+        self.assertEqual(rollups()['daily'], [(0, Decimal('0.00'), 0)])
+        self.assertEqual(
+            {row[0]: row[1:] for row in rollups()['categories']},
+            {'Home': (0, Decimal('0.00'), 0), 'Kitchen': (0, Decimal('0.00'), 0)},
+        )
+
+        # Reinstating a cancelled order counts it again
+        cancelled.status = 'delivered'
+        cancelled.save()
+        self.assertEqual(rollups()['daily'], [(3, Decimal('48.00'), 1)])
+
+    def test_checkout_updates_rollups(self):
+        from orders import checkout
+        from store.models import CartItem
+
+        CartItem.objects.create(user=self.user, product=self.rug, quantity=2)
+        order = checkout.reserve_order(self.user, '1 Main St')
+        self.assertEqual(rollups()['daily'], [])
+        checkout.confirm_order(order, 'pi_test')
+        self.assertEqual(rollups()['daily'], [(2, Decimal('100.00'), 1)])
+
+    def test_backfill_matches_incremental_rollups(self):
+        first = make_order(self.user, [(self.lamp, 2), (self.mug, 1)])
+        second = make_order(self.user, [(self.rug, 3)])
+        make_order(self.user, [(self.mug, 4)])
+        self.pay(first)
+        self.pay(second)
+        second.status = 'cancelled'
+        second.save()
+        # Yesterday's orders were written in bulk, without signals
+        old = Order.objects.bulk_create([Order(
+            user=self.user, total_amount=Decimal('20.00'), shipping_address='x', status='delivered',
+        )])[0]
+        OrderItem.for_product(self.lamp, order=old, quantity=1, unit_price=Decimal('20.00')).save()
+        Order.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=1))
+
+        expected_today = rollups()
+        call_command('backfill_sales_rollups', stdout=StringIO())
+        self.assertEqual(DailySales.objects.count(), 2)
+        today = DailySales.objects.get(date=timezone.localdate())
+        self.assertEqual((today.units, today.revenue, today.order_count), (3, Decimal('48.00'), 1))
+        self.assertEqual(
+            DailySales.objects.get(date=timezone.localdate() - timedelta(days=1)).revenue,
+            Decimal('20.00'),
+        )
+        self.assertEqual(
+            sorted(DailyCategorySales.objects.filter(date=today.date).values_list('category', 'units', 'revenue', 'order_count')),
+            [row for row in expected_today['categories'] if row[1]],
+        )
+
+
+class AnalyticsApiTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff = User.objects.create_user(username='ops', password='secret-pass-123', is_staff=True)
+        buyer = User.objects.create_user(username='buyer', password='secret-pass-123')
+        lamp = make_product(name='Lamp', category='Home', price=Decimal('20.00'))
+        mug = make_product(name='Mug', category='Kitchen', price=Decimal('8.00'))
+        for lines in ([(lamp, 2)], [(lamp, 1), (mug, 3)]):
+            order = make_order(buyer, lines)
+            order.status = 'processing'
+            order.save()
+        self.buyer = buyer
+        self.lamp = lamp
+
+    def test_requires_staff(self):
+        self.client.force_authenticate(self.buyer)
+        self.assertEqual(self.client.get(reverse('daily-sales')).status_code, 403)
+
+    def test_reports_read_only_the_rollups(self):
+        self.client.force_authenticate(self.staff)
+        today = timezone.localdate().isoformat()
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('daily-sales'))
+        self.assertEqual(response.data['results'], [
+            {'units': 6, 'revenue': '84.00', 'order_count': 2, 'date': today}
+        ])
+
+        response = self.client.get(reverse('category-sales'))
+        self.assertEqual(
+            [(row['category'], row['revenue'], row['order_count']) for row in response.data['results']],
+            [('Home', '60.00', 2), ('Kitchen', '24.00', 1)],
+        )
+        response = self.client.get(reverse('category-sales'), {'by': 'day'})
+        self.assertEqual(response.data['results'][0]['date'], today)
+
+        response = self.client.get(reverse('product-sales'), {'limit': 1})
+        self.assertEqual(
+            [(row['name'], row['units'], row['revenue']) for row in response.data['results']],
+            [('Lamp', 3, '60.00')],
+        )
+
+    def test_sold_products_keep_their_names_once_deleted(self):
+        self.client.force_authenticate(self.staff)
+        self.lamp.delete()
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('product-sales'))
+        self.assertEqual(
+            [(row['name'], row['revenue']) for row in response.data['results']],
+            [('Lamp', '60.00'), ('Mug', '24.00')],
+        )
+
+    def test_validates_the_date_range(self):
+        self.client.force_authenticate(self.staff)
+        response = self.client.get(reverse('daily-sales'), {'start': '2026-02-01', 'end': '2026-01-01'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'start is after end')
+        self.assertEqual(self.client.get(reverse('daily-sales'), {'start': 'yesterday'}).status_code, 400)
+        response = self.client.get(reverse('daily-sales'), {'start': '2020-01-01', 'end': '2026-01-01'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_validates_the_product_limit(self):
+        self.client.force_authenticate(self.staff)
+        for limit in ('-1', '0', 'ten'):
+            response = self.client.get(reverse('product-sales'), {'limit': limit})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.data['error'], 'limit must be a positive integer')
@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('sales/daily/', views.daily_sales, name='daily-sales'),
+    path('sales/categories/', views.category_sales, name='category-sales'),
+    path('sales/products/', views.product_sales, name='product-sales'),
+]
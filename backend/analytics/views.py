@@ -0,0 +1,109 @@
+from datetime import date, timedelta
+
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from django.db.models import Sum
+from django.utils import timezone
+from .models import DailyCategorySales, DailyProductSales, DailySales
+from .serializers import CategorySalesSerializer, DailySalesSerializer, ProductSalesSerializer
+
+MAX_RANGE_DAYS = 366
+
+def date_range(query_params, max_days=MAX_RANGE_DAYS):
+    """(start, end) from ?start=&end= (YYYY-MM-DD); the last 30 days by default"""
+    end = query_params.get('end')
+    end = date.fromisoformat(end) if end else timezone.localdate()
+    start = query_params.get('start')
+    start = date.fromisoformat(start) if start else end - timedelta(days=29)
+    if start > end:
+        raise ValueError('start is after end')
+    if max_days is not None and (end - start).days >= max_days:
+        raise ValueError(f'Date range is limited to {max_days} days')
+    return start, end
+
+def totals():
+    return {'units': Sum('units'), 'revenue': Sum('revenue'), 'order_count': Sum('order_count')}
+
+def invalid_range(error):
+    return Response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def daily_sales(request):
+    """Units, revenue and orders per day"""
+    try:
+        start, end = date_range(request.query_params)
+    except ValueError as e:
+        return invalid_range(e)
+    
+    rows = DailySales.objects.filter(date__range=(start, end)).values(
+        'date', 'units', 'revenue', 'order_count'
+    )
+    return Response({
+        'start': start,
+        'end': end,
+        'results': DailySalesSerializer(rows, many=True).data,
+    })
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def category_sales(request):
+    """Sales per category over the range, or per category and day with ?by=day"""
+    try:
+        start, end = date_range(request.query_params)
+    except ValueError as e:
+        return invalid_range(e)
+    
+    rows = DailyCategorySales.objects.filter(date__range=(start, end))
+    if request.query_params.get('by') == 'day':
+        rows = rows.values('date', 'category', 'units', 'revenue', 'order_count')
+    else:
+        # order_count sums per-day counts, which is exact: an order has one date
+        rows = rows.values('category').annotate(**totals()).order_by('-revenue', 'category')
+    return Response({
+        'start': start,
+        'end': end,
+        'results': CategorySalesSerializer(rows, many=True).data,
+    })
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def product_sales(request):
+    """Best-selling products by revenue over the range"""
+    try:
+        start, end = date_range(request.query_params)
+    except ValueError as e:
+        return invalid_range(e)
+    try:
+        limit = int(request.query_params.get('limit', 20))
+    except ValueError:
+        limit = 0
+    if limit < 1:
+        return Response({'error': 'limit must be a positive integer'}, status=status.HTTP_400_BAD_REQUEST)
+    limit = min(limit, 100)
+    
+    rows = list(
+        DailyProductSales.objects
+        .filter(date__range=(start, end))
+        .values('product_id')
+        .annotate(**totals())
+        .order_by('-revenue', 'product_id')[:limit]
+    )
+    # The name each product was last sold under in the range, which
+    # outlives the product itself
+    names = dict(
+        DailyProductSales.objects
+        .filter(date__range=(start, end), product_id__in=[row['product_id'] for row in rows])
+        .order_by('product_id', '-date')
+        .distinct('product_id')
+        .values_list('product_id', 'name')
+    )
+    for row in rows:
+        row['name'] = names.get(row['product_id'])
+    return Response({
+        'start': start,
+        'end': end,
+        'results': ProductSalesSerializer(rows, many=True).data,
+    })
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+# Serve the async catalog and checkout views (see ASYNC_VIEWS in settings)
+os.environ.setdefault('ASYNC_VIEWS', 'True')
 
 application = get_asgi_application()
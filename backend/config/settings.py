@@ -2,6 +2,7 @@ import os
 from pathlib import Path  # This import was missing!
 from decouple import config
 from datetime import timedelta
+from corsheaders.defaults import default_headers
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -16,16 +17,23 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework_simplejwt',
     'corsheaders',
+    'core',
     'store',
     'orders',
     'users',
+    'analytics',
 ]
 
 MIDDLEWARE = [
+    # Outermost, so its timings cover the whole stack
+    'core.middleware.InstrumentationMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    # After CORS, so browsers can read its 503s
+    'core.middleware.AdmissionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -33,6 +41,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.ReplicaPinMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -55,6 +64,10 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'config.wsgi.application'
 
+# Route the catalog reads and checkout to their async views. config/asgi.py
+# turns this on; under WSGI they would only add an event loop per request.
+ASYNC_VIEWS = config('ASYNC_VIEWS', default=False, cast=bool)
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -66,6 +79,52 @@ DATABASES = {
     }
 }
 
+# Read replicas for the catalog and order history (core/replicas.py), as
+# comma-separated host[:port] entries. They use the primary's database and
+# credentials; DB_REPLICA_NAME points them at another database instead.
+DB_REPLICAS = config('DB_REPLICAS', default='', cast=lambda v: [s.strip() for s in v.split(',') if s.strip()])
+for index, replica in enumerate(DB_REPLICAS, start=1):
+    host, _, port = replica.partition(':')
+    DATABASES[f'replica{index}'] = {
+        **DATABASES['default'],
+        'NAME': config('DB_REPLICA_NAME', default=DATABASES['default']['NAME']),
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'OPTIONS': {'connect_timeout': config('DB_REPLICA_CONNECT_TIMEOUT', default=2, cast=int)},
+        # Tests run the replica's queries against the test database
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+# Seconds a user reads from the primary after a write
+DB_REPLICA_PIN_SECONDS = config('DB_REPLICA_PIN_SECONDS', default=10, cast=int)
+# Replicas further behind than this (seconds) are skipped
+DB_REPLICA_MAX_LAG = config('DB_REPLICA_MAX_LAG', default=5, cast=float)
+DB_REPLICA_CHECK_INTERVAL = config('DB_REPLICA_CHECK_INTERVAL', default=5, cast=float)
+
+# Cache: a shared Redis in production so every process sees the same
+# catalog version; per-process memory otherwise
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Catalog response cache (store/cache.py)
+CATALOG_CACHE_TIMEOUT = config('CATALOG_CACHE_TIMEOUT', default=300, cast=int)
+CATALOG_CACHE_LOCK_TIMEOUT = config('CATALOG_CACHE_LOCK_TIMEOUT', default=5, cast=int)
+
+# Cart reservations hold stock for this long after the last cart change
+CART_RESERVATION_TTL = config('CART_RESERVATION_TTL', default=900, cast=int)
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -91,13 +150,60 @@ USE_TZ = True
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.ClaimsJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 12
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.HybridPagination',
+    'PAGE_SIZE': 12,
+    'DEFAULT_THROTTLE_CLASSES': [
+        'core.throttling.AnonBucketThrottle',
+        'core.throttling.UserBucketThrottle',
+    ],
+    # Token buckets in the shared cache (core/throttling.py): 'N/period'
+    # allows bursts of N and refills evenly over the period
+    'DEFAULT_THROTTLE_RATES': {
+        'anon': config('THROTTLE_ANON_RATE', default='600/min'),
+        'user': config('THROTTLE_USER_RATE', default='1200/min'),
+        'search': config('THROTTLE_SEARCH_RATE', default='60/min'),
+        'login': config('THROTTLE_LOGIN_RATE', default='20/min'),
+        'register': config('THROTTLE_REGISTER_RATE', default='10/hour'),
+    } if config('THROTTLE_ENABLED', default=True, cast=bool) else {},
+    # Proxies in front of the app that append to X-Forwarded-For; with none,
+    # clients are identified by REMOTE_ADDR so they can't spoof the header
+    'NUM_PROXIES': config('NUM_PROXIES', default=0, cast=int),
+}
+
+# Threads per WSGI worker process (gunicorn --threads)
+WSGI_THREADS = config('WSGI_THREADS', default=8, cast=int)
+
+# Admission control (core.middleware.AdmissionMiddleware): once a process
+# has ADMISSION_MAX_IN_FLIGHT * share requests in flight, it turns away
+# new low- then normal-priority requests with a 503. 0 turns it off. A WSGI
+# worker never has more requests in flight than threads, so that's its limit.
+ADMISSION_MAX_IN_FLIGHT = config(
+    'ADMISSION_MAX_IN_FLIGHT', default=64 if ASYNC_VIEWS else WSGI_THREADS, cast=int
+)
+ADMISSION_LOW_SHARE = config('ADMISSION_LOW_SHARE', default=0.5, cast=float)
+ADMISSION_NORMAL_SHARE = config('ADMISSION_NORMAL_SHARE', default=0.8, cast=float)
+ADMISSION_RETRY_AFTER = config('ADMISSION_RETRY_AFTER', default=1, cast=int)
+# URL names by priority; unlisted routes are 'normal'
+ADMISSION_PRIORITIES = {
+    'product-list': 'low',
+    'product-detail': 'low',
+    'product-facets': 'low',
+    'order-export': 'low',
+    'create-order': 'critical',
+    'cart-list': 'critical',
+    'add-to-cart': 'critical',
+    'batch-update-cart': 'critical',
+    'update-cart-item': 'critical',
+    'remove-from-cart': 'critical',
 }
 
 # JWT Configuration
@@ -105,13 +211,22 @@ SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
+    # Access tokens carry the user's profile, so requests don't query auth_user
+    'TOKEN_OBTAIN_SERIALIZER': 'users.authentication.ClaimsTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'users.authentication.ClaimsTokenRefreshSerializer',
+    'TOKEN_USER_CLASS': 'users.authentication.ClaimsUser',
 }
 
+# How long get_cached_user() keeps a User (saves and deletes clear it)
+USER_CACHE_TIMEOUT = config('USER_CACHE_TIMEOUT', default=60, cast=int)
+
 # CORS Configuration
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
     "http://127.0.0.1:3000",
 ]
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+CORS_EXPOSE_HEADERS = ['Idempotent-Replayed', 'Retry-After']
 
 # Static files
 STATIC_URL = '/static/'
@@ -121,16 +236,57 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 # Email Configuration (SendGrid)
-EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'  # For development
+EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.console.EmailBackend')  # Console for development
 SENDGRID_API_KEY = config('SENDGRID_API_KEY', default='')
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='noreply@ecommerce.com')
 
 # Stripe Configuration
 STRIPE_PUBLISHABLE_KEY = config('STRIPE_PUBLISHABLE_KEY', default='')
 STRIPE_SECRET_KEY = config('STRIPE_SECRET_KEY', default='')
+# Point at a local stub (manage.py stripe_stub) to run checkout offline
+STRIPE_API_BASE = config('STRIPE_API_BASE', default='https://api.stripe.com')
+# Used by the async checkout's HTTP client (orders/payments.py)
+STRIPE_TIMEOUT = config('STRIPE_TIMEOUT', default=30, cast=float)
+STRIPE_CONNECT_TIMEOUT = config('STRIPE_CONNECT_TIMEOUT', default=5, cast=float)
+# Orders still pending after this long were abandoned mid-checkout and are
+# confirmed or released by resolve_pending_orders; well past STRIPE_TIMEOUT
+PENDING_ORDER_TIMEOUT = config('PENDING_ORDER_TIMEOUT', default=900, cast=int)
 
 # Slack Configuration
 SLACK_BOT_TOKEN = config('SLACK_BOT_TOKEN', default='')
 SLACK_CHANNEL_ID = config('SLACK_CHANNEL_ID', default='')
+# Point at a local stub to exercise notifications without Slack
+SLACK_API_URL = config('SLACK_API_URL', default='https://slack.com/api/chat.postMessage')
+SLACK_TIMEOUT = config('SLACK_TIMEOUT', default=10, cast=float)
+
+# Idempotency-Key handling for checkout and the cart (core.idempotency). Keys
+# live in the default cache, so use Redis when running several processes.
+IDEMPOTENCY_TTL = config('IDEMPOTENCY_TTL', default=86400, cast=int)
+# How long a key stays claimed by a request that never finishes; longer than
+# the slowest checkout, Stripe timeouts included
+IDEMPOTENCY_LOCK_SECONDS = config('IDEMPOTENCY_LOCK_SECONDS', default=120, cast=int)
+# How long a duplicate waits for the first request before answering 409
+IDEMPOTENCY_WAIT_SECONDS = config('IDEMPOTENCY_WAIT_SECONDS', default=10, cast=float)
+IDEMPOTENCY_RETRY_AFTER = config('IDEMPOTENCY_RETRY_AFTER', default=2, cast=int)
+
+# Outbox worker (manage.py process_outbox)
+OUTBOX_BATCH_SIZE = config('OUTBOX_BATCH_SIZE', default=50, cast=int)
+OUTBOX_CONCURRENCY = config('OUTBOX_CONCURRENCY', default=4, cast=int)
+OUTBOX_MAX_ATTEMPTS = config('OUTBOX_MAX_ATTEMPTS', default=8, cast=int)
+OUTBOX_RETRY_BASE_SECONDS = config('OUTBOX_RETRY_BASE_SECONDS', default=30, cast=int)
+OUTBOX_RETRY_MAX_SECONDS = config('OUTBOX_RETRY_MAX_SECONDS', default=3600, cast=int)
+# How long a claimed message stays invisible to other workers
+OUTBOX_LEASE_SECONDS = config('OUTBOX_LEASE_SECONDS', default=300, cast=int)
+
+# Admin changelists estimate their row count from Postgres statistics instead of
+# running COUNT(*) once the estimate reaches this many rows
+ADMIN_ESTIMATED_COUNT_THRESHOLD = config('ADMIN_ESTIMATED_COUNT_THRESHOLD', default=10000, cast=int)
+
+# Request metrics (core.middleware.InstrumentationMiddleware, served at /metrics)
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+# Bearer token Prometheus must send; without one /metrics only works with DEBUG
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+# Log a possible N+1 when one query shape runs this many times in a request
+METRICS_N_PLUS_ONE_THRESHOLD = config('METRICS_N_PLUS_ONE_THRESHOLD', default=5, cast=int)
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file
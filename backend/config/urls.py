@@ -1,5 +1,8 @@
 from django.contrib import admin
 from django.urls import path, include
+from core.throttling import AnonBucketThrottle
+from core.views import metrics
+from users.views import LoginThrottle
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
@@ -7,10 +10,16 @@ from rest_framework_simplejwt.views import (
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path(
+        'api/token/',
+        TokenObtainPairView.as_view(throttle_classes=[AnonBucketThrottle, LoginThrottle]),
+        name='token_obtain_pair'
+    ),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('api/products/', include('store.urls')),
     path('api/cart/', include('store.cart_urls')),
     path('api/orders/', include('orders.urls')),
     path('api/auth/', include('users.urls')),
+    path('api/analytics/', include('analytics.urls')),
+    path('metrics', metrics, name='metrics'),
 ]
\ No newline at end of file
@@ -0,0 +1,62 @@
+# core/admin.py
+from django.conf import settings
+from django.contrib import admin
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+from django.utils.translation import gettext as _
+from .pagination import estimate_count
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that takes the planner's row estimate instead of running
+    COUNT(*) once a result set is estimated at ADMIN_ESTIMATED_COUNT_THRESHOLD
+    rows or more. Page links past the real end just come back empty, and
+    pages past an estimate that fell short still load, raising the count to
+    cover the rows found.
+    """
+
+    @cached_property
+    def estimate(self):
+        """The planner's row estimate when it's large enough to use, else None"""
+        if isinstance(self.object_list, QuerySet):
+            estimate = estimate_count(self.object_list)
+            if estimate >= settings.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return None
+
+    @cached_property
+    def count(self):
+        return self.estimate if self.estimate is not None else super().count
+
+    def validate_number(self, number):
+        if self.estimate is None:
+            return super().validate_number(number)
+        # Any page past the estimate may still have rows
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(_('That page number is not an integer'))
+        if number < 1:
+            raise EmptyPage(_('That page number is less than 1'))
+        return number
+
+    def page(self, number):
+        if self.estimate is None:
+            return super().page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        # A row more than a page tells whether there's a next page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if bottom + len(rows) > self.count:
+            self.count = bottom + len(rows)
+            self.__dict__.pop('num_pages', None)
+        return self._get_page(rows[:self.per_page], number, self)
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """ModelAdmin defaults for tables too big to count on every changelist"""
+    paginator = EstimatedCountPaginator
+    # Skip the second, unfiltered COUNT(*) behind "N results (M total)"
+    show_full_result_count = False
@@ -0,0 +1,115 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.core.exceptions import PermissionDenied
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from .renderers import ORJSONRenderer
+
+
+def api_response(data, status=status.HTTP_200_OK, headers=None):
+    """A JSON HttpResponse rendered like a DRF Response"""
+    return HttpResponse(
+        ORJSONRenderer().render(data), status=status, headers=headers,
+        content_type='application/json',
+    )
+
+
+async def aiterate(iterator):
+    """Iterate a sync iterator from async code, a thread hop per item"""
+    iterator = iter(iterator)
+    next_item = sync_to_async(next)
+    while (item := await next_item(iterator, None)) is not None:
+        yield item
+
+
+def streaming_content(chunks):
+    """
+    ``chunks`` as a StreamingHttpResponse body. Under ASGI, Django reads a
+    sync iterator into a list before sending it, so it's wrapped as an
+    async one, iterated in the request's thread like a sync view.
+    """
+    return aiterate(chunks) if settings.ASYNC_VIEWS else chunks
+
+
+def check_request(request, permission_classes, throttle_classes):
+    """Authenticate ``request`` and apply the permissions and throttles, as APIView.initial() does"""
+    for permission in permission_classes:
+        if not permission().has_permission(request, None):
+            if request.authenticators and not request.successful_authenticator:
+                raise exceptions.NotAuthenticated()
+            raise exceptions.PermissionDenied()
+    waits = []
+    for throttle_class in throttle_classes:
+        throttle = throttle_class()
+        if not throttle.allow_request(request, None):
+            waits.append(throttle.wait())
+    if waits:
+        raise exceptions.Throttled(max((wait for wait in waits if wait is not None), default=None))
+
+
+def handle_exception(request, exc):
+    """The DRF error response for ``exc``, as APIView.handle_exception() builds it"""
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        header = request.authenticators[0].authenticate_header(request) if request.authenticators else None
+        if header:
+            exc.auth_header = header
+        else:
+            exc.status_code = status.HTTP_403_FORBIDDEN
+    response = api_settings.EXCEPTION_HANDLER(exc, {'request': request, 'view': None})
+    if response is None:
+        raise exc
+    headers = {name: value for name, value in response.items() if name != 'Content-Type'}
+    return api_response(response.data, response.status_code, headers)
+
+
+def async_api_view(methods, permission_classes=None, throttle_classes=None):
+    """
+    @api_view for ``async def`` views, which DRF 3.14 can't run natively.
+
+    The view gets a DRF Request (the default parsers and authentication,
+    including test clients' force_authenticate) and returns an HttpResponse,
+    usually from api_response(). DRF exceptions become DRF's error
+    responses. Authentication, permissions and throttles run in a worker
+    thread, since authenticating may query the database.
+    """
+    if permission_classes is None:
+        permission_classes = api_settings.DEFAULT_PERMISSION_CLASSES
+    if throttle_classes is None:
+        throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES
+
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            request = Request(
+                request,
+                parsers=[parser() for parser in api_settings.DEFAULT_PARSER_CLASSES],
+                authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES],
+            )
+            try:
+                if request.method not in methods:
+                    raise exceptions.MethodNotAllowed(request.method)
+                if permission_classes or throttle_classes:
+                    await sync_to_async(check_request)(request, permission_classes, throttle_classes)
+                return await view(request, *args, **kwargs)
+            except (exceptions.APIException, Http404, PermissionDenied) as exc:
+                return handle_exception(request, exc)
+
+        # JWT, not cookie, authentication; csrf_exempt() can't wrap a coroutine in Django 4.2
+        wrapper.csrf_exempt = True
+        return wrapper
+    return decorator
+
+
+def init_view(view_class, request, **kwargs):
+    """A DRF view instance set up for ``request``, to reuse its methods"""
+    view = view_class()
+    view.request = request
+    view.args = ()
+    view.kwargs = kwargs
+    view.format_kwarg = None
+    view.headers = {}
+    return view
@@ -0,0 +1,212 @@
+import math
+import time
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from store.cache import bump_catalog_version
+from store.cart import apply_cart_operations
+from store.models import CartItem, Product
+from users.authentication import ClaimsRefreshToken
+from .seed import SKU_PREFIX, USERNAME_PREFIX
+
+SEARCH_TERMS = ['lamp', 'wireless', 'chair', 'premium kettle', 'head', 'eco bottle', 'camera', 'desk']
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+class Benchmark:
+    """Seeded shoppers and products, with an authenticated client per shopper"""
+
+    def __init__(self, shoppers=50, products=1000):
+        self.users = list(
+            User.objects.filter(username__startswith=USERNAME_PREFIX).order_by('id')[:shoppers]
+        )
+        self.products = list(
+            Product.objects
+            .filter(sku__startswith=SKU_PREFIX, inventory_count__gt=0)
+            .order_by('id')
+            .values_list('id', flat=True)[:products]
+        )
+        if not self.users or len(self.products) < 5:
+            raise BenchmarkError('No seeded data; run seed_data first')
+        self.anonymous = APIClient()
+        # Issuing a token reads the user, so do it before anything is timed
+        self.clients = {user.id: self.make_client(user) for user in self.users}
+
+    def user(self, i):
+        return self.users[i % len(self.users)]
+
+    def make_client(self, user):
+        """A client that authenticates like the frontend does, with a JWT"""
+        client = APIClient()
+        token = ClaimsRefreshToken.for_user(user).access_token
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        return client
+
+    def client(self, i):
+        return self.clients[self.user(i).id]
+
+    def product(self, i):
+        return self.products[i * 7 % len(self.products)]
+
+
+class Scenario:
+    def __init__(self, name, request, setup=None, expect=200):
+        self.name = name
+        self.request = request
+        self.setup = setup
+        self.expect = expect
+
+
+def cold_cache(bench, i):
+    bump_catalog_version()
+
+
+def fill_cart(bench, i):
+    user = bench.user(i)
+    current = CartItem.objects.filter(user=user).values_list('product_id', flat=True)
+    operations = [{'op': 'remove', 'product_id': product_id} for product_id in current]
+    operations += [
+        {'op': 'set', 'product_id': bench.product(i + n), 'quantity': 1} for n in range(3)
+    ]
+    apply_cart_operations(user, operations)
+
+
+def product_page(bench, i):
+    return bench.anonymous.get(reverse('product-list'), {'page': i % 5 + 1})
+
+
+SCENARIOS = [
+    Scenario('product_list', product_page, setup=cold_cache),
+    Scenario('product_list_cached', product_page, setup=lambda bench, i: product_page(bench, i)),
+    Scenario(
+        'product_search',
+        lambda bench, i: bench.anonymous.get(
+            reverse('product-list'), {'search': SEARCH_TERMS[i % len(SEARCH_TERMS)]}
+        ),
+        setup=cold_cache,
+    ),
+    Scenario(
+        'product_facets',
+        lambda bench, i: bench.anonymous.get(
+            reverse('product-facets'), {'search': SEARCH_TERMS[i % len(SEARCH_TERMS)]}
+        ),
+        setup=cold_cache,
+    ),
+    Scenario(
+        'product_detail',
+        lambda bench, i: bench.anonymous.get(reverse('product-detail', args=[bench.product(i)])),
+        setup=cold_cache,
+    ),
+    Scenario('cart_list', lambda bench, i: bench.client(i).get(reverse('cart-list'))),
+    Scenario(
+        'cart_add',
+        lambda bench, i: bench.client(i).post(
+            reverse('add-to-cart'), {'product_id': bench.product(i), 'quantity': 1}, format='json'
+        ),
+        expect=201,
+    ),
+    Scenario(
+        'cart_batch',
+        lambda bench, i: bench.client(i).post(
+            reverse('batch-update-cart'),
+            {'operations': [
+                {'op': 'set', 'product_id': bench.product(i + n), 'quantity': 1} for n in range(5)
+            ]},
+            format='json',
+        ),
+    ),
+    Scenario(
+        'create_order',
+        lambda bench, i: bench.client(i).post(
+            reverse('create-order'),
+            {'shipping_address': '1 Benchmark Way', 'payment_method_id': 'pm_card_visa'},
+            format='json',
+        ),
+        setup=fill_cart,
+        expect=201,
+    ),
+    Scenario('order_history', lambda bench, i: bench.client(i).get(reverse('order-list'))),
+    Scenario(
+        'order_history_summary',
+        lambda bench, i: bench.client(i).get(reverse('order-list'), {'view': 'summary'}),
+    ),
+]
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def run_scenario(bench, scenario, iterations=50, warmup=5):
+    """
+    Time ``iterations`` requests (after ``warmup`` untimed ones). Setup
+    runs outside the timer. Returns latency percentiles in milliseconds,
+    serial throughput and the most queries any request made.
+    """
+    latencies = []
+    queries = []
+    for i in range(warmup + iterations):
+        if scenario.setup is not None:
+            scenario.setup(bench, i)
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = scenario.request(bench, i)
+            elapsed = time.perf_counter() - started
+        if response.status_code != scenario.expect:
+            raise BenchmarkError(
+                f'{scenario.name}: expected {scenario.expect}, got {response.status_code}: '
+                f'{getattr(response, "data", response.content)!r}'
+            )
+        if i >= warmup:
+            latencies.append(elapsed * 1000)
+            queries.append(len(captured))
+    return {
+        'iterations': iterations,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'mean_ms': round(sum(latencies) / len(latencies), 3),
+        'throughput_rps': round(len(latencies) / (sum(latencies) / 1000), 1),
+        'queries': max(queries),
+    }
+
+
+def run_suite(names=None, iterations=50, warmup=5):
+    """Run the named scenarios (all by default) against the seeded data"""
+    bench = Benchmark()
+    return {
+        scenario.name: run_scenario(bench, scenario, iterations, warmup)
+        for scenario in SCENARIOS
+        if names is None or scenario.name in names
+    }
+
+
+def compare(results, baseline, tolerance=0.5, min_delta_ms=2.0):
+    """
+    Regressions against ``baseline`` results, as readable strings.
+
+    Any increase in queries per request is a regression. p95 latency is
+    one when it is more than ``tolerance`` (a fraction) above the baseline
+    and by more than ``min_delta_ms``, so timer noise on fast paths
+    doesn't trip it.
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result['queries'] > base['queries']:
+            regressions.append(f"{name}: queries {base['queries']} -> {result['queries']}")
+        limit = base['p95_ms'] * (1 + tolerance)
+        if result['p95_ms'] > limit and result['p95_ms'] - base['p95_ms'] > min_delta_ms:
+            regressions.append(f"{name}: p95 {base['p95_ms']:.1f}ms -> {result['p95_ms']:.1f}ms")
+    return regressions
@@ -0,0 +1,34 @@
+from decimal import Decimal
+
+from orders.models import Order, OrderItem
+from store.models import Product
+
+
+def make_product(**kwargs):
+    """A saved Product, with defaults for every required field"""
+    defaults = {
+        'name': 'Product',
+        'description': 'A product',
+        'price': Decimal('10.00'),
+        'inventory_count': 10,
+        'image_url': 'https://example.com/product.jpg',
+        'category': 'General',
+    }
+    defaults.update(kwargs)
+    return Product.objects.create(**defaults)
+
+
+def make_order(user, lines, status='pending', **kwargs):
+    """A saved Order for ``lines`` of (product, quantity) at current prices"""
+    order = Order.objects.create(
+        user=user,
+        total_amount=sum(product.price * quantity for product, quantity in lines),
+        shipping_address='1 Main St',
+        status=status,
+        **kwargs
+    )
+    OrderItem.objects.bulk_create([
+        OrderItem.for_product(product, order=order, quantity=quantity, unit_price=product.price)
+        for product, quantity in lines
+    ])
+    return order
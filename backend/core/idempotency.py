@@ -0,0 +1,176 @@
+import asyncio
+import hashlib
+import time
+from functools import wraps
+from inspect import iscoroutinefunction
+
+import orjson
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.response import Response
+from .asyncviews import api_response
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+# Seconds between looks at the cache while a duplicate waits
+POLL_INTERVAL = 0.05
+
+
+def fingerprint(request):
+    """A hash of what the request asks for, to catch a key reused for something else"""
+    body = orjson.dumps(request.data, option=orjson.OPT_SORT_KEYS, default=str)
+    return hashlib.sha256(b'%s %s %s' % (request.method.encode(), request.path.encode(), body)).hexdigest()
+
+
+def freeze(response):
+    """What's stored of a response to replay it"""
+    headers = {name: value for name, value in response.items() if name != 'Content-Type'}
+    if isinstance(response, Response):
+        return {'status': response.status_code, 'data': response.data, 'headers': headers}
+    return {
+        'status': response.status_code,
+        'content': response.content,
+        'content_type': response['Content-Type'],
+        'headers': headers,
+    }
+
+
+class IdempotentRequest:
+    """
+    A request carrying an Idempotency-Key. Its record in the cache holds
+    the request's fingerprint while it runs, then the response too.
+    """
+
+    def __init__(self, scope, request, key, is_async):
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        self.cache_key = f'idempotency:{scope}:{request.user.id}:{digest}'
+        self.fingerprint = fingerprint(request)
+        self.is_async = is_async
+        self.deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+
+    def respond(self, data, status_code, headers=None):
+        if self.is_async:
+            return api_response(data, status=status_code, headers=headers)
+        return Response(data, status=status_code, headers=headers)
+
+    def replay(self, frozen):
+        headers = {**frozen['headers'], 'Idempotent-Replayed': 'true'}
+        if 'content' in frozen:
+            return HttpResponse(
+                frozen['content'], status=frozen['status'],
+                content_type=frozen['content_type'], headers=headers,
+            )
+        return self.respond(frozen['data'], frozen['status'], headers)
+
+    def pending(self):
+        return {'fingerprint': self.fingerprint}
+
+    def completed(self, response):
+        """The record to keep for ``response``, or None if a retry should run again"""
+        if response.status_code >= 500:
+            return None
+        return {'fingerprint': self.fingerprint, 'response': freeze(response)}
+
+    def answer(self, record):
+        """The response for a duplicate given the key's record, or None to keep waiting"""
+        if record['fingerprint'] != self.fingerprint:
+            return self.respond(
+                {'error': f'This {HEADER} was used with a different request'},
+                status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        if 'response' in record:
+            return self.replay(record['response'])
+        if time.monotonic() >= self.deadline:
+            return self.respond(
+                {'error': f'A request with this {HEADER} is still in progress'},
+                status.HTTP_409_CONFLICT,
+                {'Retry-After': str(settings.IDEMPOTENCY_RETRY_AFTER)},
+            )
+        return None
+
+
+def invalid_key(key):
+    return not 0 < len(key) <= MAX_KEY_LENGTH
+
+
+def idempotent(scope):
+    """
+    Honour the Idempotency-Key header on a POST view, per user: the first
+    request with a key runs and its response is kept for IDEMPOTENCY_TTL
+    seconds; repeats get that response replayed without running the view,
+    and repeats arriving while it runs wait up to IDEMPOTENCY_WAIT_SECONDS
+    for it. Server errors aren't kept, so a retry runs again. Works on
+    @api_view and @async_api_view functions; put it under them.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                key = request.headers.get(HEADER)
+                if key is None:
+                    return await view(request, *args, **kwargs)
+                idempotent_request = IdempotentRequest(scope, request, key, is_async=True)
+                if invalid_key(key):
+                    return idempotent_request.respond(
+                        {'error': f'{HEADER} must be 1 to {MAX_KEY_LENGTH} characters'},
+                        status.HTTP_400_BAD_REQUEST,
+                    )
+                cache_key = idempotent_request.cache_key
+                while True:
+                    if await cache.aadd(cache_key, idempotent_request.pending(), settings.IDEMPOTENCY_LOCK_SECONDS):
+                        try:
+                            response = await view(request, *args, **kwargs)
+                        except BaseException:
+                            await cache.adelete(cache_key)
+                            raise
+                        record = idempotent_request.completed(response)
+                        if record is None:
+                            await cache.adelete(cache_key)
+                        else:
+                            await cache.aset(cache_key, record, settings.IDEMPOTENCY_TTL)
+                        return response
+                    record = await cache.aget(cache_key)
+                    # No record: the first request failed, so this one runs
+                    if record is not None:
+                        response = idempotent_request.answer(record)
+                        if response is not None:
+                            return response
+                        await asyncio.sleep(POLL_INTERVAL)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            key = request.headers.get(HEADER)
+            if key is None:
+                return view(request, *args, **kwargs)
+            idempotent_request = IdempotentRequest(scope, request, key, is_async=False)
+            if invalid_key(key):
+                return idempotent_request.respond(
+                    {'error': f'{HEADER} must be 1 to {MAX_KEY_LENGTH} characters'},
+                    status.HTTP_400_BAD_REQUEST,
+                )
+            cache_key = idempotent_request.cache_key
+            while True:
+                if cache.add(cache_key, idempotent_request.pending(), settings.IDEMPOTENCY_LOCK_SECONDS):
+                    try:
+                        response = view(request, *args, **kwargs)
+                    except BaseException:
+                        cache.delete(cache_key)
+                        raise
+                    record = idempotent_request.completed(response)
+                    if record is None:
+                        cache.delete(cache_key)
+                    else:
+                        cache.set(cache_key, record, settings.IDEMPOTENCY_TTL)
+                    return response
+                record = cache.get(cache_key)
+                # No record: the first request failed, so this one runs
+                if record is not None:
+                    response = idempotent_request.answer(record)
+                    if response is not None:
+                        return response
+                    time.sleep(POLL_INTERVAL)
+        return wrapper
+    return decorator
@@ -0,0 +1,75 @@
+import asyncio
+import time
+
+import httpx
+from .benchmark import percentile
+
+
+async def checkout(client, shopper, product_id):
+    """Put one unit in the cart and pay for it; the checkout is the timed request"""
+    headers = {'Authorization': f'Bearer {shopper}'}
+    await client.post(
+        '/api/cart/batch/',
+        json={'operations': [{'op': 'set', 'product_id': product_id, 'quantity': 1}]},
+        headers=headers,
+    )
+    started = time.perf_counter()
+    response = await client.post(
+        '/api/orders/create/',
+        json={'shipping_address': '1 Load Test Way', 'payment_method_id': 'pm_card_visa'},
+        headers=headers,
+    )
+    return time.perf_counter() - started, response.status_code == 201
+
+
+async def browse(client, shopper, product_id):
+    started = time.perf_counter()
+    response = await client.get('/api/products/', params={'page': product_id % 20 + 1})
+    return time.perf_counter() - started, response.status_code == 200
+
+
+SCENARIOS = {'checkout': checkout, 'browse': browse}
+
+
+async def run_load(base_url, scenario, shoppers, products, concurrency=50, duration=10.0):
+    """
+    Keep ``concurrency`` clients (one shopper each) sending ``scenario``
+    requests for ``duration`` seconds. Returns the completed requests per
+    second, latency percentiles in milliseconds and the failures.
+    """
+    request = SCENARIOS[scenario]
+    latencies = []
+    failures = 0
+    deadline = time.monotonic() + duration
+
+    async def worker(n, client):
+        nonlocal failures
+        i = 0
+        while time.monotonic() < deadline:
+            try:
+                elapsed, ok = await request(
+                    client, shoppers[n % len(shoppers)], products[(n * 31 + i) % len(products)]
+                )
+            except httpx.HTTPError:
+                elapsed, ok = None, False
+            if ok:
+                latencies.append(elapsed * 1000)
+            else:
+                failures += 1
+            i += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    started = time.monotonic()
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        await asyncio.gather(*(worker(n, client) for n in range(concurrency)))
+    elapsed = time.monotonic() - started
+
+    if not latencies:
+        return {'requests': 0, 'failures': failures, 'rps': 0, 'p50_ms': None, 'p95_ms': None}
+    return {
+        'requests': len(latencies),
+        'failures': failures,
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50), 1),
+        'p95_ms': round(percentile(latencies, 95), 1),
+    }
@@ -0,0 +1,128 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_databases, teardown_databases
+from core.loadtest import SCENARIOS, run_load
+from core.seed import SKU_PREFIX, USERNAME_PREFIX, seed_data
+from core.stripe_stub import start_stripe_stub
+from store.models import Product
+from users.authentication import ClaimsRefreshToken
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def server_command(server, port, threads):
+    """One worker process, as the WSGI (gunicorn) or ASGI (uvicorn) deployment"""
+    if server == 'wsgi':
+        return [
+            sys.executable, '-m', 'gunicorn', 'config.wsgi:application', '--workers', '1',
+            '--threads', str(threads), '--bind', f'127.0.0.1:{port}', '--log-level', 'warning',
+        ]
+    return [
+        sys.executable, '-m', 'uvicorn', 'config.asgi:application',
+        '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning', '--no-access-log',
+    ]
+
+
+def wait_until_up(base_url, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError(f'Server exited with status {process.returncode}')
+        try:
+            httpx.get(f'{base_url}/api/products/', timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise CommandError(f'Server at {base_url} did not start')
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test one WSGI worker (gunicorn, --threads threads) against one ASGI "
+        "worker (uvicorn) on a throwaway seeded database, with the Stripe stub "
+        "answering after --stripe-latency-ms. Reports completed requests per second."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS))
+        parser.add_argument('--server', action='append', choices=['wsgi', 'asgi'])
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--duration', type=float, default=10.0, help="Seconds per run.")
+        parser.add_argument('--threads', type=int, default=8, help="gunicorn threads.")
+        parser.add_argument('--stripe-latency-ms', type=float, default=300)
+
+    def handle(self, **options):
+        old_config = setup_databases(verbosity=0, interactive=False)
+        stub = start_stripe_stub(latency=options['stripe_latency_ms'] / 1000)
+        try:
+            seed_data(users=max(100, options['concurrency']))
+            # Children inherit the environment, so they find the test database
+            env = {
+                **os.environ,
+                'DB_NAME': connection.settings_dict['NAME'],
+                'STRIPE_API_BASE': f'http://127.0.0.1:{stub.server_port}',
+                'STRIPE_SECRET_KEY': 'sk_test_load',
+                'DEBUG': 'False',
+                # Measure capacity, not the protections in front of it
+                'THROTTLE_ENABLED': 'False',
+                'ADMISSION_MAX_IN_FLIGHT': '0',
+                'WSGI_THREADS': str(options['threads']),
+            }
+            shoppers = [
+                str(ClaimsRefreshToken.for_user(user).access_token)
+                for user in User.objects.filter(username__startswith=USERNAME_PREFIX).order_by('id')
+            ]
+            products = list(
+                Product.objects.filter(sku__startswith=SKU_PREFIX, inventory_count__gt=0)
+                .order_by('id').values_list('id', flat=True)
+            )
+            # The servers use their own connections to the test database
+            connection.close()
+
+            results = []
+            for server in options['server'] or ['wsgi', 'asgi']:
+                for scenario in options['scenario'] or sorted(SCENARIOS):
+                    results.append((server, scenario, self.run(server, scenario, env, shoppers, products, options)))
+        finally:
+            stub.shutdown()
+            teardown_databases(old_config, verbosity=0)
+
+        self.write_table(results)
+
+    def run(self, server, scenario, env, shoppers, products, options):
+        port = free_port()
+        base_url = f'http://127.0.0.1:{port}'
+        process = subprocess.Popen(
+            server_command(server, port, options['threads']), env=env, cwd=settings.BASE_DIR
+        )
+        try:
+            wait_until_up(base_url, process)
+            return asyncio.run(run_load(
+                base_url, scenario, shoppers, products,
+                concurrency=options['concurrency'], duration=options['duration'],
+            ))
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+    def write_table(self, results):
+        columns = ['requests', 'failures', 'rps', 'p50_ms', 'p95_ms']
+        self.stdout.write(f"{'server':<8}{'scenario':<12}" + ''.join(f'{column:>12}' for column in columns))
+        for server, scenario, result in results:
+            self.stdout.write(
+                f'{server:<8}{scenario:<12}' + ''.join(f'{str(result[column]):>12}' for column in columns)
+            )
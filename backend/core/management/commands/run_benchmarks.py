@@ -0,0 +1,122 @@
+import json
+from pathlib import Path
+
+import stripe
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (
+    override_settings, setup_databases, setup_test_environment,
+    teardown_databases, teardown_test_environment,
+)
+from core.benchmark import SCENARIOS, compare, run_suite
+from core.seed import scaled_counts, seed_data
+from core.stripe_stub import start_stripe_stub
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'benchmarks' / 'baseline.json'
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the API hot paths against a throwaway, seeded test database "
+        "and compare the results with a stored baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1.0, help="seed_data scale factor.")
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument(
+            '--scenario', action='append', choices=[scenario.name for scenario in SCENARIOS],
+            help="Run only this scenario (repeatable)."
+        )
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE))
+        parser.add_argument(
+            '--save-baseline', action='store_true',
+            help="Write the results to --baseline instead of comparing against it."
+        )
+        parser.add_argument('--output', help="Also write the results to this JSON file.")
+        parser.add_argument(
+            '--tolerance', type=float, default=0.5,
+            help="Allowed p95 slowdown as a fraction of the baseline (0.5 = 50%%)."
+        )
+        parser.add_argument(
+            '--stripe-latency-ms', type=float, default=0,
+            help="Simulated Stripe round trip for create_order."
+        )
+
+    def handle(self, **options):
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        stub = start_stripe_stub(latency=options['stripe_latency_ms'] / 1000)
+        original_stripe = stripe.api_base, stripe.api_key
+        stripe.api_base = f'http://127.0.0.1:{stub.server_port}'
+        stripe.api_key = stripe.api_key or 'sk_test_benchmark'
+        # Keep benchmark entries apart from anything else in a shared cache
+        caches = {
+            alias: {**config, 'KEY_PREFIX': 'benchmark'} for alias, config in settings.CACHES.items()
+        }
+        # Keep the rate limits' cost but never throttle the benchmark clients
+        rest_framework = {
+            **settings.REST_FRAMEWORK,
+            'DEFAULT_THROTTLE_RATES': {
+                scope: '1000000/s' for scope in settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']
+            },
+        }
+        try:
+            with override_settings(CACHES=caches, REST_FRAMEWORK=rest_framework):
+                seeded = seed_data(**scaled_counts(options['scale']))
+                self.stdout.write(
+                    "Seeded {products} product(s), {users} user(s), {orders} order(s)".format(**seeded)
+                )
+                results = run_suite(options['scenario'], options['iterations'], options['warmup'])
+        finally:
+            stub.shutdown()
+            stripe.api_base, stripe.api_key = original_stripe
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        self.write_table(results)
+        report = {
+            'scale': options['scale'],
+            'iterations': options['iterations'],
+            'results': results,
+        }
+        if options['output']:
+            write_json(options['output'], report)
+
+        baseline_path = Path(options['baseline'])
+        if options['save_baseline']:
+            if baseline_path.exists():
+                # Keep the baseline of scenarios that weren't run this time
+                previous = json.loads(baseline_path.read_text())
+                report['results'] = {**previous['results'], **results}
+            write_json(baseline_path, report)
+            self.stdout.write(self.style.SUCCESS(f"Saved baseline to {baseline_path}"))
+            return
+        if not baseline_path.exists():
+            self.stdout.write(self.style.WARNING(f"No baseline at {baseline_path}; nothing to compare"))
+            return
+
+        baseline = json.loads(baseline_path.read_text())
+        if baseline.get('scale') != options['scale']:
+            self.stdout.write(self.style.WARNING(
+                f"Baseline was recorded at scale {baseline.get('scale')}, not {options['scale']}"
+            ))
+        regressions = compare(results, baseline['results'], tolerance=options['tolerance'])
+        if regressions:
+            for regression in regressions:
+                self.stderr.write(f"REGRESSION {regression}")
+            raise CommandError(f"{len(regressions)} regression(s) against {baseline_path}")
+        self.stdout.write(self.style.SUCCESS("No regressions against the baseline"))
+
+    def write_table(self, results):
+        columns = ['p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps', 'queries']
+        self.stdout.write(f"{'scenario':<24}" + ''.join(f'{column:>16}' for column in columns))
+        for name, result in results.items():
+            self.stdout.write(f'{name:<24}' + ''.join(f'{result[column]:>16}' for column in columns))
+
+
+def write_json(path, data):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, indent=2, sort_keys=True) + '\n')
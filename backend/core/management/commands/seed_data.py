@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from core.seed import scaled_counts, seed_data
+
+
+class Command(BaseCommand):
+    help = "Seed synthetic products, users, carts and orders for load testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale', type=float, default=1.0,
+            help="Multiply every default count (1000 products, 100 users, 20 carts, 500 orders)."
+        )
+        parser.add_argument('--products', type=int)
+        parser.add_argument('--users', type=int)
+        parser.add_argument('--carts', type=int)
+        parser.add_argument('--orders', type=int)
+        parser.add_argument('--seed', type=int, default=0, help="Random seed, for repeatable data.")
+
+    def handle(self, **options):
+        counts = scaled_counts(options['scale'])
+        for name in counts:
+            if options[name] is not None:
+                counts[name] = options[name]
+        created = seed_data(seed=options['seed'], **counts)
+        self.stdout.write(self.style.SUCCESS(
+            "Seeded {products} product(s), {users} user(s), {carts} cart(s), {orders} order(s)".format(**created)
+        ))
+
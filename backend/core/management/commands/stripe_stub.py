@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+from core.stripe_stub import start_stripe_stub
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve a local stand-in for the Stripe PaymentIntents API. Point "
+        "STRIPE_API_BASE at it to run checkout offline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=12111)
+        parser.add_argument(
+            '--latency-ms', type=float, default=0,
+            help="Delay every response, to mimic the real API's round trip."
+        )
+
+    def handle(self, **options):
+        server = start_stripe_stub(options['port'], options['latency_ms'] / 1000)
+        self.stdout.write(f"Stripe stub listening on http://127.0.0.1:{server.server_port}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
@@ -0,0 +1,155 @@
+import threading
+import time
+from bisect import bisect_left
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# Functions returning extra metric lines for /metrics, see register_collector()
+collectors = []
+
+
+def register_collector(collector):
+    """Add ``collector() -> [str]`` lines (Prometheus text format) to /metrics"""
+    collectors.append(collector)
+    return collector
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{labels}}} {number(self.sum)}')
+        lines.append(f'{name}_count{{{labels}}} {self.count}')
+        return lines
+
+
+class RouteStats:
+    def __init__(self):
+        self.statuses = {}
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.db_seconds = 0.0
+        self.response_bytes = 0
+
+
+class MetricsRegistry:
+    """
+    Process-local request metrics, by method and URL route. Each worker
+    process serves its own numbers; Prometheus sums them across targets.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.routes = {}
+
+    def observe(self, method, route, status, seconds, queries, db_seconds, response_bytes):
+        with self._lock:
+            stats = self.routes.get((method, route))
+            if stats is None:
+                stats = self.routes[(method, route)] = RouteStats()
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+            stats.latency.observe(seconds)
+            stats.queries.observe(queries)
+            stats.db_seconds += db_seconds
+            stats.response_bytes += response_bytes
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            routes = sorted(self.routes.items())
+            sections = {
+                'http_requests_total': ('counter', 'Requests by route and status', []),
+                'http_request_duration_seconds': ('histogram', 'Request latency', []),
+                'http_request_db_queries': ('histogram', 'SQL queries per request', []),
+                'http_request_db_seconds_total': ('counter', 'Time spent in SQL', []),
+                'http_response_size_bytes_total': ('counter', 'Response body bytes sent', []),
+            }
+            for (method, route), stats in routes:
+                labels = f'method="{method}",route="{escape(route)}"'
+                for status, count in sorted(stats.statuses.items()):
+                    sections['http_requests_total'][2].append(
+                        f'http_requests_total{{{labels},status="{status}"}} {count}'
+                    )
+                sections['http_request_duration_seconds'][2].extend(
+                    stats.latency.render('http_request_duration_seconds', labels)
+                )
+                sections['http_request_db_queries'][2].extend(
+                    stats.queries.render('http_request_db_queries', labels)
+                )
+                sections['http_request_db_seconds_total'][2].append(
+                    f'http_request_db_seconds_total{{{labels}}} {number(stats.db_seconds)}'
+                )
+                sections['http_response_size_bytes_total'][2].append(
+                    f'http_response_size_bytes_total{{{labels}}} {stats.response_bytes}'
+                )
+
+        lines = []
+        for name, (kind, help_text, samples) in sections.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            lines.extend(samples)
+        for collector in collectors:
+            lines.extend(collector())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def number(value):
+    if isinstance(value, float):
+        return f'{value:.6f}'.rstrip('0').rstrip('.')
+    return str(value)
+
+
+def escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class QueryTracker:
+    """
+    connection.execute_wrapper() that counts and times SQL, keeping a
+    tally per statement. ORM statements are parameterised, so repeats of
+    one SQL string are the same query shape with different values.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+            self.shapes[sql] = self.shapes.get(sql, 0) + 1
+
+    def repeated(self, threshold):
+        """(count, sql) for shapes run at least ``threshold`` times, worst first"""
+        return sorted(
+            ((count, sql) for sql, count in self.shapes.items() if count >= threshold),
+            reverse=True,
+        )
@@ -0,0 +1,228 @@
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import JsonResponse
+from django.urls import Resolver404, resolve
+from . import replicas
+from .metrics import QueryTracker, registry
+
+logger = logging.getLogger(__name__)
+
+
+# The request being measured. Context variables follow async views into
+# the worker threads that run their queries, which connection-local
+# execute_wrapper() contexts don't
+current_tracker = ContextVar('current_tracker', default=None)
+
+
+def track_current_request(execute, sql, params, many, context):
+    tracker = current_tracker.get()
+    if tracker is None:
+        return execute(sql, params, many, context)
+    return tracker(execute, sql, params, many, context)
+
+
+def install_tracking(connection):
+    if track_current_request not in connection.execute_wrappers:
+        connection.execute_wrappers.append(track_current_request)
+
+
+@receiver(connection_created)
+def install_tracking_on_connect(sender, connection, **kwargs):
+    install_tracking(connection)
+
+
+@contextmanager
+def track_queries(tracker):
+    for connection in connections.all():
+        install_tracking(connection)
+    token = current_tracker.set(tracker)
+    try:
+        yield
+    finally:
+        current_tracker.reset(token)
+
+
+class InstrumentationMiddleware:
+    """
+    Record latency, SQL query count and time, and response size per URL
+    route, add a Server-Timing header, and log repeated query shapes
+    (likely N+1 patterns). Metrics are served by core.views.metrics.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.threshold = settings.METRICS_N_PLUS_ONE_THRESHOLD
+        # Under ASGI a sync-only middleware would run every request,
+        # async views included, in a worker thread
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        tracker = QueryTracker()
+        started = time.perf_counter()
+        with track_queries(tracker):
+            response = self.get_response(request)
+        return self.record(request, response, tracker, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        tracker = QueryTracker()
+        started = time.perf_counter()
+        with track_queries(tracker):
+            response = await self.get_response(request)
+        return self.record(request, response, tracker, time.perf_counter() - started)
+
+    def record(self, request, response, tracker, elapsed):
+        match = getattr(request, 'resolver_match', None)
+        # The route pattern, not the path, keeps the label set small
+        route = match.route if match is not None else '<unmatched>'
+        size = 0 if response.streaming else len(response.content)
+        registry.observe(
+            request.method, route, response.status_code,
+            elapsed, tracker.count, tracker.seconds, size,
+        )
+
+        response['Server-Timing'] = (
+            f'app;dur={elapsed * 1000:.1f}, '
+            f'db;dur={tracker.seconds * 1000:.1f};desc="{tracker.count} queries"'
+        )
+        for count, sql in tracker.repeated(self.threshold):
+            logger.warning(
+                'Possible N+1 on %s %s: %d identical queries: %s',
+                request.method, route, count, sql[:300]
+            )
+        return response
+
+
+class ReplicaPinMiddleware:
+    """
+    Pin users to the primary database for DB_REPLICA_PIN_SECONDS after a
+    successful write request, so they read their own cart and orders
+    instead of a replica that hasn't caught up (see core.replicas).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replicas.pool.aliases:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        response = self.get_response(request)
+        if self.is_write(request, response):
+            self.pin_writer(request)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if self.is_write(request, response):
+            await sync_to_async(self.pin_writer)(request)
+        return response
+
+    def is_write(self, request, response):
+        return request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400
+
+    def pin_writer(self, request):
+        # DRF sets the user it authenticated (by JWT) on the HttpRequest
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            replicas.pin_to_primary(user.id)
+
+
+@lru_cache(maxsize=4096)
+def route_priority(path):
+    try:
+        name = resolve(path).url_name
+    except Resolver404:
+        name = None
+    return settings.ADMISSION_PRIORITIES.get(name, 'normal')
+
+
+class AdmissionMiddleware:
+    """
+    Shed load by priority once too many requests are in flight in this
+    process: low-priority routes (catalog browsing) are turned away first,
+    at ADMISSION_LOW_SHARE of ADMISSION_MAX_IN_FLIGHT, then normal ones at
+    ADMISSION_NORMAL_SHARE. Critical routes (checkout) are always admitted.
+    Refused requests get an immediate 503 with Retry-After.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.ADMISSION_MAX_IN_FLIGHT:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.limits = {
+            'low': settings.ADMISSION_MAX_IN_FLIGHT * settings.ADMISSION_LOW_SHARE,
+            'normal': settings.ADMISSION_MAX_IN_FLIGHT * settings.ADMISSION_NORMAL_SHARE,
+            'critical': math.inf,
+        }
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.admit(request):
+            return self.overloaded()
+        try:
+            return self.get_response(request)
+        finally:
+            self.release()
+
+    async def __acall__(self, request):
+        if not self.admit(request):
+            return self.overloaded()
+        try:
+            return await self.get_response(request)
+        finally:
+            self.release()
+
+    def admit(self, request):
+        limit = self.limits[route_priority(request.path_info)]
+        with self._lock:
+            if self.in_flight >= limit:
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def overloaded(self):
+        return JsonResponse(
+            {'error': 'The server is busy, please retry shortly'},
+            status=503, headers={'Retry-After': str(settings.ADMISSION_RETRY_AFTER)},
+        )
@@ -0,0 +1,234 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+from functools import partial
+from urllib.parse import parse_qs, urlsplit
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def estimate_count(queryset):
+    """Row estimate from the Postgres planner, without running a COUNT(*)"""
+    plan = json.loads(queryset.explain(format='json'))
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def _encode_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset ("cursor") pagination over the queryset's own ordering.
+
+    The primary key is appended as a tiebreaker, and the cursor holds the
+    ordering values of the boundary row, so every page is an index range
+    scan: page 500 costs the same as page 1. No COUNT(*) is run unless the
+    client asks for one with ?count=exact or ?count=estimate.
+    """
+    page_size = PageNumberPagination.page_size
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+        self.count = self.get_count(queryset, request)
+
+        position, reverse = self.decode_cursor(request, queryset)
+        ordering = self.ordering
+        if reverse:
+            ordering = [self._flip(field) for field in ordering]
+        if position is not None:
+            queryset = queryset.filter(self._after(ordering, position))
+
+        results = list(queryset.order_by(*ordering)[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.has_next = has_more if not reverse else position is not None
+        self.has_previous = position is not None if not reverse else has_more
+        self.first = results[0] if results else None
+        self.last = results[-1] if results else None
+        return results
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, queryset):
+        """The queryset ordering as field names, with the pk as tiebreaker"""
+        if queryset.query.order_by:
+            ordering = list(queryset.query.order_by)
+        else:
+            ordering = list(queryset.model._meta.ordering)
+        if not all(isinstance(field, str) for field in ordering):
+            raise TypeError('KeysetPagination only supports orderings on field names')
+
+        pk_name = queryset.model._meta.pk.name
+        if not any(field.lstrip('-') in ('pk', pk_name) for field in ordering):
+            descending = ordering[-1].startswith('-') if ordering else True
+            ordering.append(f'-{pk_name}' if descending else pk_name)
+        return ordering
+
+    def get_count(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param)
+        if mode == 'exact':
+            return queryset.count()
+        if mode == 'estimate':
+            return estimate_count(queryset)
+        return None
+
+    def _flip(self, field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    def _after(self, ordering, position):
+        """Q for rows strictly after ``position`` in ``ordering``"""
+        condition = Q()
+        for index, field in reversed(list(enumerate(ordering))):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            step = Q(**{f'{name}__{lookup}': position[index]})
+            if index < len(ordering) - 1:
+                step |= Q(**{name: position[index]}) & condition
+            condition = step
+        return condition
+
+    def _field(self, queryset, name):
+        """The model field or annotation ``name`` orders by"""
+        if name in queryset.query.annotations:
+            return queryset.query.annotations[name].output_field
+        opts = queryset.model._meta
+        return opts.pk if name == 'pk' else opts.get_field(name)
+
+    def decode_cursor(self, request, queryset):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            padding = '=' * (-len(encoded) % 4)
+            cursor = json.loads(urlsafe_b64decode(encoded + padding))
+            position, reverse = cursor['p'], bool(cursor.get('r'))
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        # A well-formed cursor can still hold values of the wrong type
+        try:
+            position = [
+                self._field(queryset, field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, position)
+            ]
+        except (ValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        # Encoded cursors never hold nulls, and None can't be compared against
+        if any(value is None for value in position):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, instance, reverse):
+        # Model instances or values() rows
+        get = instance.get if isinstance(instance, dict) else partial(getattr, instance)
+        position = [_encode_value(get(field.lstrip('-'))) for field in self.ordering]
+        cursor = {'p': position}
+        if reverse:
+            cursor['r'] = 1
+        encoded = urlsafe_b64encode(json.dumps(cursor, separators=(',', ':')).encode())
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded.decode().rstrip('=')
+        )
+
+    def get_next_link(self):
+        if not self.has_next or self.last is None:
+            return None
+        return self.encode_cursor(self.last, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or self.first is None:
+            return None
+        return self.encode_cursor(self.first, reverse=True)
+
+    def get_paginated_response(self, data):
+        response = OrderedDict()
+        if self.count is not None:
+            response['count'] = self.count
+        response['next'] = self.get_next_link()
+        response['previous'] = self.get_previous_link()
+        response['results'] = data
+        return Response(response)
+
+
+class HybridPagination(PageNumberPagination):
+    """
+    Page-number pagination by default, keyset pagination on request.
+
+    Clients opt in with ?pagination=cursor (or by following a cursor link);
+    views can make keyset the default with ``pagination_mode = 'cursor'``.
+    """
+    mode_query_param = 'pagination'
+    keyset_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_keyset(request, view):
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        self.keyset = None
+        return super().paginate_queryset(queryset, request, view)
+
+    def use_keyset(self, request, view):
+        mode = request.query_params.get(self.mode_query_param)
+        if mode is None:
+            if self.keyset_class.cursor_query_param in request.query_params:
+                return True
+            mode = getattr(view, 'pagination_mode', 'page')
+        return mode == 'cursor'
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+def relink(data, request):
+    """
+    A paginated response's ``data`` with its next and previous links
+    rebuilt on ``request``'s URL, for pages cached from another request
+    with equivalent parameters (other casing or order, or another scheme).
+    """
+    data = dict(data)
+    url = request.build_absolute_uri()
+    for name in ('next', 'previous'):
+        if not data.get(name):
+            continue
+        params = parse_qs(urlsplit(data[name]).query)
+        link = url
+        for param in (PageNumberPagination.page_query_param, KeysetPagination.cursor_query_param):
+            if param in params:
+                link = replace_query_param(link, param, params[param][0])
+            else:
+                link = remove_query_param(link, param)
+        data[name] = link
+    return data
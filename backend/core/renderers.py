@@ -0,0 +1,28 @@
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# DRF's JSON renderer escapes these so responses are also valid JavaScript
+LINE_SEPARATORS = ((b'\xe2\x80\xa8', b'\\u2028'), (b'\xe2\x80\xa9', b'\\u2029'))
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer output, encoded with orjson. Dates, times, Decimals and
+    the other types DRF knows about go through DRF's own encoder, so the
+    bytes match JSONRenderer's except for floats below 1e-4 or of 1e16
+    and above, which orjson writes without an exponent sign. Indented
+    output (the browsable API) is left to JSONRenderer.
+    """
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+        content = orjson.dumps(data, default=JSONEncoder().default, option=self.options)
+        for character, escaped in LINE_SEPARATORS:
+            content = content.replace(character, escaped)
+        return content
@@ -0,0 +1,159 @@
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+# Seconds the replica is behind. A replica that has replayed everything
+# it received is current, however old its last transaction; the primary
+# (or a plain second database) returns NULLs and counts as current.
+LAG_SQL = """
+    SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+           ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+           END
+"""
+
+
+class ReplicaPool:
+    """
+    The configured replicas and their health, checked from the request
+    path at most every DB_REPLICA_CHECK_INTERVAL seconds per process. A
+    replica that can't be reached or is more than DB_REPLICA_MAX_LAG
+    seconds behind is skipped until a later check passes.
+    """
+
+    def __init__(self, aliases):
+        self.aliases = list(aliases)
+        self.healthy = list(self.aliases)
+        self.checked_at = None
+        self._lock = threading.Lock()
+
+    def lag(self, alias):
+        with connections[alias].cursor() as cursor:
+            cursor.execute(LAG_SQL)
+            return float(cursor.fetchone()[0])
+
+    def is_healthy(self, alias):
+        try:
+            lag = self.lag(alias)
+        except DatabaseError as e:
+            logger.warning('Replica %s is unavailable: %s', alias, e)
+            return False
+        if lag > settings.DB_REPLICA_MAX_LAG:
+            logger.warning('Replica %s is %.1fs behind the primary', alias, lag)
+            return False
+        return True
+
+    def refresh(self):
+        """Re-check the replicas if the last check is stale; one thread checks at a time"""
+        now = time.monotonic()
+        stale = self.checked_at is None or now - self.checked_at >= settings.DB_REPLICA_CHECK_INTERVAL
+        if not stale or not self._lock.acquire(blocking=False):
+            return
+        try:
+            self.healthy = [alias for alias in self.aliases if self.is_healthy(alias)]
+            self.checked_at = time.monotonic()
+        finally:
+            self._lock.release()
+
+    def choose(self):
+        """A healthy replica's alias, or None to use the primary"""
+        if not self.aliases:
+            return None
+        self.refresh()
+        return random.choice(self.healthy) if self.healthy else None
+
+
+pool = ReplicaPool(alias for alias in settings.DATABASES if alias != DEFAULT_DB_ALIAS)
+
+
+def pin_key(user_id):
+    return f'replicas:pin:{user_id}'
+
+
+def pin_to_primary(user_id):
+    """Read ``user_id``'s data from the primary until the replicas have caught up"""
+    cache.set(pin_key(user_id), 1, timeout=settings.DB_REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user_id):
+    return cache.get(pin_key(user_id)) is not None
+
+
+class ReplicaReads:
+    """
+    The replica one request reads from, picked at its first query: an
+    authenticated user's own recent writes may not have reached the
+    replicas yet, so a pinned user reads from the primary.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.resolved = False
+        self.alias = None
+
+    def resolve(self):
+        if not self.resolved:
+            # Queries made while authenticating the user go to the primary
+            self.resolved = True
+            user = self.request.user
+            if not (user.is_authenticated and is_pinned(user.id)):
+                self.alias = pool.choose()
+        return self.alias
+
+
+current_reads = ContextVar('current_reads', default=None)
+
+
+@contextmanager
+def replica_reads(request):
+    """Send the ORM reads made inside the block to a replica, for read-only views"""
+    token = current_reads.set(ReplicaReads(request))
+    try:
+        yield
+    finally:
+        current_reads.reset(token)
+
+
+def reading_from_replica():
+    """Whether the enclosing replica_reads() block has sent its reads to a replica"""
+    reads = current_reads.get()
+    return reads is not None and reads.alias is not None
+
+
+class ReplicaRouter:
+    """
+    Reads inside replica_reads() go to a replica; every other query,
+    including all writes and checkout's transactions, goes to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        reads = current_reads.get()
+        if reads is None:
+            return DEFAULT_DB_ALIAS
+        return reads.resolve() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaReadsMixin:
+    """Serve a DRF view's GET requests from a replica"""
+
+    def get(self, request, *args, **kwargs):
+        with replica_reads(request):
+            return super().get(request, *args, **kwargs)
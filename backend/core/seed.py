@@ -0,0 +1,129 @@
+import random
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from orders.models import Order, OrderItem
+from store.cart import apply_cart_operations
+from store.models import Product
+
+SKU_PREFIX = 'SEED-'
+USERNAME_PREFIX = 'seed_user_'
+SEED_PASSWORD = 'seed-pass-123'
+
+CATEGORIES = [
+    'Electronics', 'Home', 'Kitchen', 'Garden', 'Sports', 'Toys',
+    'Books', 'Clothing', 'Beauty', 'Office', 'Automotive', 'Grocery',
+]
+ADJECTIVES = [
+    'Classic', 'Compact', 'Deluxe', 'Portable', 'Wireless', 'Organic',
+    'Smart', 'Vintage', 'Ergonomic', 'Heavy Duty', 'Premium', 'Eco',
+]
+NOUNS = [
+    'Lamp', 'Chair', 'Headphones', 'Kettle', 'Backpack', 'Blender', 'Desk',
+    'Speaker', 'Jacket', 'Notebook', 'Bottle', 'Camera', 'Keyboard', 'Mug',
+]
+STATUSES = ['processing', 'shipped', 'delivered', 'delivered', 'delivered', 'cancelled']
+
+
+def scaled_counts(scale=1.0):
+    """seed_data() counts for a scale factor (1.0 = the defaults)"""
+    return {
+        'products': int(1000 * scale),
+        'users': max(int(100 * scale), 1),
+        'carts': int(20 * scale),
+        'orders': int(500 * scale),
+    }
+
+
+def seed_data(products=1000, users=100, carts=20, orders=500, seed=0, batch_size=1000):
+    """
+    Add synthetic products, users, carts and orders, deterministically for a
+    given ``seed``. Seeded rows are recognisable by SKU_PREFIX and
+    USERNAME_PREFIX; numbering continues after any earlier seed run.
+
+    Returns {'products': n, 'users': n, 'carts': n, 'orders': n}.
+    """
+    rng = random.Random(seed)
+    product_offset = Product.objects.filter(sku__startswith=SKU_PREFIX).count()
+    user_offset = User.objects.filter(username__startswith=USERNAME_PREFIX).count()
+
+    with transaction.atomic():
+        Product.objects.bulk_create(
+            [
+                Product(
+                    sku=f'{SKU_PREFIX}{n:07d}',
+                    name=f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {n}',
+                    description=f'Synthetic product {n} for load testing.',
+                    price=Decimal(rng.randint(199, 49999)) / 100,
+                    # Mostly in stock, with plenty of headroom for benchmark orders
+                    inventory_count=0 if rng.random() < 0.05 else rng.randint(1000, 100000),
+                    image_url=f'https://example.com/seed/{n}.jpg',
+                    category=rng.choice(CATEGORIES),
+                )
+                for n in range(product_offset, product_offset + products)
+            ],
+            batch_size=batch_size,
+        )
+        # Hashing is deliberately slow, so every seeded user shares one hash
+        password = make_password(SEED_PASSWORD)
+        User.objects.bulk_create(
+            [
+                User(
+                    username=f'{USERNAME_PREFIX}{n:06d}',
+                    email=f'{USERNAME_PREFIX}{n:06d}@example.com',
+                    password=password,
+                )
+                for n in range(user_offset, user_offset + users)
+            ],
+            batch_size=batch_size,
+        )
+
+    catalog = list(
+        Product.objects
+        .filter(sku__startswith=SKU_PREFIX, inventory_count__gt=0)
+        .only('id', 'price', 'name', 'category', 'image_url')
+    )
+    shoppers = list(
+        User.objects.filter(username__startswith=USERNAME_PREFIX).order_by('id').values_list('id', flat=True)
+    )
+    if not catalog or not shoppers:
+        return {'products': products, 'users': users, 'carts': 0, 'orders': 0}
+
+    # Carts go through the cart code so their stock holds stay consistent
+    seeded_carts = 0
+    for user in User.objects.filter(id__in=rng.sample(shoppers, min(carts, len(shoppers)))).order_by('id'):
+        lines = rng.sample(catalog, min(rng.randint(1, 5), len(catalog)))
+        apply_cart_operations(user, [
+            {'op': 'set', 'product_id': product.id, 'quantity': rng.randint(1, 3)}
+            for product in lines
+        ])
+        seeded_carts += 1
+
+    # Order history is written directly; it doesn't touch current stock
+    for start in range(0, orders, batch_size):
+        order_lines = []
+        order_batch = []
+        for _ in range(min(batch_size, orders - start)):
+            lines = [
+                (product, rng.randint(1, 3))
+                for product in rng.sample(catalog, min(rng.randint(1, 4), len(catalog)))
+            ]
+            order_lines.append(lines)
+            order_batch.append(Order(
+                user_id=rng.choice(shoppers),
+                total_amount=sum(product.price * quantity for product, quantity in lines),
+                status=rng.choice(STATUSES),
+                stripe_payment_intent_id=f'pi_seed_{rng.getrandbits(48):012x}',
+                shipping_address=f'{rng.randint(1, 9999)} Main St',
+            ))
+        with transaction.atomic():
+            Order.objects.bulk_create(order_batch)
+            OrderItem.objects.bulk_create([
+                OrderItem.for_product(product, order=order, quantity=quantity, unit_price=product.price)
+                for order, lines in zip(order_batch, order_lines)
+                for product, quantity in lines
+            ], batch_size=batch_size)
+
+    return {'products': products, 'users': users, 'carts': seeded_carts, 'orders': orders}
@@ -0,0 +1,83 @@
+import itertools
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class StripeStubHandler(BaseHTTPRequestHandler):
+    """
+    Answers POST /v1/payment_intents like a successful confirmed payment,
+    and GET /v1/payment_intents/search for intents by metadata order_id.
+    """
+
+    ids = itertools.count(1)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        params = parse_qs(self.rfile.read(length).decode())
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if self.path.rstrip('/') != '/v1/payment_intents':
+            return self.reply(404, {'error': {'type': 'invalid_request_error', 'message': 'Unknown path'}})
+        if params.get('payment_method', [''])[0] == 'pm_card_declined':
+            return self.reply(402, {'error': {
+                'type': 'card_error', 'code': 'card_declined', 'message': 'Your card was declined.'
+            }})
+
+        intent_id = f'pi_stub_{next(self.ids)}'
+        intent = {
+            'id': intent_id,
+            'object': 'payment_intent',
+            'amount': int(params.get('amount', ['0'])[0]),
+            'currency': params.get('currency', ['usd'])[0],
+            'status': 'succeeded',
+            'client_secret': f'{intent_id}_secret_stub',
+            'metadata': {'order_id': params['metadata[order_id]'][0]} if 'metadata[order_id]' in params else {},
+        }
+        self.server.intents.append(intent)
+        self.reply(200, intent)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path.rstrip('/') != '/v1/payment_intents/search':
+            return self.reply(404, {'error': {'type': 'invalid_request_error', 'message': 'Unknown path'}})
+        # Only the query find_payment() sends
+        match = re.search(r"metadata\['order_id'\]:'([^']*)'", parse_qs(url.query).get('query', [''])[0])
+        order_id = match.group(1) if match else None
+        data = [intent for intent in self.server.intents if intent['metadata'].get('order_id') == order_id]
+        self.reply(200, {'object': 'search_result', 'data': data, 'has_more': False})
+
+    def reply(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def handle(self):
+        try:
+            super().handle()
+        except ConnectionError:
+            # The caller timed out and hung up
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stripe_stub(port=0, latency=0.0):
+    """
+    Serve the stub on localhost in a daemon thread. Returns the server;
+    its base URL is f'http://127.0.0.1:{server.server_port}'.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), StripeStubHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.intents = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,629 @@
+import json
+import threading
+import time
+import uuid
+from base64 import urlsafe_b64encode
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+import stripe
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.db import OperationalError, connection, connections
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.test import APIClient, force_authenticate
+
+from orders.models import Order
+from store.models import CartItem, Product, StockReservation
+from .admin import EstimatedCountPaginator
+from .asyncviews import api_response, async_api_view
+from .benchmark import compare, percentile, run_suite
+from .idempotency import idempotent
+from .metrics import Histogram, registry
+from . import replicas
+from .middleware import AdmissionMiddleware, InstrumentationMiddleware, ReplicaPinMiddleware
+from .renderers import ORJSONRenderer
+from .replicas import LAG_SQL, ReplicaPool, ReplicaRouter, replica_reads
+from .seed import SKU_PREFIX, seed_data
+from .stripe_stub import start_stripe_stub
+from .throttling import buckets
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Product.objects.bulk_create([
+            Product(
+                name=f'Product {i}',
+                description='A product',
+                price=Decimal('10.00'),
+                inventory_count=5,
+                image_url='https://example.com/product.jpg',
+            )
+            for i in range(25)
+        ])
+        # Several rows share a timestamp so the id tiebreaker matters
+        now = timezone.now()
+        for index, product in enumerate(Product.objects.order_by('id')):
+            product.created_at = now - timedelta(minutes=index // 3)
+            product.save(update_fields=['created_at'])
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def get(self, url, params=None):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_walks_every_row_once_in_order(self):
+        expected = list(Product.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        seen = []
+        data = self.get(reverse('product-list'), {'pagination': 'cursor', 'page_size': 10})
+        while True:
+            self.assertNotIn('count', data)
+            seen.extend(product['id'] for product in data['results'])
+            if not data['next']:
+                break
+            data = self.get(data['next'])
+        self.assertEqual(seen, expected)
+
+    def test_previous_link_returns_previous_page(self):
+        first = self.get(reverse('product-list'), {'pagination': 'cursor', 'page_size': 10})
+        second = self.get(first['next'])
+        self.assertIsNone(first['previous'])
+        back = self.get(second['previous'])
+        self.assertEqual(back['results'], first['results'])
+
+    def test_optional_count(self):
+        data = self.get(reverse('product-list'), {'pagination': 'cursor', 'count': 'exact'})
+        self.assertEqual(data['count'], 25)
+        data = self.get(reverse('product-list'), {'pagination': 'cursor', 'count': 'estimate'})
+        self.assertIsInstance(data['count'], int)
+
+    def test_page_number_mode_is_the_default(self):
+        data = self.get(reverse('product-list'), {'page': 2})
+        self.assertEqual(data['count'], 25)
+        self.assertEqual(len(data['results']), 12)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('product-list'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+        # Well-formed, but the values don't fit the ordering columns
+        for position in (
+            ['abc', 1], ['2024-01-01T00:00:00+00:00', 'abc'], [{}, []],
+            [None, None], ['2024-01-01T00:00:00+00:00', None],
+        ):
+            cursor = urlsafe_b64encode(json.dumps({'p': position}).encode()).decode()
+            response = self.client.get(reverse('product-list'), {'cursor': cursor})
+            self.assertEqual((response.status_code, response.data), (404, {'detail': 'Invalid cursor'}))
+
+    def test_follows_search_ranking(self):
+        Product.objects.filter(name='Product 7').update(description='product product product')
+        data = self.get(reverse('product-list'), {'search': 'product', 'pagination': 'cursor', 'page_size': 4})
+        seen = []
+        while True:
+            seen.extend(product['id'] for product in data['results'])
+            if not data['next']:
+                break
+            data = self.get(data['next'])
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(len(set(seen)), 25)
+        self.assertEqual(seen[0], Product.objects.get(name='Product 7').id)
+
+
+class SeedDataTests(TestCase):
+    def test_seeds_consistent_data(self):
+        counts = seed_data(products=40, users=5, carts=3, orders=10)
+        self.assertEqual(counts, {'products': 40, 'users': 5, 'carts': 3, 'orders': 10})
+        self.assertEqual(Product.objects.filter(sku__startswith=SKU_PREFIX).count(), 40)
+        self.assertEqual(Order.objects.count(), 10)
+        self.assertFalse(Order.objects.filter(items__isnull=True).exists())
+        # Seeded carts hold their stock like real ones
+        self.assertEqual(
+            sorted(CartItem.objects.values_list('user', 'product', 'quantity')),
+            sorted(StockReservation.objects.values_list('user', 'product', 'quantity')),
+        )
+
+        # A second run adds rows instead of colliding with the first
+        seed_data(products=5, users=2, carts=0, orders=0)
+        self.assertEqual(Product.objects.filter(sku__startswith=SKU_PREFIX).count(), 45)
+        self.assertEqual(User.objects.count(), 7)
+
+
+class BenchmarkTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        seed_data(products=40, users=5, carts=2, orders=10)
+
+    def test_runs_every_scenario(self):
+        stub = start_stripe_stub()
+        self.addCleanup(stub.shutdown)
+        original = stripe.api_base, stripe.api_key
+        self.addCleanup(setattr, stripe, 'api_base', original[0])
+        self.addCleanup(setattr, stripe, 'api_key', original[1])
+        stripe.api_base = f'http://127.0.0.1:{stub.server_port}'
+        stripe.api_key = 'sk_test_benchmark'
+
+        results = run_suite(iterations=3, warmup=1)
+        self.assertIn('create_order', results)
+        self.assertEqual(results['product_list_cached']['queries'], 0)
+        for result in results.values():
+            self.assertEqual(result['iterations'], 3)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        self.assertEqual(Order.objects.filter(stripe_payment_intent_id__startswith='pi_stub_').count(), 4)
+
+    def test_compare_flags_query_and_latency_regressions(self):
+        baseline = {
+            'list': {'p95_ms': 10.0, 'queries': 2},
+            'detail': {'p95_ms': 1.0, 'queries': 1},
+        }
+        results = {
+            'list': {'p95_ms': 16.0, 'queries': 3},
+            # 2.5x slower, but within the noise floor
+            'detail': {'p95_ms': 2.5, 'queries': 1},
+            'new': {'p95_ms': 50.0, 'queries': 9},
+        }
+        self.assertEqual(compare(results, baseline), [
+            'list: queries 2 -> 3',
+            'list: p95 10.0ms -> 16.0ms',
+        ])
+        self.assertEqual(compare(results, baseline, tolerance=1.0), ['list: queries 2 -> 3'])
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 99), 7)
+
+
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.client = APIClient()
+        self.product = Product.objects.create(
+            name='Lamp', description='A lamp', price=Decimal('10.00'),
+            inventory_count=5, image_url='https://example.com/lamp.jpg',
+        )
+
+    def test_records_requests_by_route(self):
+        response = self.client.get(reverse('product-detail', args=[self.product.id]))
+        self.assertRegex(response['Server-Timing'], r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="1 queries"$')
+        self.client.get(reverse('product-detail', args=[999999]))
+
+        stats = registry.routes[('GET', 'api/products/<int:pk>/')]
+        self.assertEqual(stats.statuses, {200: 1, 404: 1})
+        self.assertEqual(stats.queries.count, 2)
+        self.assertEqual(stats.queries.sum, 2)
+        self.assertGreater(stats.response_bytes, 0)
+
+    def test_metrics_endpoint(self):
+        self.client.get(reverse('product-list'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        with override_settings(METRICS_TOKEN='scrape-secret'):
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+            response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn('http_requests_total{method="GET",route="api/products/",status="200"} 1', body)
+        self.assertIn('http_request_db_queries_bucket{method="GET",route="api/products/",le="+Inf"} 1', body)
+        self.assertIn('catalog_cache_events_total{event="misses"}', body)
+
+    def test_logs_repeated_query_shapes(self):
+        def view(request):
+            for product in Product.objects.all():
+                for _ in range(5):
+                    Product.objects.get(pk=product.pk)
+            return HttpResponse('ok')
+
+        middleware = InstrumentationMiddleware(view)
+        with self.assertLogs('core.middleware', 'WARNING') as logs:
+            response = middleware(RequestFactory().get('/anything'))
+        self.assertIn('desc="6 queries"', response['Server-Timing'])
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('Possible N+1 on GET <unmatched>: 5 identical queries: SELECT', logs.output[0])
+
+    def test_async_views_stay_async(self):
+        async def view(request):
+            await Product.objects.filter(pk=0).aexists()
+            return HttpResponse('ok')
+
+        middleware = InstrumentationMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = async_to_sync(middleware)(RequestFactory().get('/anything'))
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram((1, 5))
+        for value in (0, 1, 3, 9):
+            histogram.observe(value)
+        self.assertEqual(histogram.render('q', 'a="b"'), [
+            'q_bucket{a="b",le="1"} 2',
+            'q_bucket{a="b",le="5"} 3',
+            'q_bucket{a="b",le="+Inf"} 4',
+            'q_sum{a="b"} 13',
+            'q_count{a="b"} 4',
+        ])
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    def setUp(self):
+        Product.objects.bulk_create([
+            Product(
+                name=f'Product {i}', description='A product', price=Decimal('1.00'),
+                image_url='https://example.com/product.jpg',
+            )
+            for i in range(30)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE store_product')
+
+    def count(self, queryset):
+        paginator = EstimatedCountPaginator(queryset, 10)
+        with CaptureQueriesContext(connection) as queries:
+            count = paginator.count
+        return count, [query['sql'].split()[0] for query in queries]
+
+    def test_small_results_are_counted_exactly(self):
+        with override_settings(ADMIN_ESTIMATED_COUNT_THRESHOLD=1000):
+            self.assertEqual(self.count(Product.objects.all()), (30, ['EXPLAIN', 'SELECT']))
+
+    def test_large_results_use_the_estimate(self):
+        with override_settings(ADMIN_ESTIMATED_COUNT_THRESHOLD=10):
+            count, queries = self.count(Product.objects.all())
+        self.assertEqual(queries, ['EXPLAIN'])
+        self.assertEqual(count, 30)
+        self.assertEqual(EstimatedCountPaginator([1, 2, 3], 2).count, 3)
+
+    def test_pages_past_a_short_estimate_still_load(self):
+        queryset = Product.objects.order_by('id')
+        ids = list(queryset.values_list('id', flat=True))
+        with override_settings(ADMIN_ESTIMATED_COUNT_THRESHOLD=10), \
+                mock.patch('core.admin.estimate_count', return_value=12):
+            paginator = EstimatedCountPaginator(queryset, 10)
+            self.assertEqual(paginator.num_pages, 2)
+            page = paginator.page(2)
+            self.assertEqual([product.id for product in page], ids[10:20])
+            # The count now reaches the next page
+            self.assertTrue(page.has_next())
+            self.assertEqual(paginator.num_pages, 3)
+            page = paginator.page(3)
+            self.assertEqual([product.id for product in page], ids[20:])
+            self.assertFalse(page.has_next())
+            self.assertEqual(list(paginator.page(4)), [])
+
+
+class ORJSONRendererTests(TestCase):
+    def test_matches_json_renderer(self):
+        data = {
+            'price': Decimal('19.90'),
+            'total': 12.5,
+            'created_at': timezone.now(),
+            'day': timezone.now().date(),
+            'id': uuid.uuid4(),
+            'name': 'Caf\u00e9 \u2028 \u2029 "quoted"',
+            'tags': ['a', None, True],
+            1: {'nested': 3},
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_indented_output_is_left_to_json_renderer(self):
+        content = ORJSONRenderer().render({'a': 1}, 'application/json; indent=4')
+        self.assertEqual(content, b'{\n    "a": 1\n}')
+
+
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.pool = ReplicaPool(['replica1', 'replica2'])
+        patcher = mock.patch.object(replicas, 'pool', self.pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.lags = {'replica1': 0, 'replica2': 0}
+        patcher = mock.patch.object(ReplicaPool, 'lag', side_effect=lambda alias: self.lags[alias])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.router = ReplicaRouter()
+        self.user = User.objects.create_user(username='reader', password='pass12345')
+
+    def request(self, user=None):
+        request = RequestFactory().get('/anything')
+        request.user = user or AnonymousUser()
+        return request
+
+    def test_only_reads_inside_replica_reads_use_replicas(self):
+        self.assertEqual(self.router.db_for_read(Product), 'default')
+        with replica_reads(self.request()):
+            self.assertIn(self.router.db_for_read(Product), ['replica1', 'replica2'])
+            self.assertEqual(self.router.db_for_write(Product), 'default')
+        self.assertEqual(self.router.db_for_read(Product), 'default')
+
+    def test_skips_lagging_and_unreachable_replicas(self):
+        self.lags['replica2'] = 60
+        with self.assertLogs('core.replicas', 'WARNING') as logs:
+            for _ in range(5):
+                with replica_reads(self.request()):
+                    self.assertEqual(self.router.db_for_read(Product), 'replica1')
+        self.assertEqual(logs.output, ['WARNING:core.replicas:Replica replica2 is 60.0s behind the primary'])
+
+        self.pool.checked_at = None
+        ReplicaPool.lag.side_effect = OperationalError('connection refused')
+        with self.assertLogs('core.replicas', 'WARNING'):
+            with replica_reads(self.request()):
+                self.assertEqual(self.router.db_for_read(Product), 'default')
+
+    def test_health_is_rechecked_after_the_interval(self):
+        with replica_reads(self.request()):
+            self.router.db_for_read(Product)
+        self.assertEqual(ReplicaPool.lag.call_count, 2)
+        with replica_reads(self.request()):
+            self.router.db_for_read(Product)
+        self.assertEqual(ReplicaPool.lag.call_count, 2)
+        with override_settings(DB_REPLICA_CHECK_INTERVAL=0), replica_reads(self.request()):
+            self.router.db_for_read(Product)
+        self.assertEqual(ReplicaPool.lag.call_count, 4)
+
+    def test_writers_read_from_the_primary(self):
+        def view(request):
+            request.user = self.user
+            return HttpResponse(status=201 if request.method == 'POST' else 400)
+
+        middleware = ReplicaPinMiddleware(view)
+        middleware(RequestFactory().put('/api/cart/1/'))
+        with replica_reads(self.request(self.user)):
+            self.assertNotEqual(self.router.db_for_read(CartItem), 'default')
+
+        middleware(RequestFactory().post('/api/orders/create/'))
+        with replica_reads(self.request(self.user)):
+            self.assertEqual(self.router.db_for_read(CartItem), 'default')
+        other = User.objects.create_user(username='other', password='pass12345')
+        with replica_reads(self.request(other)):
+            self.assertNotEqual(self.router.db_for_read(CartItem), 'default')
+
+    def test_lag_query_treats_a_primary_as_current(self):
+        with connection.cursor() as cursor:
+            cursor.execute(LAG_SQL)
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+
+class TokenBucketTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.now = 1000.0
+        patcher = mock.patch('core.throttling.time.time', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_bursts_then_refills_at_the_rate(self):
+        takes = [buckets.take('k', 3, 0.5) for _ in range(4)]
+        self.assertEqual(takes, [(True, 0), (True, 0), (True, 0), (False, 2.0)])
+        self.now += 1
+        self.assertEqual(buckets.take('k', 3, 0.5), (False, 1.0))
+        self.now += 1
+        self.assertEqual(buckets.take('k', 3, 0.5), (True, 0))
+        # Idle time refills up to the capacity, not beyond
+        self.now += 3600
+        self.assertEqual([buckets.take('k', 3, 0.5)[0] for _ in range(4)], [True, True, True, False])
+        self.assertEqual(buckets.take('other', 3, 0.5), (True, 0))
+
+
+class AdmissionTests(TestCase):
+    def setUp(self):
+        self.middleware = AdmissionMiddleware(lambda request: HttpResponse('ok'))
+        self.factory = RequestFactory()
+
+    def statuses(self, in_flight):
+        self.middleware.in_flight = in_flight
+        paths = [reverse('product-list'), reverse('order-list'), reverse('create-order'), '/unknown/']
+        return [self.middleware(self.factory.get(path)).status_code for path in paths]
+
+    def test_sheds_low_priority_requests_first(self):
+        with override_settings(ADMISSION_MAX_IN_FLIGHT=10):
+            self.middleware = AdmissionMiddleware(lambda request: HttpResponse('ok'))
+            self.assertEqual(self.statuses(4), [200, 200, 200, 200])
+            self.assertEqual(self.statuses(5), [503, 200, 200, 200])
+            self.assertEqual(self.statuses(8), [503, 503, 200, 503])
+            self.assertEqual(self.statuses(500), [503, 503, 200, 503])
+        response = self.middleware(self.factory.get(reverse('product-list')))
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(json.loads(response.content), {'error': 'The server is busy, please retry shortly'})
+
+    def test_sheds_within_a_wsgi_workers_threads(self):
+        # Five of a gunicorn worker's eight threads are busy browsing
+        busy = threading.Semaphore(0)
+        release = threading.Event()
+
+        def view(request):
+            busy.release()
+            release.wait(5)
+            return HttpResponse('ok')
+
+        with override_settings(ADMISSION_MAX_IN_FLIGHT=8):
+            middleware = AdmissionMiddleware(view)
+        threads = [
+            threading.Thread(target=middleware, args=(self.factory.get(reverse('product-list')),))
+            for _ in range(4)
+        ]
+        threads.append(threading.Thread(target=middleware, args=(self.factory.get(reverse('order-list')),)))
+        for thread in threads:
+            thread.start()
+        for _ in threads:
+            self.assertTrue(busy.acquire(timeout=5))
+        try:
+            self.assertEqual(middleware.in_flight, 5)
+            self.assertEqual(middleware(self.factory.get(reverse('product-detail', args=[1]))).status_code, 503)
+        finally:
+            release.set()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(middleware.in_flight, 0)
+
+    def test_counts_requests_in_flight(self):
+        seen = []
+
+        def view(request):
+            seen.append(middleware.in_flight)
+            raise ValueError
+
+        middleware = AdmissionMiddleware(view)
+        with self.assertRaises(ValueError):
+            middleware(self.factory.get('/'))
+        self.assertEqual((seen, middleware.in_flight), ([1], 0))
+
+
+@override_settings(IDEMPOTENCY_WAIT_SECONDS=5)
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.user = User(id=1, username='buyer')
+        self.calls = []
+        self.view = self.make_view()
+
+    def make_view(self, status_codes=None):
+        @api_view(['POST'])
+        @permission_classes([])
+        @idempotent('test')
+        def view(request):
+            self.calls.append(request.data)
+            status = status_codes.pop(0) if status_codes else 201
+            return Response({'call': len(self.calls)}, status=status)
+        return view
+
+    def post(self, data=None, key='key-1', user=None, view=None):
+        headers = {'Idempotency-Key': key} if key is not None else {}
+        request = self.factory.post(
+            '/checkout/', data or {'item': 1}, content_type='application/json', headers=headers
+        )
+        force_authenticate(request, user or self.user)
+        response = (view or self.view)(request)
+        response.render()
+        return response
+
+    def test_replays_the_first_response(self):
+        first = self.post()
+        with self.assertNumQueries(0):
+            second = self.post()
+        self.assertEqual((second.status_code, json.loads(second.content)), (201, {'call': 1}))
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertFalse(first.has_header('Idempotent-Replayed'))
+        # Keys are per user, and requests without one always run
+        self.assertEqual(json.loads(self.post(user=User(id=2)).content), {'call': 2})
+        self.assertEqual(json.loads(self.post(key=None).content), {'call': 3})
+        self.assertEqual(json.loads(self.post(key=None).content), {'call': 4})
+
+    def test_rejects_reuse_and_bad_keys(self):
+        self.post()
+        self.assertEqual(self.post({'item': 2}).status_code, 422)
+        self.assertEqual(self.post(key='k' * 256).status_code, 400)
+        self.assertEqual(len(self.calls), 1)
+
+    def test_runs_again_after_a_server_error(self):
+        view = self.make_view([503, 201])
+        self.assertEqual(self.post(view=view).status_code, 503)
+        self.assertEqual(self.post(view=view).status_code, 201)
+        self.assertEqual(self.post(view=view)['Idempotent-Replayed'], 'true')
+        self.assertEqual(len(self.calls), 2)
+
+    def test_duplicates_wait_for_the_first_request(self):
+        started, finish = threading.Event(), threading.Event()
+
+        @api_view(['POST'])
+        @permission_classes([])
+        @idempotent('test')
+        def slow_view(request):
+            self.calls.append(request.data)
+            started.set()
+            finish.wait(5)
+            return Response({'call': len(self.calls)}, status=201)
+
+        responses = []
+        first = threading.Thread(target=lambda: responses.append(self.post(view=slow_view)))
+        first.start()
+        started.wait(5)
+        duplicate = threading.Thread(target=lambda: responses.append(self.post(view=slow_view)))
+        duplicate.start()
+        time.sleep(0.2)
+        finish.set()
+        first.join(5)
+        duplicate.join(5)
+        self.assertEqual([json.loads(response.content) for response in responses], [{'call': 1}] * 2)
+        self.assertEqual(responses[1]['Idempotent-Replayed'], 'true')
+        self.assertEqual(len(self.calls), 1)
+
+    @override_settings(IDEMPOTENCY_WAIT_SECONDS=0)
+    def test_gives_up_on_a_request_still_running(self):
+        duplicates = []
+
+        @api_view(['POST'])
+        @permission_classes([])
+        @idempotent('test')
+        def reentrant_view(request):
+            duplicates.append(self.post(view=reentrant_view))
+            return Response({}, status=201)
+
+        self.post(view=reentrant_view)
+        self.assertEqual(duplicates[0].status_code, 409)
+        self.assertEqual(duplicates[0]['Retry-After'], '2')
+
+    async def test_async_views(self):
+        @async_api_view(['POST'], permission_classes=[])
+        @idempotent('test')
+        async def view(request):
+            self.calls.append(request.data)
+            return api_response({'call': len(self.calls)}, status=201)
+
+        responses = []
+        for _ in range(2):
+            request = AsyncRequestFactory().post(
+                '/checkout/', {'item': 1}, content_type='application/json', headers={'Idempotency-Key': 'key-1'}
+            )
+            force_authenticate(request, self.user)
+            responses.append(await view(request))
+        self.assertEqual([response.content for response in responses], [b'{"call":1}'] * 2)
+        self.assertEqual(responses[1]['Idempotent-Replayed'], 'true')
+
+
+@skipUnless('replica1' in settings.DATABASES, 'Set DB_REPLICAS to test against a replica')
+class ReplicaDatabaseTests(TransactionTestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader', password='pass12345')
+        self.product = Product.objects.create(
+            name='Lamp', description='A lamp', price=Decimal('10.00'),
+            inventory_count=5, image_url='https://example.com/lamp.jpg',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def queries(self, path):
+        with CaptureQueriesContext(connections['replica1']) as replica, \
+                CaptureQueriesContext(connection) as primary:
+            self.assertEqual(self.client.get(path).status_code, 200)
+        return len(primary), len(replica)
+
+    def test_reads_move_to_the_primary_after_a_write(self):
+        primary, replica = self.queries(reverse('product-list'))
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+        self.assertEqual(self.queries(reverse('order-list')), (0, 1))
+
+        response = self.client.post(reverse('add-to-cart'), {'product_id': self.product.id, 'quantity': 1})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.queries(reverse('order-list')), (1, 0))
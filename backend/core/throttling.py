@@ -0,0 +1,118 @@
+import math
+import threading
+import time
+
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
+from rest_framework.settings import api_settings
+from rest_framework.throttling import AnonRateThrottle, SimpleRateThrottle, UserRateThrottle
+
+# Refill the bucket for the time since its last request, then take a
+# token if there is one. Returns {allowed, tokens left}; the tokens go
+# back as a string because Redis truncates Lua numbers to integers.
+TAKE_TOKEN_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'stamp')
+local tokens = tonumber(bucket[1]) or capacity
+local stamp = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - stamp) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'stamp', tostring(now))
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[4]))
+return {allowed, tostring(tokens)}
+"""
+
+
+class TokenBuckets:
+    """
+    Token buckets kept in the default cache. With Redis each take is one
+    atomic script, so a limit holds across every process; other backends
+    update under a process-local lock, which is exact for the
+    per-process local-memory cache.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._script = None
+
+    def take(self, key, capacity, rate):
+        """
+        Take a token from ``key``'s bucket, which holds up to ``capacity``
+        and refills at ``rate`` tokens a second. Returns whether a token
+        was taken and the seconds until the next one.
+        """
+        now = time.time()
+        # An idle bucket is full again by the time it expires
+        timeout = math.ceil(capacity / rate) + 1
+        backend = caches['default']
+        if isinstance(backend, RedisCache):
+            allowed, tokens = self.take_redis(backend, key, capacity, rate, now, timeout)
+        else:
+            allowed, tokens = self.take_local(backend, key, capacity, rate, now, timeout)
+        return allowed, 0 if allowed else (1 - tokens) / rate
+
+    def take_redis(self, backend, key, capacity, rate, now, timeout):
+        client = backend._cache.get_client(key, write=True)
+        if self._script is None:
+            self._script = client.register_script(TAKE_TOKEN_SCRIPT)
+        allowed, tokens = self._script(
+            keys=[backend.make_and_validate_key(key)],
+            args=[capacity, rate, now, timeout],
+            client=client,
+        )
+        return bool(allowed), float(tokens)
+
+    def take_local(self, backend, key, capacity, rate, now, timeout):
+        with self._lock:
+            tokens, stamp = backend.get(key) or (capacity, now)
+            tokens = min(capacity, tokens + max(0, now - stamp) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            backend.set(key, (tokens, now), timeout=timeout)
+        return allowed, tokens
+
+
+buckets = TokenBuckets()
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """
+    SimpleRateThrottle as a token bucket in the shared cache: a rate of
+    'N/period' allows bursts of N requests and refills evenly over the
+    period. A scope without a rate in DEFAULT_THROTTLE_RATES isn't limited.
+    """
+
+    cache_format = 'throttle:%(scope)s:%(ident)s'
+
+    def get_rate(self):
+        # Read per request, so settings overrides and THROTTLE_ENABLED apply
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        allowed, self.retry_after = buckets.take(
+            self.key, self.num_requests, self.num_requests / self.duration
+        )
+        return allowed
+
+    def wait(self):
+        return self.retry_after
+
+
+class AnonBucketThrottle(AnonRateThrottle, TokenBucketThrottle):
+    """Limits anonymous clients by IP address (the 'anon' rate)"""
+
+
+class UserBucketThrottle(UserRateThrottle, TokenBucketThrottle):
+    """Limits each user, or each IP address for anonymous clients (the 'user' rate)"""
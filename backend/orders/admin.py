@@ -1,25 +1,31 @@
 # orders/admin.py
 from django.contrib import admin
-from .models import Order, OrderItem
+from django.shortcuts import redirect
+from django.urls import reverse
+from django.utils import timezone
+from core.admin import LargeTableAdmin
+from store.models import Product
+from .models import Order, OrderHistory, OrderHistoryItem, OrderItem, OutboxMessage
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 0
-    readonly_fields = ['total_price']
-    fields = ['product', 'quantity', 'unit_price', 'total_price']
+    readonly_fields = ['product_name', 'total_price']
+    fields = ['product_name', 'quantity', 'unit_price', 'total_price']
     
     def total_price(self, obj):
         return f"${obj.total_price:.2f}"
     total_price.short_description = "Total Price"
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(LargeTableAdmin):
     list_display = [
         'id', 'user', 'total_amount', 'status', 
         'created_at', 'stripe_payment_intent_id'
     ]
+    list_select_related = ['user']
     list_filter = ['status', 'created_at', 'updated_at']
-    search_fields = ['user__username', 'user__email', 'stripe_payment_intent_id']
+    search_fields = ['^user__username', '=user__email', '=stripe_payment_intent_id']
     list_editable = ['status']
     readonly_fields = ['stripe_payment_intent_id', 'created_at', 'updated_at']
     ordering = ['-created_at']
@@ -44,14 +50,104 @@ class OrderAdmin(admin.ModelAdmin):
     def total_amount(self, obj):
         return f"${obj.total_amount:.2f}"
     total_amount.short_description = "Total Amount"
+    
+    def change_view(self, request, object_id, form_url='', extra_context=None):
+        # Links to an order that has since been archived open it read-only
+        if (
+            object_id.isdigit()
+            and not Order.objects.filter(pk=object_id).exists()
+            and OrderHistory.objects.filter(pk=object_id).exists()
+        ):
+            return redirect(reverse('admin:orders_orderhistory_change', args=[object_id]))
+        return super().change_view(request, object_id, form_url, extra_context)
+
+class OrderHistoryItemInline(admin.TabularInline):
+    model = OrderHistoryItem
+    extra = 0
+    fields = ['product_name', 'product_category', 'quantity', 'unit_price']
+    readonly_fields = fields
+    
+    def has_add_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(OrderHistory)
+class OrderHistoryAdmin(LargeTableAdmin):
+    """Live and archived orders together, read-only, for looking up any order"""
+    list_display = [
+        'id', 'user', 'total_amount', 'status', 'archived',
+        'created_at', 'stripe_payment_intent_id'
+    ]
+    list_select_related = ['user']
+    list_filter = ['archived', 'status', 'created_at']
+    search_fields = ['^user__username', '=user__email', '=stripe_payment_intent_id']
+    ordering = ['-created_at']
+    inlines = [OrderHistoryItemInline]
+    
+    def get_search_results(self, request, queryset, search_term):
+        # A bare number is an order number
+        if search_term.strip().isdigit():
+            return queryset.filter(pk=int(search_term)), False
+        return super().get_search_results(request, queryset, search_term)
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+class ProductCategoryFilter(admin.SimpleListFilter):
+    """
+    Filter order lines by their snapshotted category, offering the
+    catalog's categories rather than scanning every line for its values
+    """
+    title = 'product category'
+    parameter_name = 'product_category'
+
+    def lookups(self, request, model_admin):
+        categories = Product.objects.order_by('category').values_list('category', flat=True).distinct()
+        return [(category, category) for category in categories]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(product_category=self.value())
+        return queryset
 
 @admin.register(OrderItem)
-class OrderItemAdmin(admin.ModelAdmin):
-    list_display = ['id', 'order', 'product', 'quantity', 'unit_price', 'total_price']
-    list_filter = ['order__created_at', 'product__category']
-    search_fields = ['order__id', 'product__name', 'order__user__username']
-    readonly_fields = ['total_price']
+class OrderItemAdmin(LargeTableAdmin):
+    list_display = ['id', 'order', 'product_name', 'quantity', 'unit_price', 'total_price']
+    # Order.__str__ shows the username
+    list_select_related = ['order__user']
+    list_filter = ['order__created_at', ProductCategoryFilter]
+    search_fields = ['^product_name', '^order__user__username']
+    readonly_fields = ['product', 'product_name', 'product_category', 'product_image_url', 'total_price']
+    
+    def get_search_results(self, request, queryset, search_term):
+        # A bare number is an order number, looked up through the order_id index
+        if search_term.strip().isdigit():
+            return queryset.filter(order_id=int(search_term)), False
+        return super().get_search_results(request, queryset, search_term)
     
     def total_price(self, obj):
         return f"${obj.total_price:.2f}"
-    total_price.short_description = "Total Price"
\ No newline at end of file
+    total_price.short_description = "Total Price"
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(LargeTableAdmin):
+    list_display = ['id', 'kind', 'status', 'attempts', 'available_at', 'created_at']
+    list_filter = ['status', 'kind']
+    readonly_fields = ['kind', 'payload', 'attempts', 'last_error', 'created_at', 'updated_at']
+    ordering = ['-id']
+    actions = ['retry_messages']
+    
+    def retry_messages(self, request, queryset):
+        updated = queryset.exclude(status='sent').update(
+            status='pending', attempts=0, available_at=timezone.now()
+        )
+        self.message_user(request, f"{updated} message(s) queued for retry.")
+    retry_messages.short_description = "Retry selected messages"
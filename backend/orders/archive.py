@@ -0,0 +1,57 @@
+import calendar
+
+from django.db import connection, transaction
+from django.utils import timezone
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+
+# Orders that won't change again and can leave the live tables
+CLOSED_STATUSES = ('delivered', 'cancelled')
+
+CLAIM_SQL = """
+    SELECT id FROM orders_order
+    WHERE status = ANY(%s) AND created_at < %s
+    ORDER BY created_at
+    LIMIT %s
+    FOR UPDATE SKIP LOCKED
+"""
+
+
+def columns(model):
+    return ', '.join(field.column for field in model._meta.concrete_fields)
+
+
+def archive_cutoff(months):
+    """The same time ``months`` calendar months ago; older orders can be archived"""
+    now = timezone.now()
+    year, month = divmod(now.year * 12 + now.month - 1 - months, 12)
+    day = min(now.day, calendar.monthrange(year, month + 1)[1])
+    return now.replace(year=year, month=month + 1, day=day)
+
+
+def archive_batch(cutoff, batch_size):
+    """
+    Move up to ``batch_size`` closed orders created before ``cutoff``, with
+    their lines, into the archive tables. Returns the number moved.
+
+    Rows are copied and deleted with plain SQL, so the delete signals that
+    back orders out of the sales rollups don't fire: an archived order's
+    sales still count. SKIP LOCKED leaves orders being updated for a later
+    batch.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(CLAIM_SQL, [list(CLOSED_STATUSES), cutoff, batch_size])
+        order_ids = [row[0] for row in cursor.fetchall()]
+        if not order_ids:
+            return 0
+        for archive, live, key in [
+            (ArchivedOrder, Order, 'id'),
+            (ArchivedOrderItem, OrderItem, 'order_id'),
+        ]:
+            cursor.execute(
+                f'INSERT INTO {archive._meta.db_table} ({columns(archive)}) '
+                f'SELECT {columns(archive)} FROM {live._meta.db_table} WHERE {key} = ANY(%s)',
+                [order_ids],
+            )
+        cursor.execute(f'DELETE FROM {OrderItem._meta.db_table} WHERE order_id = ANY(%s)', [order_ids])
+        cursor.execute(f'DELETE FROM {Order._meta.db_table} WHERE id = ANY(%s)', [order_ids])
+    return len(order_ids)
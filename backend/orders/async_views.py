@@ -0,0 +1,69 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from core.asyncviews import api_response, async_api_view
+from core.idempotency import idempotent
+from . import checkout, payments
+from .serializers import OrderSerializer, OrderCreateSerializer
+from .views import order_details_queryset
+
+
+def order_payload(user, order_id):
+    return OrderSerializer(order_details_queryset(user).get(pk=order_id)).data
+
+
+async def run_to_completion(function, *args):
+    """
+    Run a checkout step in a worker thread, shielded from cancellation: if
+    the client disconnects, the request is cancelled but the step still
+    finishes, so a paid order is confirmed and a failed one releases its stock.
+    """
+    return await asyncio.shield(sync_to_async(function)(*args))
+
+
+@async_api_view(['POST'], permission_classes=[IsAuthenticated])
+@idempotent('create-order')
+async def create_order(request):
+    """
+    create_order for the ASGI server: the Stripe call is awaited, so a
+    checkout waiting on the payment provider doesn't hold a thread.
+    """
+    serializer = OrderCreateSerializer(data=request.data)
+    if not serializer.is_valid():
+        return api_response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        order = await sync_to_async(checkout.reserve_order)(
+            request.user, serializer.validated_data['shipping_address']
+        )
+    except checkout.InsufficientStockError as e:
+        return api_response(
+            {'error': str(e), 'lines': e.lines},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except checkout.CheckoutError as e:
+        return api_response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        payment_intent = await payments.create_payment_intent(
+            int(order.total_amount * 100),  # Convert to cents
+            serializer.validated_data['payment_method_id'],
+            order.pk,
+        )
+    except payments.PaymentOutcomeUnknown:
+        # Stripe may have charged the card, so the order keeps its stock
+        # until resolve_pending_orders settles it against the PaymentIntent,
+        # as it does when the client disconnects while Stripe is called
+        data = await sync_to_async(order_payload)(request.user, order.pk)
+        return api_response(data, status=status.HTTP_202_ACCEPTED)
+    except payments.PaymentError as e:
+        await run_to_completion(checkout.release_order, order)
+        return api_response({'error': f'Payment failed: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+
+    # The card has been charged. Notifications are queued with the
+    # confirmation, as in the sync view.
+    await run_to_completion(checkout.confirm_order, order, payment_intent['id'])
+    data = await sync_to_async(order_payload)(request.user, order.pk)
+    return api_response(data, status=status.HTTP_201_CREATED)
@@ -0,0 +1,135 @@
+from django.db import transaction
+from store.inventory import adjust_stock, consume_stock, lock_products
+from store.models import CartItem, StockReservation
+from . import payments
+from .models import Order, OrderItem
+from .outbox import enqueue_order_notifications
+
+
+class CheckoutError(Exception):
+    pass
+
+
+class EmptyCartError(CheckoutError):
+    def __init__(self):
+        super().__init__('Cart is empty')
+
+
+class InsufficientStockError(CheckoutError):
+    """Raised with the cart lines that could not be fulfilled"""
+
+    def __init__(self, lines):
+        self.lines = lines
+        super().__init__('Not enough inventory')
+
+
+def reserve_order(user, shipping_address):
+    """
+    Create a pending order from the user's cart and take its stock,
+    converting the user's cart reservations into the decrement.
+
+    Raises EmptyCartError, or InsufficientStockError listing every line
+    that can't be fulfilled, in which case nothing is written.
+    """
+    with transaction.atomic():
+        cart_items = list(CartItem.objects.filter(user_id=user.id).order_by('product_id'))
+        if not cart_items:
+            raise EmptyCartError()
+
+        products = lock_products([item.product_id for item in cart_items])
+        reservations = StockReservation.objects.select_for_update().filter(
+            user_id=user.id, product_id__in=products
+        )
+        held = dict(reservations.values_list('product_id', 'quantity'))
+        shortages = []
+        for item in cart_items:
+            product = products.get(item.product_id)
+            available = product.available_count + held.get(item.product_id, 0) if product else 0
+            if available < item.quantity:
+                shortages.append({
+                    'product_id': item.product_id,
+                    'name': product.name if product else None,
+                    'requested': item.quantity,
+                    'available': available,
+                })
+        if shortages:
+            raise InsufficientStockError(shortages)
+
+        quantities = {item.product_id: item.quantity for item in cart_items}
+        if consume_stock(quantities, held) != len(quantities):
+            # Can't happen while the rows are locked, but never oversell
+            raise CheckoutError('Inventory changed during checkout')
+        reservations.delete()
+
+        order = Order.objects.create(
+            user_id=user.id,
+            total_amount=sum(products[item.product_id].price * item.quantity for item in cart_items),
+            shipping_address=shipping_address,
+            status='pending'
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem.for_product(
+                products[item.product_id],
+                order=order,
+                quantity=item.quantity,
+                unit_price=products[item.product_id].price
+            )
+            for item in cart_items
+        ])
+    return order
+
+
+def confirm_order(order, payment_intent_id):
+    """
+    Mark a reserved order as paid, clear the purchased cart lines and
+    queue its notifications, all in one transaction.
+    """
+    with transaction.atomic():
+        order.status = 'processing'
+        order.stripe_payment_intent_id = payment_intent_id
+        order.save(update_fields=['status', 'stripe_payment_intent_id', 'updated_at'])
+        CartItem.objects.filter(
+            user_id=order.user_id,
+            product_id__in=order.items.values('product_id')
+        ).delete()
+        enqueue_order_notifications(order)
+
+
+def release_order(order):
+    """Give a reserved order's stock back and discard the order"""
+    with transaction.atomic():
+        quantities = dict(order.items.values_list('product_id', 'quantity'))
+        lock_products(quantities)
+        adjust_stock(quantities)
+        order.delete()
+
+
+
+def resolve_stale_orders(older_than):
+    """
+    Settle orders a checkout left pending since before ``older_than``, e.g.
+    because its process died between taking the stock and confirming:
+    confirm those Stripe has a succeeded payment for and give the others'
+    stock back. Orders Stripe can't be asked about are left for the next
+    run. Returns counts of confirmed, released and unresolved orders.
+    """
+    counts = {'confirmed': 0, 'released': 0, 'unresolved': 0}
+    stale = Order.objects.filter(status='pending', created_at__lt=older_than)
+    for order_id in stale.order_by('id').values_list('id', flat=True):
+        with transaction.atomic():
+            # Skip orders another sweeper is on, or that were settled meanwhile
+            order = stale.select_for_update(skip_locked=True).filter(pk=order_id).first()
+            if order is None:
+                continue
+            try:
+                payment = payments.find_payment(order.pk)
+            except payments.PaymentError:
+                counts['unresolved'] += 1
+                continue
+            if payment is not None:
+                confirm_order(order, payment['id'])
+                counts['confirmed'] += 1
+            else:
+                release_order(order)
+                counts['released'] += 1
+    return counts
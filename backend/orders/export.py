@@ -0,0 +1,112 @@
+import csv
+import io
+import zlib
+
+import orjson
+from analytics.rollups import day_bounds
+from .models import OrderHistoryItem
+
+# One row per order line, with its order's columns repeated
+EXPORT_FIELDS = [
+    ('order_id', 'order_id'),
+    ('created_at', 'order__created_at'),
+    ('status', 'order__status'),
+    ('archived', 'order__archived'),
+    ('username', 'order__user__username'),
+    ('email', 'order__user__email'),
+    ('order_total', 'order__total_amount'),
+    ('stripe_payment_intent_id', 'order__stripe_payment_intent_id'),
+    ('line_id', 'id'),
+    ('product_id', 'product_id'),
+    ('product_name', 'product_name'),
+    ('product_category', 'product_category'),
+    ('quantity', 'quantity'),
+    ('unit_price', 'unit_price'),
+]
+COLUMNS = [name for name, _ in EXPORT_FIELDS] + ['line_total']
+
+# Output formats and their content types
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def export_rows(start, end, statuses=None, using=None, chunk_size=2000):
+    """
+    The order lines of orders created on the local dates start..end
+    (inclusive), live and archived, oldest first. Rows are fetched through
+    a server-side cursor ``chunk_size`` at a time, so memory stays flat
+    however many there are.
+    """
+    low, high = day_bounds(start, end)
+    lines = OrderHistoryItem.objects.using(using).filter(
+        order__created_at__gte=low, order__created_at__lt=high
+    )
+    if statuses:
+        lines = lines.filter(order__status__in=statuses)
+    rows = (
+        lines.order_by('order__created_at', 'order_id', 'id')
+        .values_list(*[lookup for _, lookup in EXPORT_FIELDS])
+        .iterator(chunk_size=chunk_size)
+    )
+    for row in rows:
+        # quantity * unit_price
+        yield (*row, row[-2] * row[-1])
+
+
+def batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def encode_csv(rows, batch_size):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    created_at = COLUMNS.index('created_at')
+    for batch in batches(rows, batch_size):
+        writer.writerows(
+            (*row[:created_at], row[created_at].isoformat(), *row[created_at + 1:]) for row in batch
+        )
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        # Header only
+        yield buffer.getvalue().encode()
+
+
+def encode_ndjson(rows, batch_size):
+    for batch in batches(rows, batch_size):
+        # Decimals as strings, like the API
+        yield b''.join(
+            orjson.dumps(dict(zip(COLUMNS, row)), default=str, option=orjson.OPT_APPEND_NEWLINE)
+            for row in batch
+        )
+
+
+def gzipped(chunks):
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_chunks(rows, output='csv', gzip=False, batch_size=500):
+    """``rows`` encoded as ``output`` (csv or ndjson), as a stream of byte chunks"""
+    encode = encode_csv if output == 'csv' else encode_ndjson
+    chunks = encode(rows, batch_size)
+    return gzipped(chunks) if gzip else chunks
+
+
+def export_filename(start, end, output, gzip=False):
+    return f"orders-{start}-{end}.{output}{'.gz' if gzip else ''}"
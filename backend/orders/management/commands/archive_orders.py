@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from orders.archive import CLOSED_STATUSES, archive_batch, archive_cutoff
+
+
+class Command(BaseCommand):
+    help = (
+        "Move delivered and cancelled orders older than --months out of the live "
+        "order tables into the archive, a batch per transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, default=12)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--max-batches', type=int,
+            help="Stop after this many batches, to spread a large backlog over several runs."
+        )
+
+    def handle(self, **options):
+        if options['months'] < 1:
+            raise CommandError("--months must be at least 1")
+        cutoff = archive_cutoff(options['months'])
+        self.stdout.write(f"Archiving {'/'.join(CLOSED_STATUSES)} orders created before {cutoff:%Y-%m-%d %H:%M}")
+
+        total = batches = 0
+        while options['max_batches'] is None or batches < options['max_batches']:
+            moved = archive_batch(cutoff, options['batch_size'])
+            if not moved:
+                break
+            total += moved
+            batches += 1
+            self.stdout.write(f"Archived {total} orders")
+        self.stdout.write(self.style.SUCCESS(f"Done: archived {total} orders"))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max, Min
+from orders.models import ArchivedOrderItem, OrderItem
+
+BACKFILL_SQL = """
+    UPDATE {table} i SET
+        product_name = p.name,
+        product_category = p.category,
+        product_image_url = p.image_url
+    FROM store_product p
+    WHERE p.id = i.product_id AND i.id >= %s AND i.id < %s AND i.product_name = ''
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy product name, category and image onto order lines saved before "
+        "they were snapshotted at checkout, a range of line ids per transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help="Line ids per transaction.")
+
+    def handle(self, **options):
+        batch_size = options['batch_size']
+        total = 0
+        for model in (OrderItem, ArchivedOrderItem):
+            bounds = model.objects.aggregate(first=Min('id'), last=Max('id'))
+            if bounds['first'] is None:
+                continue
+            sql = BACKFILL_SQL.format(table=model._meta.db_table)
+            for start in range(bounds['first'], bounds['last'] + 1, batch_size):
+                with transaction.atomic(), connection.cursor() as cursor:
+                    cursor.execute(sql, [start, start + batch_size])
+                    total += cursor.rowcount
+            self.stdout.write(f"Backfilled {model._meta.verbose_name_plural} up to #{bounds['last']}")
+        self.stdout.write(self.style.SUCCESS(f"Done: snapshotted {total} order lines"))
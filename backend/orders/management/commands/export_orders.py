@@ -0,0 +1,45 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from analytics.views import date_range
+from orders.export import FORMATS, export_chunks, export_rows
+from orders.models import Order
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the order lines of orders created between --start and --end as CSV "
+        "or NDJSON, streamed from a server-side cursor in constant memory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help="First date (YYYY-MM-DD). Defaults to 29 days before --end.")
+        parser.add_argument('--end', help="Last date (YYYY-MM-DD). Defaults to today.")
+        parser.add_argument(
+            '--status', action='append', choices=[value for value, _ in Order.STATUS_CHOICES],
+            help="Only orders in this status; repeat for several."
+        )
+        parser.add_argument('--format', choices=list(FORMATS), default='csv')
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument('--output', '-o', default='-', help="File to write, or - for stdout.")
+        parser.add_argument('--chunk-size', type=int, default=2000, help="Rows fetched per round trip.")
+
+    def handle(self, **options):
+        try:
+            start, end = date_range({'start': options['start'], 'end': options['end']}, max_days=None)
+        except ValueError as e:
+            raise CommandError(e)
+
+        rows = export_rows(start, end, options['status'], chunk_size=options['chunk_size'])
+        chunks = export_chunks(rows, options['format'], options['gzip'])
+        if options['output'] == '-':
+            self.write(chunks, sys.stdout.buffer)
+        else:
+            with open(options['output'], 'wb') as out:
+                self.write(chunks, out)
+            self.stderr.write(f"Exported orders from {start} to {end} to {options['output']}")
+
+    def write(self, chunks, out):
+        for chunk in chunks:
+            out.write(chunk)
+        out.flush()
@@ -0,0 +1,44 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from orders.outbox import process_batch
+
+
+class Command(BaseCommand):
+    help = "Deliver queued order notifications (emails, Slack) from the outbox."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.OUTBOX_BATCH_SIZE)
+        parser.add_argument('--concurrency', type=int, default=settings.OUTBOX_CONCURRENCY)
+        parser.add_argument('--max-attempts', type=int, default=settings.OUTBOX_MAX_ATTEMPTS)
+        parser.add_argument(
+            '--poll-interval', type=float, default=2.0,
+            help="Seconds to sleep when the outbox is empty."
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Drain the messages that are due and exit instead of polling."
+        )
+
+    def handle(self, **options):
+        totals = [0, 0, 0]
+        try:
+            while True:
+                counts = process_batch(
+                    batch_size=options['batch_size'],
+                    concurrency=options['concurrency'],
+                    max_attempts=options['max_attempts'],
+                )
+                totals = [total + count for total, count in zip(totals, counts)]
+                if any(counts):
+                    self.stdout.write("Sent %d, retrying %d, dead-lettered %d" % counts)
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(
+            "Done: sent %d, retrying %d, dead-lettered %d" % tuple(totals)
+        ))
@@ -0,0 +1,36 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from orders.checkout import resolve_stale_orders
+
+
+class Command(BaseCommand):
+    help = (
+        "Confirm or release orders left pending by an interrupted checkout: orders "
+        "Stripe has a succeeded payment for are confirmed, the rest give their stock back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than', type=int, default=settings.PENDING_ORDER_TIMEOUT,
+            help="Seconds an order must have been pending."
+        )
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help="Keep running, sweeping every INTERVAL seconds. Runs once when 0."
+        )
+
+    def handle(self, **options):
+        while True:
+            older_than = timezone.now() - timedelta(seconds=options['older_than'])
+            counts = resolve_stale_orders(older_than)
+            self.stdout.write(
+                f"Confirmed {counts['confirmed']}, released {counts['released']} pending order(s); "
+                f"{counts['unresolved']} could not be checked with Stripe"
+            )
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:54
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_outboxmessage'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(django.db.models.functions.text.Upper('stripe_payment_intent_id'), name='orders_order_pi_upper'),
+        ),
+    ]
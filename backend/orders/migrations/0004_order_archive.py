@@ -0,0 +1,106 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:32
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.functions.text
+
+
+ORDER_COLUMNS = 'id, user_id, total_amount, status, stripe_payment_intent_id, shipping_address, created_at, updated_at'
+ITEM_COLUMNS = 'id, order_id, product_id, quantity, unit_price'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0006_admin_search_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('orders', '0003_admin_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('shipped', 'Shipped'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled')], db_index=True, default='pending', max_length=20)),
+                ('stripe_payment_intent_id', models.CharField(blank=True, max_length=200, null=True)),
+                ('shipping_address', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('archived', models.BooleanField()),
+            ],
+            options={
+                'verbose_name_plural': 'order history',
+                'db_table': 'orders_orderhistory',
+                'ordering': ['-created_at'],
+                'abstract': False,
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='OrderHistoryItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=10)),
+            ],
+            options={
+                'db_table': 'orders_orderhistoryitem',
+                'abstract': False,
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('total_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('shipped', 'Shipped'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled')], db_index=True, default='pending', max_length=20)),
+                ('stripe_payment_intent_id', models.CharField(blank=True, max_length=200, null=True)),
+                ('shipping_address', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_orders', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderItem',
+            fields=[
+                ('quantity', models.PositiveIntegerField()),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='orders.archivedorder')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='store.product')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['user', 'created_at'], name='orders_arch_user_id_101d40_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(django.db.models.functions.text.Upper('stripe_payment_intent_id'), name='orders_archived_pi_upper'),
+        ),
+        migrations.RunSQL(
+            f"""
+            CREATE VIEW orders_orderhistory AS
+                SELECT {ORDER_COLUMNS}, false AS archived FROM orders_order
+                UNION ALL
+                SELECT {ORDER_COLUMNS}, true FROM orders_archivedorder;
+            CREATE VIEW orders_orderhistoryitem AS
+                SELECT {ITEM_COLUMNS} FROM orders_orderitem
+                UNION ALL
+                SELECT {ITEM_COLUMNS} FROM orders_archivedorderitem;
+            """,
+            "DROP VIEW orders_orderhistoryitem; DROP VIEW orders_orderhistory;",
+        ),
+    ]
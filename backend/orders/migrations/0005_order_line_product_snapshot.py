@@ -0,0 +1,85 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:35
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.functions.text
+
+
+ITEM_COLUMNS = 'id, order_id, product_id, quantity, unit_price'
+SNAPSHOT_COLUMNS = 'product_name, product_category, product_image_url'
+
+
+def history_item_view(columns):
+    return f"""
+        CREATE OR REPLACE VIEW orders_orderhistoryitem AS
+            SELECT {columns} FROM orders_orderitem
+            UNION ALL
+            SELECT {columns} FROM orders_archivedorderitem
+    """
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0006_admin_search_indexes'),
+        ('orders', '0004_order_archive'),
+    ]
+
+    # The snapshot columns start out empty; fill them in on existing lines
+    # with manage.py backfill_order_snapshots
+    operations = [
+        migrations.AddField(
+            model_name='archivedorderitem',
+            name='product_category',
+            field=models.CharField(default='', max_length=100),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='archivedorderitem',
+            name='product_image_url',
+            field=models.URLField(blank=True, max_length=500),
+        ),
+        migrations.AddField(
+            model_name='archivedorderitem',
+            name='product_name',
+            field=models.CharField(default='', max_length=200),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='product_category',
+            field=models.CharField(default='', max_length=100),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='product_image_url',
+            field=models.URLField(blank=True, max_length=500),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='product_name',
+            field=models.CharField(default='', max_length=200),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='archivedorderitem',
+            name='product',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='store.product'),
+        ),
+        migrations.AlterField(
+            model_name='orderitem',
+            name='product',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='store.product'),
+        ),
+        migrations.AddIndex(
+            model_name='orderitem',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('product_name'), name='text_pattern_ops'), name='orders_item_name_upper'),
+        ),
+        migrations.RunSQL(
+            history_item_view(f'{ITEM_COLUMNS}, {SNAPSHOT_COLUMNS}'),
+            # Columns can't be dropped from a view in place
+            ['DROP VIEW orders_orderhistoryitem', history_item_view(ITEM_COLUMNS)],
+        ),
+    ]
@@ -1,9 +1,13 @@
+from django.contrib.postgres.indexes import OpClass
 from django.db import models
 from django.contrib.auth.models import User
+from django.db.models.functions import Upper
+from django.utils import timezone
 from store.models import Product
 from decimal import Decimal
 
-class Order(models.Model):
+class OrderRecord(models.Model):
+    """The columns shared by live, archived and historical orders"""
     STATUS_CHOICES = [
         ('pending', 'Pending'),
         ('processing', 'Processing'),
@@ -12,7 +16,6 @@ class Order(models.Model):
         ('cancelled', 'Cancelled'),
     ]
 
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='orders')
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True)
     stripe_payment_intent_id = models.CharField(max_length=200, blank=True, null=True)
@@ -21,24 +24,159 @@ class Order(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
+        abstract = True
         ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Order #{self.id} - {self.user.username}"
+
+class Order(OrderRecord):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='orders')
+
+    class Meta(OrderRecord.Meta):
         indexes = [
             models.Index(fields=['user', 'status']),
             models.Index(fields=['created_at']),
+            # Case-insensitive lookups from the admin search
+            models.Index(Upper('stripe_payment_intent_id'), name='orders_order_pi_upper'),
         ]
 
-    def __str__(self):
-        return f"Order #{self.id} - {self.user.username}"
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The stored status, so saves can tell which way it moved (see
+        # analytics.signals). None if the status wasn't loaded.
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
 
-class OrderItem(models.Model):
-    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
-    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+class OrderLine(models.Model):
+    """The columns shared by live, archived and historical order lines"""
     quantity = models.PositiveIntegerField()
     unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+    # The product as it was bought, so order history never reads the catalog
+    product_name = models.CharField(max_length=200)
+    product_category = models.CharField(max_length=100)
+    product_image_url = models.URLField(max_length=500, blank=True)
+
+    class Meta:
+        abstract = True
 
     def __str__(self):
-        return f"{self.product.name} x {self.quantity}"
+        return f"{self.product_name} x {self.quantity}"
 
     @property
     def total_price(self):
-        return self.quantity * self.unit_price
\ No newline at end of file
+        return self.quantity * self.unit_price
+
+    def snapshot(self, product):
+        """Copy what's shown of ``product`` onto the line"""
+        self.product_name = product.name
+        self.product_category = product.category
+        self.product_image_url = product.image_url
+
+# No database constraint on the product, so order lines outlive deleted
+# products and keep their id
+
+class OrderItem(OrderLine):
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(
+        Product, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+'
+    )
+
+    class Meta(OrderLine.Meta):
+        indexes = [
+            # Case-insensitive prefix searches from the admin (^product_name)
+            models.Index(
+                OpClass(Upper('product_name'), name='text_pattern_ops'), name='orders_item_name_upper'
+            ),
+        ]
+
+    @classmethod
+    def for_product(cls, product, **kwargs):
+        """A line for ``product`` with its snapshot taken"""
+        item = cls(product=product, **kwargs)
+        item.snapshot(product)
+        return item
+
+# Closed orders moved out of the live tables by archive_orders, keeping
+# their ids. Nothing writes to these tables except the archiver.
+
+class ArchivedOrder(OrderRecord):
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_orders')
+
+    class Meta(OrderRecord.Meta):
+        indexes = [
+            models.Index(fields=['user', 'created_at']),
+            # Date-range exports
+            models.Index(fields=['created_at']),
+            models.Index(Upper('stripe_payment_intent_id'), name='orders_archived_pi_upper'),
+        ]
+
+class ArchivedOrderItem(OrderLine):
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(
+        Product, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+'
+    )
+
+# Read-only views over the live and archived tables together (see
+# migrations/0004), for reads that must find an order wherever it is.
+
+class OrderHistory(OrderRecord):
+    user = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+'
+    )
+    archived = models.BooleanField()
+
+    class Meta(OrderRecord.Meta):
+        managed = False
+        db_table = 'orders_orderhistory'
+        verbose_name_plural = 'order history'
+
+class OrderHistoryItem(OrderLine):
+    order = models.ForeignKey(
+        OrderHistory, on_delete=models.DO_NOTHING, db_constraint=False, related_name='items'
+    )
+    product = models.ForeignKey(
+        Product, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+'
+    )
+
+    class Meta(OrderLine.Meta):
+        managed = False
+        db_table = 'orders_orderhistoryitem'
+
+class OutboxMessage(models.Model):
+    """A side effect committed with the order and delivered by process_outbox"""
+    KIND_CHOICES = [
+        ('order_confirmation_email', 'Order confirmation email'),
+        ('order_slack_notification', 'Order Slack notification'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('dead', 'Dead'),
+    ]
+
+    kind = models.CharField(max_length=50, choices=KIND_CHOICES)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # Only undelivered messages are ever polled, so keep the index small
+            models.Index(
+                fields=['available_at'],
+                condition=models.Q(status='pending'),
+                name='orders_outbox_pending_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.id} ({self.status})"
@@ -0,0 +1,58 @@
+# Order notifications, delivered by the outbox worker (manage.py process_outbox).
+# They raise on failure so the worker can retry them.
+from django.conf import settings
+from django.core.mail import send_mail
+import requests
+
+def send_order_confirmation_email(order):
+    """Send order confirmation email"""
+    subject = f'Order Confirmation #{order.id}'
+    message = f"""
+    Dear {order.user.first_name or order.user.username},
+    
+    Thank you for your order! Your order #{order.id} has been confirmed.
+    
+    Order Details:
+    Total Amount: ${order.total_amount}
+    Status: {order.get_status_display()}
+    
+    Items:
+    """
+    
+    for item in order.items.all():
+        message += f"- {item.product_name} x {item.quantity} = ${item.total_price}\n"
+    
+    message += f"\nShipping Address:\n{order.shipping_address}\n\nThank you for shopping with us!"
+    
+    send_mail(
+        subject,
+        message,
+        settings.DEFAULT_FROM_EMAIL,
+        [order.user.email],
+        fail_silently=False,
+    )
+
+def send_slack_notification(order):
+    """Send Slack notification for new order"""
+    if not settings.SLACK_BOT_TOKEN or not settings.SLACK_CHANNEL_ID:
+        return
+    
+    message = f":shopping_cart: New order #{order.id} for ${order.total_amount} by {order.user.username}"
+    
+    response = requests.post(
+        settings.SLACK_API_URL,
+        headers={
+            'Authorization': f'Bearer {settings.SLACK_BOT_TOKEN}',
+            'Content-Type': 'application/json',
+        },
+        json={
+            'channel': settings.SLACK_CHANNEL_ID,
+            'text': message,
+        },
+        timeout=settings.SLACK_TIMEOUT
+    )
+    response.raise_for_status()
+    # Slack reports most failures in the body with a 200 status
+    body = response.json()
+    if not body.get('ok'):
+        raise RuntimeError(f"Slack API error: {body.get('error')}")
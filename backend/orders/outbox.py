@@ -0,0 +1,120 @@
+import logging
+import random
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import Order, OutboxMessage
+from .notifications import send_order_confirmation_email, send_slack_notification
+
+logger = logging.getLogger(__name__)
+
+ORDER_HANDLERS = {
+    'order_confirmation_email': send_order_confirmation_email,
+    'order_slack_notification': send_slack_notification,
+}
+
+
+def enqueue_order_notifications(order):
+    """Queue the order's notifications; call inside the order's transaction"""
+    OutboxMessage.objects.bulk_create([
+        OutboxMessage(kind=kind, payload={'order_id': order.id})
+        for kind in ORDER_HANDLERS
+    ])
+
+
+def claim_batch(batch_size, lease_seconds):
+    """
+    Claim up to ``batch_size`` due messages for this worker.
+
+    SKIP LOCKED lets several workers poll at once without blocking each
+    other, and the lease hides claimed messages until it runs out, so a
+    worker that dies mid-batch only delays its messages.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        messages = list(
+            OutboxMessage.objects
+            .select_for_update(skip_locked=True)
+            .filter(status='pending', available_at__lte=now)
+            .order_by('available_at')[:batch_size]
+        )
+        OutboxMessage.objects.filter(id__in=[message.id for message in messages]).update(
+            attempts=F('attempts') + 1,
+            available_at=now + timedelta(seconds=lease_seconds),
+        )
+    for message in messages:
+        message.attempts += 1
+    return messages
+
+
+def deliver(message):
+    """Run a message's handler. Returns None on success, the error otherwise."""
+    try:
+        handler = ORDER_HANDLERS[message.kind]
+        order = (
+            Order.objects
+            .select_related('user')
+            .prefetch_related('items')
+            .get(pk=message.payload['order_id'])
+        )
+        handler(order)
+    except Exception as e:
+        logger.warning('Outbox message %s failed (attempt %s): %s', message.id, message.attempts, e)
+        return e
+    return None
+
+
+def deliver_in_thread(message):
+    # Worker threads get their own connections; don't leave them open
+    try:
+        return deliver(message)
+    finally:
+        connection.close()
+
+
+def retry_delay(attempts):
+    """Exponential backoff with jitter, capped at OUTBOX_RETRY_MAX_SECONDS"""
+    delay = settings.OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+    delay = min(delay, settings.OUTBOX_RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def process_batch(batch_size=None, concurrency=None, max_attempts=None):
+    """Claim and deliver one batch. Returns (sent, retried, dead) counts."""
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    concurrency = concurrency or settings.OUTBOX_CONCURRENCY
+    max_attempts = max_attempts or settings.OUTBOX_MAX_ATTEMPTS
+
+    messages = claim_batch(batch_size, settings.OUTBOX_LEASE_SECONDS)
+    if not messages:
+        return 0, 0, 0
+
+    if concurrency > 1 and len(messages) > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            errors = list(pool.map(deliver_in_thread, messages))
+    else:
+        errors = [deliver(message) for message in messages]
+
+    now = timezone.now()
+    sent, failed = [], []
+    for message, error in zip(messages, errors):
+        if error is None:
+            sent.append(message.id)
+            continue
+        message.last_error = f'{type(error).__name__}: {error}'
+        if message.attempts >= max_attempts:
+            message.status = 'dead'
+            logger.error('Outbox message %s dead-lettered after %s attempts', message.id, message.attempts)
+        else:
+            message.available_at = now + timedelta(seconds=retry_delay(message.attempts))
+        message.updated_at = now
+        failed.append(message)
+
+    OutboxMessage.objects.filter(id__in=sent).update(status='sent', last_error='', updated_at=now)
+    OutboxMessage.objects.bulk_update(failed, ['status', 'available_at', 'last_error', 'updated_at'])
+    dead = sum(1 for message in failed if message.status == 'dead')
+    return len(sent), len(failed) - dead, dead
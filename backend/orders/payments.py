@@ -0,0 +1,96 @@
+import asyncio
+import weakref
+
+import httpx
+from django.conf import settings
+
+
+class PaymentError(Exception):
+    pass
+
+
+class PaymentOutcomeUnknown(PaymentError):
+    """
+    The request may have reached Stripe and been charged without an answer
+    coming back: a read timeout, a dropped connection or a Stripe server
+    error. The order is left pending for resolve_pending_orders to settle.
+    """
+
+
+def timeout():
+    return httpx.Timeout(settings.STRIPE_TIMEOUT, connect=settings.STRIPE_CONNECT_TIMEOUT)
+
+
+# One connection pool per event loop; a client can't be shared between loops
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_client():
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = _clients[loop] = httpx.AsyncClient(base_url=settings.STRIPE_API_BASE, timeout=timeout())
+    return client
+
+
+async def create_payment_intent(amount, payment_method_id, order_id, currency='usd'):
+    """
+    Create and confirm a Stripe PaymentIntent without blocking a thread,
+    for the async checkout. Returns the PaymentIntent as a dict; raises
+    PaymentError with Stripe's message if it fails, or PaymentOutcomeUnknown
+    if it may have gone through unanswered.
+    """
+    try:
+        response = await get_client().post(
+            '/v1/payment_intents',
+            auth=(settings.STRIPE_SECRET_KEY, ''),
+            data={
+                'amount': amount,
+                'currency': currency,
+                'payment_method': payment_method_id,
+                'confirm': 'true',
+                'return_url': 'http://localhost:3000/orders',
+                # So find_payment() can tell whether an unconfirmed order was paid
+                'metadata[order_id]': order_id,
+            },
+        )
+    except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+        # Nothing was sent
+        raise PaymentError(f'Could not reach the payment provider: {e}')
+    except httpx.TimeoutException:
+        raise PaymentOutcomeUnknown('The payment provider timed out')
+    except httpx.HTTPError as e:
+        raise PaymentOutcomeUnknown(f'Lost the connection to the payment provider: {e}')
+    return parse(response)
+
+
+def find_payment(order_id):
+    """
+    The succeeded PaymentIntent checkout created for ``order_id``, found by
+    the order id in its metadata, or None. Raises PaymentError if Stripe
+    can't be asked.
+    """
+    try:
+        response = httpx.get(
+            f'{settings.STRIPE_API_BASE}/v1/payment_intents/search',
+            params={'query': f"status:'succeeded' AND metadata['order_id']:'{order_id}'"},
+            auth=(settings.STRIPE_SECRET_KEY, ''),
+            timeout=timeout(),
+        )
+    except httpx.HTTPError as e:
+        raise PaymentError(f'Could not reach the payment provider: {e}')
+    intents = parse(response)['data']
+    return intents[0] if intents else None
+
+
+def parse(response):
+    """The JSON body of a Stripe response; raises PaymentError for its error responses"""
+    if response.is_server_error:
+        raise PaymentOutcomeUnknown(f'The payment provider failed ({response.status_code})')
+    try:
+        body = response.json()
+    except ValueError:
+        raise PaymentOutcomeUnknown(f'Unexpected response from the payment provider ({response.status_code})')
+    if response.is_error:
+        raise PaymentError(body.get('error', {}).get('message') or f'Payment failed ({response.status_code})')
+    return body
@@ -1,9 +1,15 @@
 from rest_framework import serializers
 from .models import Order, OrderItem
-from store.serializers import ProductSerializer
+
+class OrderProductSerializer(serializers.Serializer):
+    """The product as it was bought, from the order line's snapshot"""
+    id = serializers.IntegerField(source='product_id')
+    name = serializers.CharField(source='product_name')
+    category = serializers.CharField(source='product_category')
+    image_url = serializers.CharField(source='product_image_url')
 
 class OrderItemSerializer(serializers.ModelSerializer):
-    product = ProductSerializer(read_only=True)
+    product = OrderProductSerializer(source='*', read_only=True)
     total_price = serializers.ReadOnlyField()
 
     class Meta:
@@ -21,6 +27,18 @@ class OrderSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['created_at', 'updated_at']
 
+class OrderSummarySerializer(serializers.ModelSerializer):
+    item_count = serializers.IntegerField(read_only=True)
+    unit_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Order
+        fields = [
+            'id', 'total_amount', 'status', 'created_at', 'updated_at',
+            'item_count', 'unit_count'
+        ]
+        read_only_fields = fields
+
 class OrderCreateSerializer(serializers.Serializer):
     shipping_address = serializers.CharField(max_length=500)
     payment_method_id = serializers.CharField(max_length=200)
\ No newline at end of file
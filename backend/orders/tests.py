@@ -1,3 +1,645 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import json
+import os
+import tempfile
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import stripe
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.urls import reverse
+from rest_framework.test import APIClient, force_authenticate
+
+from analytics.models import DailySales
+from analytics.rollups import rebuild_rollups
+from core.stripe_stub import start_stripe_stub
+from core.factories import make_order, make_product
+from store.models import CartItem, Product, StockReservation
+from . import async_views, checkout, payments
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem, OutboxMessage
+from .archive import archive_batch
+from .outbox import enqueue_order_notifications, process_batch
+
+
+class OrderHistoryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', password='secret-pass-123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.products = [make_product(name=f'Item {i}') for i in range(3)]
+
+    def make_orders(self, count):
+        for _ in range(count):
+            make_order(self.user, [(product, 2) for product in self.products], status='processing')
+
+    def test_order_list_query_count_is_independent_of_size(self):
+        for count in (1, 4):
+            Order.objects.all().delete()
+            self.make_orders(count)
+            # page count, orders, items
+            with self.assertNumQueries(3):
+                response = self.client.get(reverse('order-list'))
+            self.assertEqual(response.data['count'], count)
+            self.assertEqual(len(response.data['results'][0]['items']), 3)
+
+    def test_summary_view(self):
+        self.make_orders(2)
+        make_order(User.objects.create_user(username='other'), [(self.products[0], 1)], status='processing')
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('order-list'), {'view': 'summary'})
+        self.assertEqual(response.data['count'], 2)
+        summary = response.data['results'][0]
+        self.assertNotIn('items', summary)
+        self.assertNotIn('shipping_address', summary)
+        self.assertEqual(summary['item_count'], 3)
+        self.assertEqual(summary['unit_count'], 6)
+
+    def test_order_detail(self):
+        self.make_orders(1)
+        order = Order.objects.get()
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('order-detail', args=[order.id]))
+        self.assertEqual(response.data['id'], order.id)
+        self.assertEqual(len(response.data['items']), 3)
+
+        other = make_order(User.objects.create_user(username='other'), [(self.products[0], 1)], status='processing')
+        response = self.client.get(reverse('order-detail', args=[other.id]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_shows_products_as_bought(self):
+        self.make_orders(1)
+        bought = [(product.pk, product.name, 'General') for product in self.products]
+        renamed, deleted, _ = self.products
+        Product.objects.filter(pk=renamed.pk).update(name='Renamed', category='Other')
+        deleted.delete()
+        response = self.client.get(reverse('order-list'))
+        products = [item['product'] for item in response.data['results'][0]['items']]
+        self.assertEqual(
+            sorted((product['id'], product['name'], product['category']) for product in products), bought
+        )
+
+    def test_backfills_snapshots(self):
+        self.make_orders(2)
+        OrderItem.objects.update(product_name='', product_category='', product_image_url='')
+        call_command('backfill_order_snapshots', '--batch-size=2', stdout=StringIO())
+        self.assertEqual(
+            sorted(set(OrderItem.objects.values_list('product_name', 'product_category', 'product_image_url'))),
+            [(product.name, 'General', product.image_url) for product in self.products],
+        )
+
+
+@mock.patch('orders.views.stripe.PaymentIntent.create')
+class CreateOrderTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', password='secret-pass-123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.keyboard = make_product(name='Keyboard', price=Decimal('50.00'), inventory_count=5)
+        self.mouse = make_product(name='Mouse', price=Decimal('20.00'), inventory_count=1)
+        CartItem.objects.create(user=self.user, product=self.keyboard, quantity=2)
+        CartItem.objects.create(user=self.user, product=self.mouse, quantity=1)
+
+    def checkout(self, **headers):
+        return self.client.post(
+            reverse('create-order'),
+            {'shipping_address': '1 Main St', 'payment_method_id': 'pm_card_visa'},
+            format='json',
+            **headers
+        )
+
+    def test_creates_order_and_decrements_stock(self, create_payment):
+        create_payment.return_value = SimpleNamespace(id='pi_123')
+        response = self.checkout()
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['total_amount'], '120.00')
+        self.assertEqual(response.data['status'], 'processing')
+        self.assertEqual(
+            sorted(item['product']['name'] for item in response.data['items']), ['Keyboard', 'Mouse']
+        )
+        self.assertEqual(create_payment.call_args.kwargs['amount'], 12000)
+        self.keyboard.refresh_from_db()
+        self.mouse.refresh_from_db()
+        self.assertEqual((self.keyboard.inventory_count, self.mouse.inventory_count), (3, 0))
+        self.assertFalse(CartItem.objects.filter(user=self.user).exists())
+        # Notifications are queued, not sent inline
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(
+            sorted(OutboxMessage.objects.values_list('kind', flat=True)),
+            ['order_confirmation_email', 'order_slack_notification']
+        )
+
+    def test_converts_cart_reservations(self, create_payment):
+        create_payment.return_value = SimpleNamespace(id='pi_123')
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user(username='other'))
+        CartItem.objects.all().delete()
+        for client, quantity in ((self.client, 2), (other, 3)):
+            client.post(
+                reverse('add-to-cart'), {'product_id': self.keyboard.id, 'quantity': quantity}, format='json'
+            )
+
+        self.assertEqual(self.checkout().status_code, 201)
+        self.keyboard.refresh_from_db()
+        self.assertEqual((self.keyboard.inventory_count, self.keyboard.reserved_count), (3, 3))
+        self.assertFalse(StockReservation.objects.filter(user=self.user).exists())
+
+    def test_reports_every_short_line(self, create_payment):
+        CartItem.objects.filter(product=self.mouse).update(quantity=3)
+        Product.objects.filter(id=self.keyboard.id).update(inventory_count=1)
+        response = self.checkout()
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Not enough inventory')
+        self.assertEqual(response.data['lines'], [
+            {'product_id': self.keyboard.id, 'name': 'Keyboard', 'requested': 2, 'available': 1},
+            {'product_id': self.mouse.id, 'name': 'Mouse', 'requested': 3, 'available': 1},
+        ])
+        create_payment.assert_not_called()
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_payment_failure_gives_stock_back(self, create_payment):
+        create_payment.side_effect = stripe.error.CardError(
+            'Your card was declined.', None, 'card_declined', http_status=402
+        )
+        response = self.checkout()
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+        self.keyboard.refresh_from_db()
+        self.mouse.refresh_from_db()
+        self.assertEqual((self.keyboard.inventory_count, self.mouse.inventory_count), (5, 1))
+        self.assertEqual(CartItem.objects.filter(user=self.user).count(), 2)
+
+    def test_unanswered_payments_leave_the_order_pending(self, create_payment):
+        for error in (
+            stripe.error.APIConnectionError('Request timed out'),
+            stripe.error.APIError('Internal error', http_status=500),
+        ):
+            Order.objects.all().delete()
+            Product.objects.update(inventory_count=5)
+            create_payment.side_effect = error
+            response = self.checkout()
+
+            # Stripe may have charged the card; resolve_pending_orders settles it
+            self.assertEqual((response.status_code, response.data['status']), (202, 'pending'))
+            self.assertEqual(Order.objects.get().status, 'pending')
+            self.keyboard.refresh_from_db()
+            self.assertEqual(self.keyboard.inventory_count, 3)
+
+    def test_empty_cart(self, create_payment):
+        CartItem.objects.all().delete()
+        response = self.checkout()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Cart is empty')
+
+    def test_retries_with_an_idempotency_key_replay_the_order(self, create_payment):
+        create_payment.return_value = SimpleNamespace(id='pi_123')
+        first = self.checkout(HTTP_IDEMPOTENCY_KEY='checkout-1')
+        # Not even authentication touches the database
+        with self.assertNumQueries(0):
+            retry = self.checkout(HTTP_IDEMPOTENCY_KEY='checkout-1')
+
+        self.assertEqual((first.status_code, retry.status_code), (201, 201))
+        self.assertEqual(retry.content, first.content)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(create_payment.call_count, 1)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(OutboxMessage.objects.count(), 2)
+
+
+class AsyncCreateOrderTests(TestCase):
+    """The ASGI checkout, paying through the Stripe stub"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.stub = start_stripe_stub()
+        cls.stub_settings = override_settings(
+            STRIPE_API_BASE=f'http://127.0.0.1:{cls.stub.server_port}', STRIPE_SECRET_KEY='sk_test'
+        )
+        cls.stub_settings.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.stub_settings.disable()
+        cls.stub.shutdown()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', password='secret-pass-123')
+        self.keyboard = make_product(name='Keyboard', price=Decimal('50.00'), inventory_count=5)
+        CartItem.objects.create(user=self.user, product=self.keyboard, quantity=2)
+
+    async def checkout(self, payment_method_id='pm_card_visa', user=True, headers=None):
+        request = AsyncRequestFactory().post(
+            reverse('create-order'),
+            {'shipping_address': '1 Main St', 'payment_method_id': payment_method_id},
+            content_type='application/json',
+            headers=headers,
+        )
+        if user:
+            force_authenticate(request, self.user)
+        response = await async_views.create_order(request)
+        return response.status_code, json.loads(response.content)
+
+    async def test_creates_order(self):
+        status, data = await self.checkout()
+        self.assertEqual(status, 201)
+        self.assertEqual(data['total_amount'], '100.00')
+        self.assertEqual(data['status'], 'processing')
+        order = await Order.objects.aget()
+        self.assertTrue(order.stripe_payment_intent_id.startswith('pi_stub_'))
+        self.assertFalse(await CartItem.objects.filter(user=self.user).aexists())
+
+    async def test_idempotency_key(self):
+        first = await self.checkout(headers={'Idempotency-Key': 'checkout-1'})
+        retry = await self.checkout(headers={'Idempotency-Key': 'checkout-1'})
+        self.assertEqual(first[0], 201)
+        self.assertEqual(retry, first)
+        self.assertEqual(await Order.objects.acount(), 1)
+
+    async def test_declined_payment_gives_stock_back(self):
+        status, data = await self.checkout('pm_card_declined')
+        self.assertEqual((status, data), (400, {'error': 'Payment failed: Your card was declined.'}))
+        self.assertFalse(await Order.objects.aexists())
+        self.assertEqual((await Product.objects.aget(pk=self.keyboard.pk)).inventory_count, 5)
+
+    async def test_payment_timeout(self):
+        self.stub.latency = 0.5
+        try:
+            with override_settings(STRIPE_TIMEOUT=0.05):
+                status, data = await self.checkout()
+        finally:
+            self.stub.latency = 0
+        # The stub took the payment after the client gave up waiting
+        self.assertEqual((status, data['status']), (202, 'pending'))
+        self.assertEqual((await Product.objects.aget(pk=self.keyboard.pk)).inventory_count, 3)
+        await asyncio.sleep(0.6)
+        counts = await sync_to_async(checkout.resolve_stale_orders)(timezone.now() + timedelta(seconds=1))
+        self.assertEqual(counts, {'confirmed': 1, 'released': 0, 'unresolved': 0})
+        self.assertEqual((await Order.objects.aget()).status, 'processing')
+
+    async def test_unreachable_payment_provider_gives_stock_back(self):
+        with override_settings(STRIPE_API_BASE='http://127.0.0.1:1'):
+            status, data = await self.checkout()
+        self.assertEqual(status, 400)
+        self.assertTrue(data['error'].startswith('Payment failed: Could not reach the payment provider'))
+        self.assertFalse(await Order.objects.aexists())
+
+    async def test_disconnecting_while_paying_leaves_the_order_pending(self):
+        async def never_answers(amount, payment_method_id, order_id):
+            await asyncio.Event().wait()
+
+        with mock.patch.object(async_views.payments, 'create_payment_intent', never_answers):
+            task = asyncio.create_task(self.checkout())
+            while not await Order.objects.aexists():
+                await asyncio.sleep(0.01)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+        self.assertEqual((await Order.objects.aget()).status, 'pending')
+        self.assertEqual((await Product.objects.aget(pk=self.keyboard.pk)).inventory_count, 3)
+
+    async def test_disconnecting_after_payment_still_confirms_the_order(self):
+        async def pay_then_disconnect(amount, payment_method_id, order_id):
+            # The client goes away as Stripe's answer arrives
+            asyncio.current_task().cancel()
+            return {'id': 'pi_paid'}
+
+        with mock.patch.object(async_views.payments, 'create_payment_intent', pay_then_disconnect):
+            with self.assertRaises(asyncio.CancelledError):
+                await asyncio.create_task(self.checkout())
+
+        deadline = time.monotonic() + 5
+        while (order := await Order.objects.aget()).status == 'pending' and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        self.assertEqual((order.status, order.stripe_payment_intent_id), ('processing', 'pi_paid'))
+        self.assertFalse(await CartItem.objects.filter(user=self.user).aexists())
+        self.assertEqual((await Product.objects.aget(pk=self.keyboard.pk)).inventory_count, 3)
+
+    async def test_errors_match_the_sync_view(self):
+        status, data = await self.checkout(user=False)
+        self.assertEqual((status, data), (401, {'detail': 'Authentication credentials were not provided.'}))
+
+        request = AsyncRequestFactory().post(reverse('create-order'), {}, content_type='application/json')
+        force_authenticate(request, self.user)
+        response = await async_views.create_order(request)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(sorted(json.loads(response.content)), ['payment_method_id', 'shipping_address'])
+
+        response = await async_views.create_order(AsyncRequestFactory().get(reverse('create-order')))
+        self.assertEqual(response.status_code, 405)
+
+
+class PendingOrderSweepTests(TestCase):
+    """Orders left pending by a checkout that died before confirming"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.stub = start_stripe_stub()
+        cls.stub_settings = override_settings(
+            STRIPE_API_BASE=f'http://127.0.0.1:{cls.stub.server_port}', STRIPE_SECRET_KEY='sk_test'
+        )
+        cls.stub_settings.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.stub_settings.disable()
+        cls.stub.shutdown()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', password='secret-pass-123')
+        self.keyboard = make_product(name='Keyboard', price=Decimal('50.00'), inventory_count=5)
+
+    def pending_order(self, age_minutes, paid=False):
+        CartItem.objects.create(user=self.user, product=self.keyboard, quantity=1)
+        order = checkout.reserve_order(self.user, '1 Main St')
+        Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(minutes=age_minutes))
+        if paid:
+            async_to_sync(payments.create_payment_intent)(5000, 'pm_card_visa', order.pk)
+        CartItem.objects.all().delete()
+        return order
+
+    def sweep(self):
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('resolve_pending_orders', stdout=out)
+        return out.getvalue()
+
+    def test_paid_orders_are_confirmed_and_unpaid_ones_released(self):
+        paid = self.pending_order(30, paid=True)
+        unpaid = self.pending_order(30)
+        recent = self.pending_order(1)
+
+        self.assertIn('Confirmed 1, released 1 pending order(s)', self.sweep())
+        paid.refresh_from_db()
+        self.assertEqual(paid.status, 'processing')
+        self.assertTrue(paid.stripe_payment_intent_id.startswith('pi_stub_'))
+        self.assertEqual(OutboxMessage.objects.count(), 2)
+        self.assertFalse(Order.objects.filter(pk=unpaid.pk).exists())
+        self.assertEqual(Order.objects.get(pk=recent.pk).status, 'pending')
+        # The released order's unit is back; the paid and recent ones still hold theirs
+        self.keyboard.refresh_from_db()
+        self.assertEqual(self.keyboard.inventory_count, 3)
+
+    def test_orders_are_left_pending_when_stripe_is_unreachable(self):
+        order = self.pending_order(30)
+        with override_settings(STRIPE_API_BASE='http://127.0.0.1:1'):
+            self.assertIn('1 could not be checked with Stripe', self.sweep())
+        self.assertEqual(Order.objects.get(pk=order.pk).status, 'pending')
+
+
+@override_settings(SLACK_BOT_TOKEN='xoxb-test', SLACK_CHANNEL_ID='C123')
+@mock.patch('orders.notifications.requests.post')
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com')
+        self.order = make_order(self.user, [(make_product(name='Lamp'), 1)], status='processing')
+        enqueue_order_notifications(self.order)
+
+    def test_delivers_queued_notifications(self, post):
+        post.return_value.json.return_value = {'ok': True}
+        self.assertEqual(process_batch(concurrency=1), (2, 0, 0))
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn('Lamp x 1', mail.outbox[0].body)
+        self.assertIn(f'#{self.order.id}', post.call_args.kwargs['json']['text'])
+        self.assertEqual(OutboxMessage.objects.filter(status='sent').count(), 2)
+        self.assertEqual(process_batch(concurrency=1), (0, 0, 0))
+
+    def test_retries_with_backoff_then_dead_letters(self, post):
+        post.return_value.json.return_value = {'ok': False, 'error': 'channel_not_found'}
+        with self.assertLogs('orders.outbox', 'WARNING'):
+            self.assertEqual(process_batch(concurrency=1, max_attempts=2), (1, 1, 0))
+
+        message = OutboxMessage.objects.get(kind='order_slack_notification')
+        self.assertEqual(message.status, 'pending')
+        self.assertEqual(message.attempts, 1)
+        self.assertIn('channel_not_found', message.last_error)
+        self.assertGreater(message.available_at, timezone.now())
+        # Not due yet
+        self.assertEqual(process_batch(concurrency=1, max_attempts=2), (0, 0, 0))
+
+        OutboxMessage.objects.filter(id=message.id).update(available_at=timezone.now())
+        with self.assertLogs('orders.outbox', 'ERROR'):
+            self.assertEqual(process_batch(concurrency=1, max_attempts=2), (0, 0, 1))
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), ('dead', 2))
+
+    def test_command_drains_outbox(self, post):
+        post.return_value.json.return_value = {'ok': True}
+        call_command('process_outbox', '--once', '--concurrency=1', stdout=StringIO())
+        self.assertFalse(OutboxMessage.objects.filter(status='pending').exists())
+
+
+class OrderArchiveTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', password='secret-pass-123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.products = [make_product(name=f'Item {i}') for i in range(2)]
+        lines = [(product, 1) for product in self.products]
+        self.old_delivered = make_order(self.user, lines, status='delivered')
+        self.old_cancelled = make_order(self.user, lines, status='cancelled')
+        self.old_shipped = make_order(self.user, lines, status='shipped')
+        self.recent = make_order(self.user, lines, status='delivered')
+        for days, order in enumerate([self.old_shipped, self.old_cancelled, self.old_delivered]):
+            Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(days=400 - days))
+        self.old_day = timezone.localdate(timezone.now() - timedelta(days=400))
+        # Count the lines, which make_order adds after saving the order
+        rebuild_rollups(self.old_day, timezone.localdate())
+
+    def archive(self, *args):
+        call_command('archive_orders', '--months=12', *args, stdout=StringIO())
+
+    def test_moves_old_closed_orders_in_batches(self):
+        sales = list(DailySales.objects.values_list('date', 'units', 'order_count'))
+        self.assertEqual(len(sales), 3)
+        self.archive('--batch-size=1', '--max-batches=1')
+        self.assertEqual(ArchivedOrder.objects.count(), 1)
+        self.archive('--batch-size=1')
+
+        archived = {self.old_delivered.pk, self.old_cancelled.pk}
+        self.assertEqual(set(ArchivedOrder.objects.values_list('pk', flat=True)), archived)
+        self.assertEqual(set(Order.objects.values_list('pk', flat=True)), {self.old_shipped.pk, self.recent.pk})
+        self.assertEqual(ArchivedOrderItem.objects.filter(order_id__in=archived).count(), 4)
+        self.assertFalse(OrderItem.objects.filter(order_id__in=archived).exists())
+        archived_order = ArchivedOrder.objects.get(pk=self.old_delivered.pk)
+        self.assertEqual(
+            (archived_order.user_id, archived_order.total_amount, archived_order.shipping_address),
+            (self.user.pk, self.old_delivered.total_amount, '1 Main St'),
+        )
+        # Still counted as sales, including when the rollups are rebuilt
+        self.assertEqual(list(DailySales.objects.values_list('date', 'units', 'order_count')), sales)
+        rebuild_rollups(self.old_day, timezone.localdate())
+        self.assertEqual(list(DailySales.objects.values_list('date', 'units', 'order_count')), sales)
+
+    def test_order_history_includes_archived_orders(self):
+        self.archive()
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('order-list'))
+        self.assertEqual(
+            [order['id'] for order in response.data['results']],
+            [self.recent.pk, self.old_delivered.pk, self.old_cancelled.pk, self.old_shipped.pk],
+        )
+        self.assertTrue(all(len(order['items']) == 2 for order in response.data['results']))
+
+        response = self.client.get(reverse('order-list'), {'view': 'summary'})
+        self.assertEqual([order['item_count'] for order in response.data['results']], [2, 2, 2, 2])
+
+        response = self.client.get(reverse('order-detail', args=[self.old_delivered.pk]))
+        self.assertEqual((response.data['status'], len(response.data['items'])), ('delivered', 2))
+        self.client.force_authenticate(User.objects.create_user(username='other'))
+        response = self.client.get(reverse('order-detail', args=[self.old_delivered.pk]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_admin_finds_archived_orders(self):
+        self.archive()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'secret-pass-123'))
+        response = self.client.get(reverse('admin:orders_order_change', args=[self.old_delivered.pk]))
+        self.assertRedirects(response, reverse('admin:orders_orderhistory_change', args=[self.old_delivered.pk]))
+        response = self.client.get(response.url)
+        self.assertContains(response, 'Item 1')
+
+        response = self.client.get(reverse('admin:orders_orderhistory_changelist'), {'q': self.old_cancelled.pk})
+        self.assertEqual([order.pk for order in response.context['cl'].result_list], [self.old_cancelled.pk])
+        response = self.client.get(reverse('admin:orders_orderhistory_changelist'), {'q': 'buyer'})
+        self.assertEqual(len(response.context['cl'].result_list), 4)
+
+
+class OrderExportTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'finance@example.com', 'secret-pass-123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com')
+        lamp = make_product(name='Lamp', category='Lighting', price=Decimal('20.00'))
+        rug = make_product(name='Rug', category='Home', price=Decimal('35.50'))
+        self.orders = [
+            make_order(self.user, [(lamp, 2), (rug, 1)], status='delivered'),
+            make_order(self.user, [(rug, 1)], status='shipped'),
+            make_order(self.user, [(lamp, 1)], status='delivered'),
+        ]
+        self.today = timezone.localdate()
+        # The first is from last week and one from last year is out of range; both archived
+        Order.objects.filter(pk=self.orders[0].pk).update(created_at=timezone.now() - timedelta(days=7))
+        old = make_order(self.user, [(lamp, 1)], status='delivered')
+        Order.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=400))
+        self.assertEqual(archive_batch(timezone.now() - timedelta(days=1), 10), 2)
+        self.client_params = {'start': str(self.today - timedelta(days=10)), 'end': str(self.today)}
+
+    def export(self, **params):
+        response = self.client.get(reverse('order-export'), {**self.client_params, **params})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_csv(self):
+        response, content = self.export()
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn(f'filename="orders-{self.client_params["start"]}-{self.today}.csv"', response['Content-Disposition'])
+        rows = list(csv.DictReader(content.decode().splitlines()))
+        self.assertEqual(
+            [(int(row['order_id']), row['product_name'], row['quantity'], row['line_total']) for row in rows],
+            [
+                (self.orders[0].pk, 'Lamp', '2', '40.00'),
+                (self.orders[0].pk, 'Rug', '1', '35.50'),
+                (self.orders[1].pk, 'Rug', '1', '35.50'),
+                (self.orders[2].pk, 'Lamp', '1', '20.00'),
+            ],
+        )
+        self.assertEqual(rows[0]['email'], 'buyer@example.com')
+        self.assertEqual(rows[0]['product_category'], 'Lighting')
+
+    def test_ndjson_gzipped_and_filtered_by_status(self):
+        response, content = self.export(output='ndjson', compress='gzip', status='delivered')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertTrue(response['Content-Disposition'].endswith('.ndjson.gz"'))
+        lines = [json.loads(line) for line in gzip.decompress(content).splitlines()]
+        self.assertEqual([line['order_id'] for line in lines], [self.orders[0].pk] * 2 + [self.orders[2].pk])
+        self.assertEqual([line['archived'] for line in lines], [True, True, False])
+        self.assertEqual(lines[0]['unit_price'], '20.00')
+
+    def test_empty_range_has_header_only(self):
+        _, content = self.export(start='2000-01-01', end='2000-01-31')
+        self.assertEqual(content.decode().strip().split(','), [
+            'order_id', 'created_at', 'status', 'archived', 'username', 'email', 'order_total',
+            'stripe_payment_intent_id', 'line_id', 'product_id', 'product_name', 'product_category',
+            'quantity', 'unit_price', 'line_total',
+        ])
+
+    def test_rejects_bad_parameters_and_non_staff(self):
+        for params in ({'output': 'xml'}, {'status': 'lost'}, {'start': str(self.today + timedelta(days=1))}):
+            response = self.client.get(reverse('order-export'), {**self.client_params, **params})
+            self.assertEqual(response.status_code, 400, params)
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get(reverse('order-export')).status_code, 403)
+
+    @override_settings(ASYNC_VIEWS=True)
+    async def test_streams_asynchronously_under_asgi(self):
+        response = await sync_to_async(self.client.get)(reverse('order-export'), self.client_params)
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(len(content.decode().splitlines()), 5)
+
+    def test_command_writes_the_same_export(self):
+        _, content = self.export(output='ndjson')
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'orders.ndjson.gz')
+            call_command(
+                'export_orders', '--start', self.client_params['start'], '--format=ndjson', '--gzip',
+                '--chunk-size=1', '-o', path, stderr=StringIO(),
+            )
+            with open(path, 'rb') as exported:
+                self.assertEqual(gzip.decompress(exported.read()), content)
+
+
+class OrderAdminTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'secret-pass-123')
+        self.client.force_login(self.admin)
+
+    def add_orders(self, count):
+        orders = []
+        for n in range(count):
+            user = User.objects.create_user(f'buyer{User.objects.count()}')
+            orders.append(make_order(user, [(make_product(name=f'Item {n}'), 1)], status='processing'))
+        return orders
+
+    def changelist(self, name, **params):
+        response = self.client.get(reverse(f'admin:orders_{name}_changelist'), params)
+        self.assertEqual(response.status_code, 200)
+        return list(response.context['cl'].result_list)
+
+    def test_changelist_query_counts_are_independent_of_size(self):
+        for name in ('order', 'orderitem'):
+            Order.objects.all().delete()
+            self.add_orders(1)
+            with CaptureQueriesContext(connection) as small:
+                self.changelist(name)
+            self.add_orders(5)
+            with CaptureQueriesContext(connection) as large:
+                self.changelist(name)
+            self.assertEqual(len(small), len(large), name)
+
+    def test_order_item_search_by_order_number(self):
+        first, second = self.add_orders(2)
+        self.assertEqual([item.order_id for item in self.changelist('orderitem', q=str(second.id))], [second.id])
+        self.assertEqual(len(self.changelist('orderitem', q='item')), 2)
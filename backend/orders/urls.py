@@ -1,7 +1,14 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     path('', views.OrderListView.as_view(), name='order-list'),
-    path('create/', views.create_order, name='create-order'),
-]
\ No newline at end of file
+    path('<int:pk>/', views.OrderDetailView.as_view(), name='order-detail'),
+    path('export/', views.export_orders, name='order-export'),
+    path(
+        'create/',
+        async_views.create_order if settings.ASYNC_VIEWS else views.create_order,
+        name='create-order'
+    ),
+]
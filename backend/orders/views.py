@@ -1,151 +1,154 @@
 from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from django.conf import settings
-from django.core.mail import send_mail
-from django.db import transaction
-from store.models import CartItem
-from .models import Order, OrderItem
-from .serializers import OrderSerializer, OrderCreateSerializer
+from django.db import router
+from django.db.models import Count, Sum
+from django.http import StreamingHttpResponse
+from analytics.views import date_range
+from core.asyncviews import streaming_content
+from core.idempotency import idempotent
+from core.replicas import ReplicaReadsMixin, replica_reads
+from . import checkout
+from .export import FORMATS, export_chunks, export_filename, export_rows
+from .models import Order, OrderHistory, OrderHistoryItem
+from .serializers import OrderSerializer, OrderSummarySerializer, OrderCreateSerializer
 import stripe
-import requests
 
 stripe.api_key = settings.STRIPE_SECRET_KEY
+stripe.api_base = settings.STRIPE_API_BASE
 
-class OrderListView(generics.ListAPIView):
+def order_details_queryset(user):
+    """A user's orders with their items prefetched; the lines carry their products"""
+    return Order.objects.filter(user_id=user.id).prefetch_related('items')
+
+def order_history_queryset(user):
+    """order_details_queryset over live and archived orders"""
+    return OrderHistory.objects.filter(user_id=user.id).prefetch_related('items')
+
+class OrderListView(ReplicaReadsMixin, generics.ListAPIView):
+    serializer_class = OrderSerializer
+    permission_classes = [IsAuthenticated]
+
+    def is_summary(self):
+        return self.request.query_params.get('view') == 'summary'
+
+    def get_queryset(self):
+        if self.is_summary():
+            # Headers only; item counts come from the database. Meta.ordering
+            # is not applied to GROUP BY queries, so order explicitly.
+            return OrderHistory.objects.filter(user_id=self.request.user.id).annotate(
+                item_count=Count('items'),
+                unit_count=Sum('items__quantity'),
+            ).order_by('-created_at')
+        return order_history_queryset(self.request.user)
+
+    def get_serializer_class(self):
+        if self.is_summary():
+            return OrderSummarySerializer
+        return OrderSerializer
+
+class OrderDetailView(ReplicaReadsMixin, generics.RetrieveAPIView):
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user)
+        return order_history_queryset(self.request.user)
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent('create-order')
 def create_order(request):
     serializer = OrderCreateSerializer(data=request.data)
     if not serializer.is_valid():
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
-    cart_items = CartItem.objects.filter(user=request.user)
-    if not cart_items.exists():
+    # Take the stock first, in a short transaction of its own, so no row
+    # locks are held while Stripe is called
+    try:
+        order = checkout.reserve_order(
+            request.user, serializer.validated_data['shipping_address']
+        )
+    except checkout.InsufficientStockError as e:
         return Response(
-            {'error': 'Cart is empty'}, 
+            {'error': str(e), 'lines': e.lines}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except checkout.CheckoutError as e:
+        return Response(
+            {'error': str(e)}, 
             status=status.HTTP_400_BAD_REQUEST
         )
-    
-    # Calculate total
-    total_amount = sum(item.total_price for item in cart_items)
     
     try:
-        with transaction.atomic():
-            # Create Stripe PaymentIntent
-            payment_intent = stripe.PaymentIntent.create(
-                amount=int(total_amount * 100),  # Convert to cents
-                currency='usd',
-                payment_method=serializer.validated_data['payment_method_id'],
-                confirm=True,
-                return_url='http://localhost:3000/orders'
-            )
-            
-            # Create order
-            order = Order.objects.create(
-                user=request.user,
-                total_amount=total_amount,
-                shipping_address=serializer.validated_data['shipping_address'],
-                stripe_payment_intent_id=payment_intent.id,
-                status='processing'
-            )
-            
-            # Create order items and update inventory
-            for cart_item in cart_items:
-                if cart_item.product.inventory_count < cart_item.quantity:
-                    raise Exception(f"Not enough inventory for {cart_item.product.name}")
-                
-                OrderItem.objects.create(
-                    order=order,
-                    product=cart_item.product,
-                    quantity=cart_item.quantity,
-                    unit_price=cart_item.product.price
-                )
-                
-                # Update inventory
-                cart_item.product.inventory_count -= cart_item.quantity
-                cart_item.product.save()
-            
-            # Clear cart
-            cart_items.delete()
-            
-            # Send order confirmation email
-            send_order_confirmation_email(order)
-            
-            # Send Slack notification
-            send_slack_notification(order)
-            
-            order_serializer = OrderSerializer(order)
-            return Response(order_serializer.data, status=status.HTTP_201_CREATED)
-            
+        # Create Stripe PaymentIntent
+        payment_intent = stripe.PaymentIntent.create(
+            amount=int(order.total_amount * 100),  # Convert to cents
+            currency='usd',
+            payment_method=serializer.validated_data['payment_method_id'],
+            confirm=True,
+            return_url='http://localhost:3000/orders',
+            # So an order left pending can be checked against Stripe later
+            metadata={'order_id': order.pk}
+        )
     except stripe.error.StripeError as e:
+        # A dropped connection, a timeout or a Stripe server error may follow
+        # a successful charge: the order keeps its stock until
+        # resolve_pending_orders settles it against the PaymentIntent
+        if isinstance(e, stripe.error.APIConnectionError) or (e.http_status or 500) >= 500:
+            order = order_details_queryset(request.user).get(pk=order.pk)
+            return Response(OrderSerializer(order).data, status=status.HTTP_202_ACCEPTED)
+        checkout.release_order(order)
         return Response(
             {'error': f'Payment failed: {str(e)}'}, 
             status=status.HTTP_400_BAD_REQUEST
         )
-    except Exception as e:
-        return Response(
-            {'error': str(e)}, 
-            status=status.HTTP_400_BAD_REQUEST
-        )
-
-def send_order_confirmation_email(order):
-    """Send order confirmation email"""
-    subject = f'Order Confirmation #{order.id}'
-    message = f"""
-    Dear {order.user.first_name or order.user.username},
     
-    Thank you for your order! Your order #{order.id} has been confirmed.
+    # Confirmation email and Slack notification are queued in the same
+    # transaction and sent by the process_outbox worker
+    checkout.confirm_order(order, payment_intent.id)
+    order = order_details_queryset(request.user).get(pk=order.pk)
     
-    Order Details:
-    Total Amount: ${order.total_amount}
-    Status: {order.get_status_display()}
-    
-    Items:
+    order_serializer = OrderSerializer(order)
+    return Response(order_serializer.data, status=status.HTTP_201_CREATED)
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def export_orders(request):
     """
-    
-    for item in order.items.all():
-        message += f"- {item.product.name} x {item.quantity} = ${item.total_price}\n"
-    
-    message += f"\nShipping Address:\n{order.shipping_address}\n\nThank you for shopping with us!"
-    
+    Order lines, live and archived, for ?start=&end= as CSV or NDJSON
+    (?output=), optionally gzipped (?compress=gzip). The response streams
+    from a server-side cursor, so any range exports in constant memory.
+    """
+    params = request.query_params
     try:
-        send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            [order.user.email],
-            fail_silently=False,
+        start, end = date_range(params, max_days=None)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    output = params.get('output', 'csv')
+    if output not in FORMATS:
+        return Response(
+            {'error': f"output must be one of: {', '.join(FORMATS)}"},
+            status=status.HTTP_400_BAD_REQUEST
         )
-    except Exception as e:
-        print(f"Failed to send email: {e}")
-
-def send_slack_notification(order):
-    """Send Slack notification for new order"""
-    if not settings.SLACK_BOT_TOKEN or not settings.SLACK_CHANNEL_ID:
-        return
-    
-    message = f":shopping_cart: New order #{order.id} for ${order.total_amount} by {order.user.username}"
-    
-    try:
-        response = requests.post(
-            'https://slack.com/api/chat.postMessage',
-            headers={
-                'Authorization': f'Bearer {settings.SLACK_BOT_TOKEN}',
-                'Content-Type': 'application/json',
-            },
-            json={
-                'channel': settings.SLACK_CHANNEL_ID,
-                'text': message,
-            }
+    statuses = [value for value in params.get('status', '').split(',') if value]
+    unknown = set(statuses) - {value for value, _ in Order.STATUS_CHOICES}
+    if unknown:
+        return Response(
+            {'error': f"Unknown status: {', '.join(sorted(unknown))}"},
+            status=status.HTTP_400_BAD_REQUEST
         )
-        response.raise_for_status()
-    except Exception as e:
-        print(f"Failed to send Slack notification: {e}")
\ No newline at end of file
+    gzip = params.get('compress') == 'gzip'
+
+    # The rows are read while the response streams, after the view has
+    # returned, so pick the database now
+    with replica_reads(request):
+        using = router.db_for_read(OrderHistoryItem)
+    chunks = export_chunks(export_rows(start, end, statuses, using=using), output, gzip)
+    response = StreamingHttpResponse(
+        streaming_content(chunks),
+        content_type='application/gzip' if gzip else FORMATS[output],
+    )
+    response['Content-Disposition'] = f'attachment; filename="{export_filename(start, end, output, gzip)}"'
+    return response
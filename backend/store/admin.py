@@ -1,25 +1,29 @@
 # store/admin.py
 from django.contrib import admin
-from .models import Product, CartItem
+from django.db.models import Q
+from core.admin import LargeTableAdmin
+from .models import Product, CartItem, StockReservation
+from .search import build_search_query
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(LargeTableAdmin):
     list_display = [
-        'id', 'name', 'price', 'inventory_count', 
+        'id', 'name', 'price', 'inventory_count', 'reserved_count',
         'category', 'is_in_stock', 'created_at'
     ]
     list_filter = ['category', 'created_at', 'updated_at']
-    search_fields = ['name', 'description', 'category']
+    # Searched through the sku index and the full-text index, see get_search_results
+    search_fields = ['sku', 'name', 'description', 'category']
     list_editable = ['price', 'inventory_count']
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['reserved_count', 'created_at', 'updated_at']
     ordering = ['-created_at']
     
     fieldsets = (
         ('Basic Information', {
-            'fields': ('name', 'description', 'category')
+            'fields': ('sku', 'name', 'description', 'category')
         }),
         ('Pricing & Inventory', {
-            'fields': ('price', 'inventory_count')
+            'fields': ('price', 'inventory_count', 'reserved_count')
         }),
         ('Media', {
             'fields': ('image_url',)
@@ -30,18 +34,46 @@ class ProductAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        condition = Q(sku=term)
+        query = build_search_query(term)
+        if query is not None:
+            condition |= Q(search_vector=query)
+        return queryset.filter(condition), False
+    
     def is_in_stock(self, obj):
         return "✅" if obj.is_in_stock else "❌"
     is_in_stock.short_description = "In Stock"
 
 @admin.register(CartItem)
-class CartItemAdmin(admin.ModelAdmin):
+class CartItemAdmin(LargeTableAdmin):
     list_display = ['id', 'user', 'product', 'quantity', 'total_price', 'created_at']
+    list_select_related = ['user', 'product']
     list_filter = ['created_at', 'updated_at']
-    search_fields = ['user__username', 'product__name']
+    search_fields = ['^user__username', '^product__name']
     readonly_fields = ['total_price', 'created_at', 'updated_at']
     ordering = ['-created_at']
     
     def total_price(self, obj):
         return f"${obj.total_price:.2f}"
-    total_price.short_description = "Total Price"
\ No newline at end of file
+    total_price.short_description = "Total Price"
+
+@admin.register(StockReservation)
+class StockReservationAdmin(LargeTableAdmin):
+    list_display = ['id', 'user', 'product', 'quantity', 'expires_at']
+    list_select_related = ['user', 'product']
+    ordering = ['expires_at']
+    
+    # Reservations are mirrored in Product.reserved_count, so they are only
+    # changed through store.inventory
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,36 @@
+from asgiref.sync import sync_to_async
+from rest_framework.exceptions import NotFound
+from core.asyncviews import api_response, async_api_view, init_view
+from core.pagination import relink
+from core.replicas import replica_reads
+from . import cache as catalog_cache
+from .models import Product
+from .views import ProductDetailView, ProductListView
+
+
+@async_api_view(['GET'], permission_classes=[], throttle_classes=ProductListView.throttle_classes)
+async def product_list(request):
+    """ProductListView for the ASGI server"""
+    view = init_view(ProductListView, request)
+    # DRF's paginators are synchronous, so the page is built in one worker
+    # thread hop; Django 4.2's async ORM would make one per query
+    with replica_reads(request):
+        data = await catalog_cache.acached_payload(view.cache_key(), sync_to_async(view.build_page))
+    return api_response(relink(data, request))
+
+
+@async_api_view(['GET'], permission_classes=[])
+async def product_detail(request, pk):
+    """ProductDetailView for the ASGI server"""
+    view = init_view(ProductDetailView, request, pk=pk)
+
+    async def build():
+        try:
+            product = await view.get_queryset().aget(pk=pk)
+        except Product.DoesNotExist:
+            raise NotFound()
+        return view.get_serializer(product).data
+
+    with replica_reads(request):
+        data = await catalog_cache.acached_payload(view.cache_key(), build)
+    return api_response(data)
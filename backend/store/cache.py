@@ -0,0 +1,180 @@
+import asyncio
+import hashlib
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.dispatch import receiver
+from core.metrics import register_collector
+from core.replicas import reading_from_replica
+from .signals import catalog_changed
+
+VERSION_KEY = 'catalog:version'
+# When the version was last bumped, as a Unix timestamp
+CHANGED_AT_KEY = 'catalog:changed_at'
+
+
+class CacheStats:
+    """Process-local hit/miss counters for the catalog cache"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counts = {'hits': 0, 'misses': 0, 'builds': 0, 'waits': 0}
+
+    def incr(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counts)
+
+
+stats = CacheStats()
+
+
+@register_collector
+def cache_metrics():
+    lines = [
+        '# HELP catalog_cache_events_total Catalog cache lookups by outcome',
+        '# TYPE catalog_cache_events_total counter',
+    ]
+    for event, count in sorted(stats.snapshot().items()):
+        lines.append(f'catalog_cache_events_total{{event="{event}"}} {count}')
+    return lines
+
+
+def get_catalog_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Seed from the clock so an evicted version never rolls back onto
+        # entries cached under an older one
+        cache.add(VERSION_KEY, time.time_ns() // 1000, timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    """Invalidate every cached catalog response"""
+    cache.set(CHANGED_AT_KEY, time.time(), timeout=None)
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        get_catalog_version()
+        return cache.incr(VERSION_KEY)
+
+
+@receiver(catalog_changed)
+def invalidate_catalog(sender, **kwargs):
+    bump_catalog_version()
+
+
+def normalize_params(query_params, case_insensitive=('search', 'category')):
+    """Stable cache key fragment for a QueryDict"""
+    items = []
+    for name in sorted(query_params):
+        for value in sorted(query_params.getlist(name)):
+            value = value.strip()
+            if not value:
+                continue
+            if name in case_insensitive:
+                value = value.lower()
+            items.append(f'{name}={value}')
+    return hashlib.md5('&'.join(items).encode()).hexdigest()
+
+
+def entry_timeout():
+    """
+    How long to keep a payload that was just built. One built from a
+    replica shortly after a catalog change may predate the change, so it's
+    only kept until the replicas are known to have caught up with it.
+    """
+    if reading_from_replica():
+        changed_at = cache.get(CHANGED_AT_KEY)
+        if changed_at is not None:
+            behind = changed_at + settings.DB_REPLICA_MAX_LAG - time.time()
+            if behind > 0:
+                return min(behind, settings.CATALOG_CACHE_TIMEOUT)
+    return settings.CATALOG_CACHE_TIMEOUT
+
+
+def lookup(key):
+    """The versioned cache key for ``key`` and its payload, or None on a miss"""
+    versioned_key = f'catalog:{get_catalog_version()}:{key}'
+    payload = cache.get(versioned_key)
+    stats.incr('misses' if payload is None else 'hits')
+    return versioned_key, payload
+
+
+def cached_payload(key, build):
+    """
+    Return the cached payload for ``key`` under the current catalog
+    version, building and storing it on a miss.
+
+    Only one process rebuilds a missing key at a time; the others wait
+    briefly for its result instead of stampeding the database.
+    """
+    versioned_key, payload = lookup(key)
+    if payload is not None:
+        return payload
+
+    lock_key = f'{versioned_key}:lock'
+    if cache.add(lock_key, 1, timeout=settings.CATALOG_CACHE_LOCK_TIMEOUT):
+        try:
+            stats.incr('builds')
+            payload = build()
+            cache.set(versioned_key, payload, timeout=entry_timeout())
+        finally:
+            cache.delete(lock_key)
+        return payload
+
+    stats.incr('waits')
+    deadline = time.monotonic() + settings.CATALOG_CACHE_LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(0.02)
+        payload = cache.get(versioned_key)
+        if payload is not None:
+            return payload
+        if not cache.get(lock_key):
+            break
+    # The builder failed or is too slow; build our own copy without storing it
+    return build()
+
+
+async def acached_payload(key, build):
+    """
+    cached_payload() for async views; ``build`` is a coroutine function.
+    Waiting for another process's build sleeps without holding a thread.
+    """
+    # Both reads in one worker thread hop; this is the path most requests take
+    versioned_key, payload = await sync_to_async(lookup)(key)
+    if payload is not None:
+        return payload
+
+    lock_key = f'{versioned_key}:lock'
+    if await cache.aadd(lock_key, 1, timeout=settings.CATALOG_CACHE_LOCK_TIMEOUT):
+        try:
+            stats.incr('builds')
+            payload = await build()
+            timeout = await sync_to_async(entry_timeout)()
+            await cache.aset(versioned_key, payload, timeout=timeout)
+        finally:
+            await cache.adelete(lock_key)
+        return payload
+
+    stats.incr('waits')
+    deadline = time.monotonic() + settings.CATALOG_CACHE_LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.02)
+        payload = await cache.aget(versioned_key)
+        if payload is not None:
+            return payload
+        if not await cache.aget(lock_key):
+            break
+    return await build()
@@ -0,0 +1,72 @@
+from django.db import transaction
+from .inventory import lock_products, set_reservations
+from .models import CartItem
+
+
+def apply_cart_operations(user, operations, atomic=False):
+    """
+    Apply validated cart operations ({'op', 'product_id', 'quantity'}) in
+    order and return {operation index: error dict} for the lines that failed.
+
+    Products are locked and checked in one query, the holds are updated
+    through set_reservations, and the cart lines are written with one
+    upsert and one delete. Failed lines are skipped, and a product whose
+    resulting quantity can't be held keeps its current cart line. With
+    ``atomic``, any failure leaves the cart untouched.
+    """
+    errors = {}
+    with transaction.atomic():
+        product_ids = {operation['product_id'] for operation in operations}
+        products = lock_products(product_ids)
+        quantities = dict(
+            CartItem.objects
+            .filter(user_id=user.id, product_id__in=product_ids)
+            .values_list('product_id', 'quantity')
+        )
+
+        touched = {}
+        for index, operation in enumerate(operations):
+            product_id = operation['product_id']
+            product = products.get(product_id)
+            if product is None:
+                errors[index] = {'error': 'Product does not exist'}
+                continue
+            if operation['op'] == 'remove':
+                quantity = 0
+            elif operation['op'] == 'set':
+                quantity = operation['quantity']
+            else:
+                quantity = quantities.get(product_id, 0) + operation['quantity']
+            if quantity > 0 and not product.is_in_stock:
+                errors[index] = {'error': 'Product is out of stock'}
+                continue
+            quantities[product_id] = quantity
+            touched.setdefault(product_id, []).append(index)
+        if errors and atomic:
+            return errors
+
+        targets = {product_id: quantities[product_id] for product_id in touched}
+        shortages = set_reservations(user, targets, products=products)
+        if shortages:
+            for shortage in shortages:
+                for index in touched[shortage['product_id']]:
+                    errors[index] = {'error': 'Not enough inventory', 'available': shortage['available']}
+                del targets[shortage['product_id']]
+            if atomic:
+                return errors
+            # Holds are all-or-nothing, so place the ones that fit again
+            set_reservations(user, targets, products=products)
+
+        CartItem.objects.bulk_create(
+            [
+                CartItem(user_id=user.id, product_id=product_id, quantity=quantity)
+                for product_id, quantity in targets.items() if quantity > 0
+            ],
+            update_conflicts=True,
+            unique_fields=['user', 'product'],
+            update_fields=['quantity', 'updated_at'],
+        )
+        removed = [product_id for product_id, quantity in targets.items() if quantity == 0]
+        if removed:
+            CartItem.objects.filter(user_id=user.id, product_id__in=removed).delete()
+    return errors
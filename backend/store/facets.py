@@ -0,0 +1,105 @@
+from bisect import bisect_right
+from decimal import Decimal
+
+from django.contrib.postgres.fields import ArrayField
+from django.db import connection, transaction
+from django.db.models import Count, DecimalField, Func, IntegerField, Value
+from .models import ProductFacet
+
+# Upper bounds of the price buckets. These must match store_price_bucket()
+# in migration 0004, which maintains the precomputed ProductFacet table.
+PRICE_BOUNDARIES = (Decimal('25'), Decimal('50'), Decimal('100'), Decimal('200'))
+
+# Filters the precomputed table can answer on its own
+PRECOMPUTED_PARAMS = {'category', 'page', 'page_size'}
+
+
+def price_bucket(price):
+    """Python twin of store_price_bucket()"""
+    return bisect_right(PRICE_BOUNDARIES, price)
+
+
+def price_bucket_expression():
+    return Func(
+        'price',
+        Value(list(PRICE_BOUNDARIES), output_field=ArrayField(DecimalField(max_digits=10, decimal_places=2))),
+        function='width_bucket',
+        output_field=IntegerField(),
+    )
+
+
+def is_precomputed(query_params):
+    """True if the facets for these params can come from ProductFacet"""
+    return all(
+        name in PRECOMPUTED_PARAMS or not query_params.get(name)
+        for name in query_params
+    )
+
+
+def precomputed_facets(category=None):
+    """Facets for all in-stock products, optionally within a category filter"""
+    rows = ProductFacet.objects.filter(product_count__gt=0)
+    if category:
+        rows = rows.filter(category__icontains=category)
+    return build_facets(rows.values_list('category', 'price_bucket', 'product_count'))
+
+
+def adhoc_facets(queryset):
+    """Facets for an arbitrary product queryset, in a single GROUP BY query"""
+    rows = (
+        queryset
+        .order_by()
+        .annotate(bucket=price_bucket_expression())
+        .values_list('category', 'bucket')
+        .annotate(count=Count('id'))
+    )
+    return build_facets(rows)
+
+
+def bucket_range(bucket):
+    """(min_price inclusive, max_price exclusive) as strings; None if open"""
+    low = PRICE_BOUNDARIES[bucket - 1] if bucket > 0 else None
+    high = PRICE_BOUNDARIES[bucket] if bucket < len(PRICE_BOUNDARIES) else None
+    return (
+        f'{low:.2f}' if low is not None else None,
+        f'{high:.2f}' if high is not None else None,
+    )
+
+
+def rebuild_facets():
+    """Recompute ProductFacet from scratch (the triggers keep it current)"""
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("LOCK TABLE store_productfacet IN EXCLUSIVE MODE")
+        cursor.execute("DELETE FROM store_productfacet")
+        cursor.execute(
+            "INSERT INTO store_productfacet (category, price_bucket, product_count) "
+            "SELECT category, store_price_bucket(price), count(*) "
+            "FROM store_product WHERE inventory_count > 0 GROUP BY 1, 2"
+        )
+        return cursor.rowcount
+
+
+def build_facets(rows):
+    """Fold (category, bucket, count) rows into the API representation"""
+    categories = {}
+    buckets = {}
+    for category, bucket, count in rows:
+        categories[category] = categories.get(category, 0) + count
+        buckets[bucket] = buckets.get(bucket, 0) + count
+
+    price_ranges = []
+    for bucket in range(len(PRICE_BOUNDARIES) + 1):
+        low, high = bucket_range(bucket)
+        price_ranges.append({
+            'min_price': low,
+            'max_price': high,
+            'count': buckets.get(bucket, 0),
+        })
+    return {
+        'total': sum(categories.values()),
+        'categories': [
+            {'category': category, 'count': count}
+            for category, count in sorted(categories.items(), key=lambda item: (-item[1], item[0]))
+        ],
+        'price_ranges': price_ranges,
+    }
@@ -0,0 +1,169 @@
+import csv
+import json
+import time
+from decimal import Decimal
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from .models import Product
+from .signals import notify_catalog_changed
+
+# Columns read from the feed; everything else is ignored
+IMPORT_FIELDS = ('sku', 'name', 'description', 'price', 'inventory_count', 'image_url', 'category')
+
+# Columns an existing product can take from the feed on conflict, when the
+# row supplies them. created_at, reserved_count and the trigger-maintained
+# search vector are left alone.
+UPDATE_FIELDS = ['name', 'description', 'price', 'inventory_count', 'image_url', 'category']
+
+
+class ImportReport:
+    """Running totals for one import"""
+
+    def __init__(self):
+        self.rows = 0
+        self.imported = 0
+        self.errors = 0
+        self.batches = 0
+        self.started = time.monotonic()
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+
+def read_rows(stream, format):
+    """Yield (line number, row dict) pairs from a CSV or JSON Lines stream"""
+    if format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif format == 'jsonl':
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                row = e
+            yield line_number, row
+    else:
+        raise ValueError(f'Unsupported import format: {format}')
+
+
+def row_values(row):
+    """The import columns a feed row has values for, stripped"""
+    values = {}
+    for field in IMPORT_FIELDS:
+        value = row.get(field)
+        if isinstance(value, str):
+            value = value.strip()
+        elif isinstance(value, float):
+            # JSON numbers arrive as floats; 19.99 should stay 19.99
+            value = Decimal(str(value))
+        if value not in (None, ''):
+            values[field] = value
+    return values
+
+
+def build_product(row, existing_ids=None):
+    """
+    An unsaved Product for a feed row, validated against the model's field
+    constraints, and the update fields the row supplies values for; an
+    absent or blank column keeps an existing product's value rather than
+    resetting it to the default. A row for a sku in ``existing_ids``
+    ({sku: id}) only needs the columns it updates; new products need every
+    required column. Raises ValidationError for bad rows.
+    """
+    if isinstance(row, Exception):
+        raise ValidationError({'__all__': [f'Invalid JSON: {row}']})
+    if not isinstance(row, dict):
+        raise ValidationError({'__all__': ['Expected an object']})
+
+    values = row_values(row)
+    if 'sku' not in values:
+        raise ValidationError({'sku': ['This field is required.']})
+
+    product = Product(**values)
+    exclude = ['search_vector']
+    missing = [field for field in UPDATE_FIELDS if field not in values]
+    existing_id = (existing_ids or {}).get(str(values['sku']))
+    if existing_id is not None and any(
+        not Product._meta.get_field(field).has_default() for field in missing
+    ):
+        # Too partial to insert, so update the existing row by id instead
+        product.pk = existing_id
+        exclude += missing
+    # clean_fields() also converts the raw strings to Python values
+    product.clean_fields(exclude=exclude)
+    return product, tuple(field for field in UPDATE_FIELDS if field in values)
+
+
+def import_batch(products):
+    """
+    Write one batch of (product, update fields): complete rows are upserted
+    on sku, partial rows for existing products (those build_product gave an
+    id) are updated by id. One statement per set of update fields, usually
+    just one for the batch.
+    """
+    groups = {}
+    now = timezone.now()
+    for product, update_fields in products:
+        groups.setdefault((product.pk is not None, update_fields), []).append(product)
+    with transaction.atomic():
+        for (existing, update_fields), group in groups.items():
+            if existing:
+                for product in group:
+                    product.updated_at = now
+                Product.objects.bulk_update(group, [*update_fields, 'updated_at'])
+            else:
+                Product.objects.bulk_create(
+                    group,
+                    update_conflicts=True,
+                    unique_fields=['sku'],
+                    update_fields=[*update_fields, 'updated_at'],
+                )
+        # One cache invalidation for the whole batch; the per-instance
+        # post_save signal doesn't fire for bulk writes
+        notify_catalog_changed()
+
+
+def import_products(rows, batch_size=1000, on_error=None):
+    """
+    Validate and upsert (line number, row) pairs in batches of
+    ``batch_size``, holding only one batch in memory at a time.
+
+    Bad rows are skipped and passed to ``on_error(line_number, row, errors)``.
+    A sku repeated within a batch keeps its last row. Returns an ImportReport.
+    """
+    report = ImportReport()
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, batch_size))
+        if not chunk:
+            break
+        # Rows for skus already in the catalog may be partial updates
+        skus = [str(row['sku']).strip() for _, row in chunk if isinstance(row, dict) and row.get('sku')]
+        existing_ids = dict(Product.objects.filter(sku__in=skus).values_list('sku', 'id'))
+        batch = {}
+        for line_number, row in chunk:
+            report.rows += 1
+            try:
+                product, update_fields = build_product(row, existing_ids)
+            except ValidationError as e:
+                report.errors += 1
+                if on_error is not None:
+                    on_error(line_number, row, e.message_dict)
+                continue
+            batch[product.sku] = (product, update_fields)
+        if batch:
+            import_batch(list(batch.values()))
+            report.imported += len(batch)
+            report.batches += 1
+    return report
@@ -0,0 +1,197 @@
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from .models import Product, StockReservation
+from .signals import notify_catalog_changed
+
+
+def lock_products(product_ids):
+    """
+    Lock product rows for update, always in id order.
+
+    Everything that changes stock or reservations takes its locks in the
+    same order (products first, then reservations), so concurrent carts
+    and checkouts that share products queue instead of deadlocking.
+    """
+    return {
+        product.id: product
+        for product in (
+            Product.objects
+            .select_for_update()
+            .filter(id__in=product_ids)
+            # With what checkout snapshots onto order lines
+            .only('id', 'name', 'price', 'category', 'image_url', 'inventory_count', 'reserved_count')
+            .order_by('id')
+        )
+    }
+
+
+def per_product(values):
+    """CASE WHEN id = ... THEN value ... END for {product_id: value}"""
+    return Case(
+        *[When(id=product_id, then=Value(value)) for product_id, value in values.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def adjust_stock(deltas):
+    """
+    Apply {product_id: delta} to inventory_count in a single UPDATE.
+
+    Negative deltas only apply where enough stock is left, so the database
+    itself refuses to oversell. Returns the number of rows updated.
+    """
+    if not deltas:
+        return 0
+    # Stock levels are part of the cached catalog responses
+    notify_catalog_changed()
+    condition = reduce(or_, (
+        Q(id=product_id, inventory_count__gte=-delta) if delta < 0 else Q(id=product_id)
+        for product_id, delta in deltas.items()
+    ))
+    return Product.objects.filter(condition).update(
+        inventory_count=F('inventory_count') + per_product(deltas)
+    )
+
+
+def consume_stock(quantities, held):
+    """
+    Take {product_id: quantity} out of stock in a single UPDATE, using up
+    the caller's reservations ``held`` ({product_id: quantity}) on the way.
+
+    A line only applies if unreserved stock plus the caller's own hold
+    covers it. Returns the number of rows updated.
+    """
+    if not quantities:
+        return 0
+    notify_catalog_changed()
+    condition = reduce(or_, (
+        Q(id=product_id, inventory_count__gte=F('reserved_count') + (quantity - held.get(product_id, 0)))
+        for product_id, quantity in quantities.items()
+    ))
+    return Product.objects.filter(condition).update(
+        inventory_count=F('inventory_count') - per_product(quantities),
+        reserved_count=Greatest(F('reserved_count') - per_product(held), Value(0)),
+    )
+
+
+def availability_changed(products, deltas):
+    """
+    Whether adding {product_id: delta} to the reserved counts of the
+    locked ``products`` sells any of them out or frees one up again.
+    """
+    return any(
+        (product.available_count > 0)
+        != (product.inventory_count > max(product.reserved_count + deltas[product_id], 0))
+        for product_id, product in products.items() if product_id in deltas
+    )
+
+
+def reservation_expiry():
+    return timezone.now() + timedelta(seconds=settings.CART_RESERVATION_TTL)
+
+
+def set_reservations(user, quantities, products=None):
+    """
+    Hold {product_id: quantity} of stock for ``user`` until the TTL runs
+    out, replacing any earlier hold on those products (0 releases it).
+
+    Holds are all-or-nothing: if any product can't cover its increase,
+    nothing changes and a list describing the short lines is returned.
+    Returns an empty list on success. Callers that already hold the
+    product locks pass them as ``products`` ({id: product}).
+    """
+    with transaction.atomic():
+        if products is None:
+            products = lock_products(quantities)
+        existing = dict(
+            StockReservation.objects
+            .select_for_update()
+            .filter(user_id=user.id, product_id__in=quantities)
+            .values_list('product_id', 'quantity')
+        )
+
+        shortages = []
+        deltas = {}
+        for product_id, quantity in quantities.items():
+            held = existing.get(product_id, 0)
+            product = products.get(product_id)
+            available = product.available_count + held if product else 0
+            if quantity > available:
+                shortages.append({
+                    'product_id': product_id,
+                    'requested': quantity,
+                    'available': available,
+                })
+            elif quantity != held:
+                deltas[product_id] = quantity - held
+        if shortages:
+            return shortages
+
+        if deltas:
+            Product.objects.filter(id__in=deltas).update(
+                reserved_count=F('reserved_count') + per_product(deltas)
+            )
+            # Cart writes are frequent, so the cached catalog is only dropped
+            # when a hold flips a product between available and held out;
+            # the cached available_count may otherwise lag a little.
+            if availability_changed(products, deltas):
+                notify_catalog_changed()
+
+        expires_at = reservation_expiry()
+        StockReservation.objects.bulk_create(
+            [
+                StockReservation(
+                    user_id=user.id, product_id=product_id, quantity=quantity, expires_at=expires_at
+                )
+                for product_id, quantity in quantities.items() if quantity > 0
+            ],
+            update_conflicts=True,
+            unique_fields=['user', 'product'],
+            update_fields=['quantity', 'expires_at', 'updated_at'],
+        )
+        released = [product_id for product_id, quantity in quantities.items() if quantity == 0]
+        if released:
+            StockReservation.objects.filter(user_id=user.id, product_id__in=released).delete()
+    return []
+
+
+def release_expired_reservations(batch_size=1000):
+    """
+    Release one batch of expired holds. Returns how many were released.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        candidates = list(
+            StockReservation.objects
+            .filter(expires_at__lte=now)
+            .order_by('id')
+            .values_list('product_id', flat=True)[:batch_size]
+        )
+        if not candidates:
+            return 0
+        products = lock_products(set(candidates))
+        expired = list(
+            StockReservation.objects
+            .select_for_update(skip_locked=True)
+            .filter(expires_at__lte=now, product_id__in=set(candidates))
+            .order_by('id')[:batch_size]
+        )
+        totals = {}
+        for reservation in expired:
+            totals[reservation.product_id] = totals.get(reservation.product_id, 0) + reservation.quantity
+        if totals:
+            Product.objects.filter(id__in=totals).update(
+                reserved_count=Greatest(F('reserved_count') - per_product(totals), Value(0))
+            )
+            StockReservation.objects.filter(id__in=[reservation.id for reservation in expired]).delete()
+            if availability_changed(products, {product_id: -total for product_id, total in totals.items()}):
+                notify_catalog_changed()
+    return len(expired)
@@ -0,0 +1,50 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from store.importer import import_products
+
+
+class Rollback(Exception):
+    pass
+
+
+def synthetic_rows(count, prefix):
+    for n in range(count):
+        yield n + 1, {
+            'sku': f'{prefix}-{n:08d}',
+            'name': f'Benchmark product {n}',
+            'description': 'Synthetic product generated by benchmark_import.',
+            'price': str(Decimal(n % 50000 + 1) / 100),
+            'inventory_count': str(n % 20),
+            'image_url': f'https://example.com/images/{n}.jpg',
+            'category': f'Category {n % 25}',
+        }
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure import throughput with synthetic rows: an insert pass, then an "
+        "update pass over the same skus. Everything is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--prefix', default='BENCH')
+
+    def handle(self, **options):
+        try:
+            with transaction.atomic():
+                for label in ('insert', 'update'):
+                    report = import_products(
+                        synthetic_rows(options['rows'], options['prefix']),
+                        batch_size=options['batch_size'],
+                    )
+                    self.stdout.write(
+                        f"{label}: {report.imported} row(s) in {report.elapsed:.2f}s "
+                        f"({report.rows_per_second:.0f} rows/s)"
+                    )
+                raise Rollback
+        except Rollback:
+            pass
@@ -0,0 +1,69 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from core.renderers import ORJSONRenderer
+from core.rows import RowSerializer
+from store.importer import import_products
+from store.models import Product
+from store.serializers import PRODUCT_COMPUTED, PRODUCT_SUMMARY_FIELDS, ProductSerializer
+from .benchmark_import import Rollback, synthetic_rows
+
+
+def best_of(repeat, function):
+    """The fastest of ``repeat`` runs in seconds, and the last result"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare ProductSerializer + JSONRenderer with RowSerializer + ORJSONRenderer "
+        "on synthetic products, for the full and the summary fieldsets. Queries are "
+        "timed too. Everything is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--prefix', default='SERIAL')
+
+    def handle(self, **options):
+        try:
+            with transaction.atomic():
+                import_products(synthetic_rows(options['rows'], options['prefix']))
+                products = Product.objects.filter(sku__startswith=options['prefix'])
+                for label, fields in (
+                    ('full', ProductSerializer.Meta.fields),
+                    ('summary', PRODUCT_SUMMARY_FIELDS),
+                ):
+                    self.compare(label, products, fields, options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def compare(self, label, products, fields, repeat):
+        rows = RowSerializer(ProductSerializer(fields=fields), PRODUCT_COMPUTED)
+        instances = list(products)
+        values = list(products.values(*rows.columns))
+
+        drf, expected = best_of(repeat, lambda: JSONRenderer().render(
+            ProductSerializer(instances, many=True, fields=fields).data
+        ))
+        fast, content = best_of(repeat, lambda: ORJSONRenderer().render(rows.serialize(values)))
+        if content != expected:
+            raise CommandError(f'{label}: RowSerializer output differs from ProductSerializer')
+        drf_query, _ = best_of(repeat, lambda: list(products.all()))
+        fast_query, _ = best_of(repeat, lambda: list(products.values(*rows.columns)))
+
+        count = len(instances)
+        self.stdout.write(
+            f"{label}: {count} product(s), serialize + render "
+            f"{drf * 1e6 / count:.1f}us -> {fast * 1e6 / count:.1f}us per row "
+            f"({drf / fast:.1f}x); query {drf_query * 1000:.1f}ms -> {fast_query * 1000:.1f}ms"
+        )
@@ -0,0 +1,60 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from store.importer import import_products, read_rows
+
+
+class Command(BaseCommand):
+    help = "Stream a CSV or JSON Lines product feed into the catalog, upserting on sku."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Feed file, or - for stdin")
+        parser.add_argument(
+            '--format', choices=['csv', 'jsonl'],
+            help="Feed format. Guessed from the file extension when omitted."
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--max-errors', type=int, default=None,
+            help="Stop after this many bad rows (rows already imported are kept)."
+        )
+
+    def handle(self, **options):
+        path = options['path']
+        format = options['format']
+        if format is None:
+            if path.endswith('.csv'):
+                format = 'csv'
+            elif path.endswith(('.jsonl', '.ndjson')):
+                format = 'jsonl'
+            else:
+                raise CommandError("Can't tell the feed format; pass --format")
+
+        errors = []
+        max_errors = options['max_errors']
+
+        def on_error(line_number, row, messages):
+            errors.append(line_number)
+            details = '; '.join(
+                f"{field}: {' '.join(field_errors)}" for field, field_errors in messages.items()
+            )
+            sku = row.get('sku') if isinstance(row, dict) else None
+            self.stderr.write(f"Line {line_number}" + (f" ({sku})" if sku else "") + f": {details}")
+            if max_errors is not None and len(errors) >= max_errors:
+                raise CommandError(f"Stopped after {len(errors)} bad row(s)")
+
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            report = import_products(
+                read_rows(stream, format),
+                batch_size=options['batch_size'],
+                on_error=on_error,
+            )
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report.imported} of {report.rows} row(s) in {report.batches} batch(es), "
+            f"{report.errors} error(s), {report.elapsed:.1f}s ({report.rows_per_second:.0f} rows/s)"
+        ))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from store.facets import rebuild_facets
+
+
+class Command(BaseCommand):
+    help = "Recompute the precomputed category / price-bucket facet counts."
+
+    def handle(self, **options):
+        rows = rebuild_facets()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} facet row(s)"))
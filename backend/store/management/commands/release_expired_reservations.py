@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+from store.inventory import release_expired_reservations
+
+
+class Command(BaseCommand):
+    help = "Release expired cart stock reservations in bulk."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help="Keep running, sweeping every INTERVAL seconds. Runs once when 0."
+        )
+
+    def handle(self, **options):
+        while True:
+            released = 0
+            while True:
+                count = release_expired_reservations(batch_size=options['batch_size'])
+                released += count
+                if count < options['batch_size']:
+                    break
+            self.stdout.write(f"Released {released} expired reservation(s)")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,80 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:40
+
+from django.db import migrations, models
+
+
+# Bucket boundaries must match store.facets.PRICE_BOUNDARIES
+FACET_TRIGGER_SQL = """
+CREATE FUNCTION store_price_bucket(price numeric) RETURNS integer AS $$
+    SELECT width_bucket(price, ARRAY[25, 50, 100, 200]::numeric[])
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE FUNCTION store_product_facets_update() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.inventory_count > 0 THEN
+        UPDATE store_productfacet
+        SET product_count = product_count - 1
+        WHERE category = OLD.category AND price_bucket = store_price_bucket(OLD.price);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.inventory_count > 0 THEN
+        INSERT INTO store_productfacet (category, price_bucket, product_count)
+        VALUES (NEW.category, store_price_bucket(NEW.price), 1)
+        ON CONFLICT (category, price_bucket)
+        DO UPDATE SET product_count = store_productfacet.product_count + 1;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER store_product_facets_insert_delete
+    AFTER INSERT OR DELETE ON store_product
+    FOR EACH ROW EXECUTE FUNCTION store_product_facets_update();
+
+-- Ordinary stock changes don't move a product between facets; only fire
+-- when the category, price bucket or in-stock state actually changes
+CREATE TRIGGER store_product_facets_update
+    AFTER UPDATE OF category, price, inventory_count ON store_product
+    FOR EACH ROW
+    WHEN (
+        OLD.category IS DISTINCT FROM NEW.category
+        OR store_price_bucket(OLD.price) <> store_price_bucket(NEW.price)
+        OR (OLD.inventory_count > 0) <> (NEW.inventory_count > 0)
+    )
+    EXECUTE FUNCTION store_product_facets_update();
+
+INSERT INTO store_productfacet (category, price_bucket, product_count)
+SELECT category, store_price_bucket(price), count(*)
+FROM store_product
+WHERE inventory_count > 0
+GROUP BY 1, 2;
+"""
+
+DROP_FACET_TRIGGER_SQL = """
+DROP TRIGGER IF EXISTS store_product_facets_update ON store_product;
+DROP TRIGGER IF EXISTS store_product_facets_insert_delete ON store_product;
+DROP FUNCTION IF EXISTS store_product_facets_update();
+DROP FUNCTION IF EXISTS store_price_bucket(numeric);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0003_stock_reservations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductFacet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(max_length=100)),
+                ('price_bucket', models.PositiveSmallIntegerField()),
+                ('product_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('category', 'price_bucket')},
+            },
+        ),
+        migrations.RunSQL(FACET_TRIGGER_SQL, DROP_FACET_TRIGGER_SQL),
+    ]
@@ -1,9 +1,14 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
+from django.db.models.functions import Upper
 from decimal import Decimal
 
 class Product(models.Model):
+    # Supplier stock-keeping unit; the natural key for catalog imports
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)
     name = models.CharField(max_length=200, db_index=True)
     description = models.TextField()
     price = models.DecimalField(
@@ -12,25 +17,63 @@ class Product(models.Model):
         validators=[MinValueValidator(Decimal('0.01'))]
     )
     inventory_count = models.PositiveIntegerField(default=0, db_index=True)
+    # Units held by active cart reservations (see store/inventory.py)
+    reserved_count = models.PositiveIntegerField(default=0)
     image_url = models.URLField(max_length=500)
     category = models.CharField(max_length=100, default='General', db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Maintained by the store_product_search_vector trigger (see migration 0002)
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['category', 'price']),
             models.Index(fields=['inventory_count']),
+            GinIndex(fields=['search_vector'], name='store_product_search_gin'),
+            # Case-insensitive prefix searches (name__istartswith, admin ^name)
+            models.Index(
+                OpClass(Upper('name'), name='text_pattern_ops'), name='store_product_name_upper'
+            ),
         ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, update_fields=None, **kwargs):
+        # reserved_count only changes through the UPDATEs in store/inventory.py;
+        # a full save from a stale instance (admin, scripts) must not write it back
+        if update_fields is None and not self._state.adding and not kwargs.get('force_insert'):
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'reserved_count'
+            ]
+        super().save(*args, update_fields=update_fields, **kwargs)
+
     @property
     def is_in_stock(self):
         return self.inventory_count > 0
 
+    @property
+    def available_count(self):
+        return max(self.inventory_count - self.reserved_count, 0)
+
+class ProductFacet(models.Model):
+    """
+    In-stock product counts per category and price bucket, kept current by
+    the store_product_facets triggers (see migration 0004).
+    """
+    category = models.CharField(max_length=100)
+    price_bucket = models.PositiveSmallIntegerField()
+    product_count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ['category', 'price_bucket']
+
+    def __str__(self):
+        return f"{self.category} / {self.price_bucket}: {self.product_count}"
+
 class CartItem(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='cart_items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
@@ -49,4 +92,19 @@ class CartItem(models.Model):
 
     @property
     def total_price(self):
-        return self.quantity * self.product.price
\ No newline at end of file
+        return self.quantity * self.product.price
+
+class StockReservation(models.Model):
+    """Stock held for a user's cart until ``expires_at``"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='stock_reservations')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['user', 'product']
+
+    def __str__(self):
+        return f"{self.user_id} holds {self.quantity} x {self.product_id}"
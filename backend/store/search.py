@@ -0,0 +1,61 @@
+import re
+from functools import lru_cache
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db import connection
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import Cast
+
+SEARCH_CONFIG = 'english'
+# How much a fuzzy name match counts relative to full-text rank
+TRIGRAM_WEIGHT = 0.3
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+@lru_cache(maxsize=None)
+def has_trigram_support():
+    """Return True if the pg_trgm extension is installed"""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
+def build_search_query(term):
+    """Turn free text into a prefix tsquery ("wirel head" -> wirel:* & head:*)"""
+    tokens = TOKEN_RE.findall(term.lower())
+    if not tokens:
+        return None
+    return SearchQuery(
+        ' & '.join(f'{token}:*' for token in tokens),
+        search_type='raw',
+        config=SEARCH_CONFIG,
+    )
+
+
+def search_products(queryset, term):
+    """
+    Filter a Product queryset by a search term, best matches first.
+
+    Matches the weighted search vector (name > category > description) with
+    prefix matching, and falls back to trigram similarity on the name so
+    that typos still find something. Both paths are served by GIN indexes.
+    """
+    term = term.strip()
+    query = build_search_query(term)
+    if query is None:
+        return queryset.none()
+
+    condition = Q(search_vector=query)
+    # double precision, so the rank round-trips exactly through keyset cursors
+    rank = Cast(SearchRank(F('search_vector'), query), FloatField())
+    if has_trigram_support():
+        condition |= Q(name__trigram_word_similar=term)
+        rank = rank + TrigramWordSimilarity(term, 'name') * TRIGRAM_WEIGHT
+
+    return (
+        queryset
+        .filter(condition)
+        .annotate(search_rank=rank)
+        .order_by('-search_rank', '-created_at', '-id')
+    )
@@ -1,19 +1,82 @@
+from operator import mul
+
 from rest_framework import serializers
 from .models import Product, CartItem
 from django.contrib.auth.models import User
 
+# The slim representation for listings and for products nested in carts
+PRODUCT_SUMMARY_FIELDS = ['id', 'name', 'price', 'image_url', 'is_in_stock']
+
+# Product properties as (columns, function of their values), for values() rows
+PRODUCT_COMPUTED = {
+    'is_in_stock': (['inventory_count'], lambda inventory: inventory > 0),
+    'available_count': (
+        ['inventory_count', 'reserved_count'], lambda inventory, reserved: max(inventory - reserved, 0)
+    ),
+}
+
+CART_ITEM_COMPUTED = {
+    'total_price': (['quantity', 'product__price'], mul),
+    **{f'product.{name}': value for name, value in PRODUCT_COMPUTED.items()},
+}
+
+# Serializer fields computed from other columns, for narrowing querysets
+PRODUCT_FIELD_COLUMNS = {name: columns for name, (columns, _) in PRODUCT_COMPUTED.items()}
+
+def product_columns(fields, prefix=''):
+    """The Product columns that ``fields`` are read from, for QuerySet.only()"""
+    columns = {'id'}
+    for field in fields:
+        columns.update(PRODUCT_FIELD_COLUMNS.get(field, [field]))
+    return [prefix + column for column in sorted(columns)]
+
+def select_fields(query_params, available, default):
+    """
+    The fields picked by ?fields= and ?omit= (comma-separated names),
+    starting from ``default``, in ``available`` order.
+    """
+    names = {}
+    for param in ('fields', 'omit'):
+        value = query_params.get(param)
+        names[param] = {name.strip() for name in value.split(',') if name.strip()} if value else set()
+        unknown = names[param] - set(available)
+        if unknown:
+            raise serializers.ValidationError({param: [f"Unknown field(s): {', '.join(sorted(unknown))}"]})
+    selected = names['fields'] or set(default)
+    return [field for field in available if field in selected and field not in names['omit']]
+
 class ProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = [
             'id', 'name', 'description', 'price', 'inventory_count', 
-            'image_url', 'category', 'created_at', 'updated_at', 'is_in_stock'
+            'image_url', 'category', 'created_at', 'updated_at', 'is_in_stock',
+            'available_count'
         ]
-        read_only_fields = ['created_at', 'updated_at', 'is_in_stock']
+        read_only_fields = ['created_at', 'updated_at', 'is_in_stock', 'available_count']
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Sparse fieldsets: only render the named fields
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+class ProductSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Product
+        fields = PRODUCT_SUMMARY_FIELDS
+        read_only_fields = fields
 
 class CartItemSerializer(serializers.ModelSerializer):
-    product = ProductSerializer(read_only=True)
-    product_id = serializers.IntegerField(write_only=True)
+    product = ProductSummarySerializer(read_only=True)
+    # Resolves to the Product instance, so the view doesn't fetch it again
+    product_id = serializers.PrimaryKeyRelatedField(
+        source='product',
+        queryset=Product.objects.all(),
+        write_only=True,
+        error_messages={'does_not_exist': 'Product does not exist'},
+    )
     total_price = serializers.ReadOnlyField()
 
     class Meta:
@@ -22,15 +85,31 @@ class CartItemSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at']
 
     def validate_product_id(self, value):
-        try:
-            product = Product.objects.get(id=value)
-            if not product.is_in_stock:
-                raise serializers.ValidationError("Product is out of stock")
-            return value
-        except Product.DoesNotExist:
-            raise serializers.ValidationError("Product does not exist")
+        if not value.is_in_stock:
+            raise serializers.ValidationError("Product is out of stock")
+        return value
 
     def validate_quantity(self, value):
         if value <= 0:
             raise serializers.ValidationError("Quantity must be greater than 0")
-        return value
\ No newline at end of file
+        return value
+
+class CartOperationSerializer(serializers.Serializer):
+    op = serializers.ChoiceField(choices=['add', 'set', 'remove'])
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(required=False, min_value=0)
+
+    def validate(self, data):
+        quantity = data.get('quantity')
+        if data['op'] == 'add':
+            if quantity == 0:
+                raise serializers.ValidationError({'quantity': "Quantity must be greater than 0"})
+            data['quantity'] = quantity or 1
+        elif data['op'] == 'set' and quantity is None:
+            raise serializers.ValidationError({'quantity': "This field is required."})
+        return data
+
+class CartBatchSerializer(serializers.Serializer):
+    # Lines are validated one by one, so a bad line doesn't reject the batch
+    operations = serializers.ListField(child=serializers.DictField(), allow_empty=False, max_length=100)
+    atomic = serializers.BooleanField(default=False)
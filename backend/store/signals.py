@@ -0,0 +1,18 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+from .models import Product
+
+# Sent once per logical change to the catalog (a save, a delete, a bulk
+# update or import batch), after the change is committed
+catalog_changed = Signal()
+
+
+def notify_catalog_changed():
+    """Send catalog_changed once the current transaction commits"""
+    transaction.on_commit(lambda: catalog_changed.send(sender=Product))
+
+
+@receiver([post_save, post_delete], sender=Product)
+def product_changed(sender, **kwargs):
+    notify_catalog_changed()
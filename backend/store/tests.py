@@ -1,3 +1,773 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import time
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core import replicas
+from core.factories import make_product
+from . import async_views
+from . import cache as catalog_cache
+from . import facets
+from .importer import import_products, read_rows
+from .models import CartItem, Product, ProductFacet, StockReservation
+from .serializers import CartItemSerializer, ProductSerializer
+from .signals import catalog_changed
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.headphones = make_product(
+            name='Wireless Bluetooth Headphones',
+            description='Noise-cancelling over-ear audio',
+            category='Electronics',
+        )
+        self.cable = make_product(
+            name='Charging Cable',
+            description='Works with wireless headphones and phones',
+            category='Electronics',
+        )
+        self.mug = make_product(name='Coffee Mug', description='Ceramic', category='Kitchen')
+
+    def search(self, term):
+        response = self.client.get(reverse('product-list'), {'search': term})
+        self.assertEqual(response.status_code, 200)
+        return [product['id'] for product in response.data['results']]
+
+    def test_name_matches_rank_above_description_matches(self):
+        self.assertEqual(self.search('headphones'), [self.headphones.id, self.cable.id])
+
+    def test_prefix_matching(self):
+        self.assertEqual(self.search('wirel headph'), [self.headphones.id, self.cable.id])
+
+    def test_category_is_searchable(self):
+        self.assertEqual(self.search('kitchen'), [self.mug.id])
+
+    def test_search_vector_follows_updates(self):
+        self.mug.name = 'Espresso Cup'
+        self.mug.save()
+        self.assertEqual(self.search('espresso'), [self.mug.id])
+        self.assertEqual(self.search('mug'), [])
+
+    def test_search_without_words_matches_nothing(self):
+        self.assertEqual(self.search('!!!'), [])
+
+    @mock.patch('store.search.has_trigram_support', return_value=False)
+    def test_search_matches_words_not_substrings(self, _):
+        # Unlike the old icontains filter, a fragment inside a word is no match
+        self.assertEqual(self.search('adphone'), [])
+        # Only stop words, so the tsquery is empty
+        self.assertEqual(self.search('with'), [])
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        catalog_cache.stats.reset()
+        self.client = APIClient()
+        self.product = make_product(name='Desk Lamp')
+
+    def test_detail_is_served_from_cache(self):
+        url = reverse('product-detail', args=[self.product.id])
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.data['name'], 'Desk Lamp')
+        self.assertEqual(catalog_cache.stats.snapshot()['hits'], 1)
+
+    def test_listing_key_ignores_param_order_and_case(self):
+        self.client.get(reverse('product-list') + '?search=Lamp&page=1')
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('product-list') + '?page=1&search=lamp')
+        self.assertEqual(response.data['count'], 1)
+
+    def test_cached_pages_link_from_the_current_request(self):
+        for n in range(12):
+            make_product(name=f'Lamp {n}')
+        self.client.get(reverse('product-list'), {'search': 'LAMP'})
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('product-list'), {'search': 'lamp'}, secure=True)
+        self.assertEqual(response.data['next'], 'https://testserver/api/products/?page=2&search=lamp')
+
+        self.client.get(reverse('product-list'), {'search': 'LAMP', 'page': 2})
+        response = self.client.get(reverse('product-list'), {'search': 'lamp', 'page': 2}, secure=True)
+        self.assertEqual(response.data['previous'], 'https://testserver/api/products/?search=lamp')
+
+    def test_product_changes_invalidate(self):
+        url = reverse('product-detail', args=[self.product.id])
+        self.client.get(url)
+        self.client.get(reverse('product-list'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.name = 'Floor Lamp'
+            self.product.save()
+        self.assertEqual(self.client.get(url).data['name'], 'Floor Lamp')
+        self.assertEqual(self.client.get(reverse('product-list')).data['results'][0]['name'], 'Floor Lamp')
+
+    def test_bulk_stock_updates_invalidate(self):
+        from orders.checkout import adjust_stock
+
+        url = reverse('product-detail', args=[self.product.id])
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            adjust_stock({self.product.id: -3})
+        self.assertEqual(self.client.get(url).data['inventory_count'], 7)
+
+    @override_settings(DB_REPLICA_MAX_LAG=0.2)
+    def test_replica_builds_right_after_a_change_expire_with_the_lag(self):
+        url = reverse('product-detail', args=[self.product.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+        # Reads go to "a replica" (the test database)
+        with mock.patch.object(replicas.pool, 'choose', return_value='default'):
+            self.client.get(url)
+            time.sleep(0.25)
+            self.client.get(url)
+            self.assertEqual(catalog_cache.stats.snapshot()['builds'], 2)
+            self.client.get(url)
+        # Built once the replicas had caught up, so kept for the full timeout
+        self.assertEqual(catalog_cache.stats.snapshot()['builds'], 2)
+
+    def test_missing_products_are_not_cached(self):
+        url = reverse('product-detail', args=[999999])
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(catalog_cache.stats.snapshot()['hits'], 0)
+
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.product = make_product(name='Desk Lamp', description='x' * 2000)
+
+    def test_listing_defaults_to_the_summary(self):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(reverse('product-list'))
+        self.assertEqual(
+            list(response.data['results'][0]),
+            ['id', 'name', 'price', 'image_url', 'is_in_stock']
+        )
+        self.assertNotIn('description', captured[-1]['sql'])
+
+    def test_fields_and_omit(self):
+        response = self.client.get(reverse('product-list'), {'fields': 'name,available_count'})
+        self.assertEqual(response.data['results'][0], {'name': 'Desk Lamp', 'available_count': 10})
+
+        url = reverse('product-detail', args=[self.product.id])
+        response = self.client.get(url, {'omit': 'description,created_at,updated_at'})
+        self.assertNotIn('description', response.data)
+        self.assertEqual(response.data['inventory_count'], 10)
+        # Each fieldset is cached separately
+        self.assertIn('description', self.client.get(url).data)
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get(reverse('product-list'), {'fields': 'name,password'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', str(response.data['fields']))
+
+    def test_cursor_pages_with_narrowed_columns(self):
+        make_product(name='Floor Lamp')
+        params = {'search': 'lamp', 'pagination': 'cursor', 'page_size': 1, 'fields': 'id'}
+        # The cursor's ordering values are loaded with the page, not deferred
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('product-list'), params)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNotNone(response.data['next'])
+
+
+class RowSerializationTests(TestCase):
+    """The values()-based fast path renders the same bytes as the ModelSerializers"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='shopper', password='secret-pass-123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.products = [
+            make_product(name='Desk Lamp \u2028 \u00e9', price=Decimal('19.90'), inventory_count=0),
+            make_product(name='Kettle', price=Decimal('0.05'), inventory_count=4, reserved_count=6),
+            make_product(name='Chair', price=Decimal('12345678.00'), inventory_count=3),
+        ]
+
+    def test_product_list_matches_product_serializer(self):
+        fields = ','.join(ProductSerializer.Meta.fields)
+        response = self.client.get(reverse('product-list'), {'fields': fields})
+        products = Product.objects.filter(inventory_count__gt=0)
+        expected = JSONRenderer().render(ProductSerializer(products, many=True).data)
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
+        self.assertIn(expected[1:-1], response.content)
+
+    def test_cart_matches_cart_item_serializer(self):
+        for quantity, product in enumerate(self.products, start=1):
+            CartItem.objects.create(user=self.user, product=product, quantity=quantity)
+        response = self.client.get(reverse('cart-list'))
+        items = CartItem.objects.filter(user=self.user).select_related('product')
+        expected = JSONRenderer().render(CartItemSerializer(items, many=True).data)
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
+        self.assertIn(expected, response.content)
+
+    def test_benchmark_command_checks_output_and_rolls_back(self):
+        stdout = StringIO()
+        call_command('benchmark_serialization', rows=20, repeat=1, stdout=stdout)
+        self.assertIn('summary: 20 product(s)', stdout.getvalue())
+        self.assertEqual(Product.objects.count(), 3)
+
+
+class AsyncCatalogTests(TestCase):
+    """The ASGI catalog views answer exactly like the DRF ones"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        for n in range(3):
+            make_product(name=f'Desk Lamp {n}', price=Decimal(f'1{n}.50'))
+        self.product = make_product(name='Floor Lamp', description='Tall')
+
+    async def get(self, view, url, params=None, **kwargs):
+        await cache.aclear()
+        return await view(AsyncRequestFactory().get(url, params or {}), **kwargs)
+
+    def sync_get(self, url, params=None):
+        cache.clear()
+        return self.client.get(url, params or {})
+
+    async def test_list_matches(self):
+        url = reverse('product-list')
+        for params in ({}, {'search': 'lamp', 'page_size': 2}, {'pagination': 'cursor', 'fields': 'id,name'},
+                       {'fields': 'password'}):
+            expected = await sync_to_async(self.sync_get)(url, params)
+            response = await self.get(async_views.product_list, url, params)
+            self.assertEqual((response.status_code, response.content), (expected.status_code, expected.content))
+
+    async def test_detail_matches(self):
+        for pk, params in ((self.product.pk, {}), (self.product.pk, {'omit': 'description'}), (999999, {})):
+            url = reverse('product-detail', args=[pk])
+            expected = await sync_to_async(self.sync_get)(url, params)
+            response = await self.get(async_views.product_detail, url, params, pk=pk)
+            self.assertEqual((response.status_code, response.content), (expected.status_code, expected.content))
+
+    async def test_detail_is_cached(self):
+        url = reverse('product-detail', args=[self.product.pk])
+        await self.get(async_views.product_detail, url, pk=self.product.pk)
+        await Product.objects.filter(pk=self.product.pk).aupdate(name='Renamed')
+        response = await async_views.product_detail(AsyncRequestFactory().get(url), pk=self.product.pk)
+        self.assertEqual(json.loads(response.content)['name'], 'Floor Lamp')
+
+
+@override_settings(REST_FRAMEWORK={
+    **settings.REST_FRAMEWORK,
+    'DEFAULT_THROTTLE_RATES': {**settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], 'search': '2/min'},
+})
+class SearchThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        make_product(name='Desk Lamp')
+        self.client = APIClient()
+
+    def test_only_searches_are_limited(self):
+        url = reverse('product-list')
+        for _ in range(2):
+            self.assertEqual(self.client.get(url, {'search': 'lamp'}).status_code, 200)
+        response = self.client.get(url, {'search': 'desk'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    async def test_async_list_is_limited(self):
+        url = reverse('product-list')
+        statuses = []
+        for _ in range(3):
+            response = await async_views.product_list(AsyncRequestFactory().get(url, {'search': 'lamp'}))
+            statuses.append(response.status_code)
+        self.assertEqual(statuses, [200, 200, 429])
+        self.assertEqual(response['Retry-After'], '30')
+
+
+class ProductFacetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        make_product(name='Phone Case', category='Electronics', price=Decimal('15.00'))
+        make_product(name='Headphones', category='Electronics', price=Decimal('75.00'))
+        make_product(name='Television', category='Electronics', price=Decimal('650.00'))
+        make_product(name='Chef Knife', category='Kitchen', price=Decimal('50.00'))
+        make_product(name='Sold Out Pan', category='Kitchen', price=Decimal('30.00'), inventory_count=0)
+
+    def facets(self, **params):
+        response = self.client.get(reverse('product-facets'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def counts(self, data):
+        return (
+            {row['category']: row['count'] for row in data['categories']},
+            [row['count'] for row in data['price_ranges']],
+        )
+
+    def test_unfiltered_facets_come_from_the_precomputed_table(self):
+        with self.assertNumQueries(1):
+            data = self.facets()
+        self.assertEqual(data['total'], 4)
+        self.assertEqual(self.counts(data), ({'Electronics': 3, 'Kitchen': 1}, [1, 0, 2, 0, 1]))
+        self.assertEqual(data['price_ranges'][2], {'min_price': '50.00', 'max_price': '100.00', 'count': 2})
+        self.assertEqual(data, facets.adhoc_facets(Product.objects.filter(inventory_count__gt=0)))
+
+    def test_category_filter_uses_the_precomputed_table(self):
+        self.assertTrue(facets.is_precomputed({'category': 'kitchen'}))
+        self.assertEqual(self.counts(self.facets(category='kitchen')), ({'Kitchen': 1}, [0, 0, 1, 0, 0]))
+
+    def test_search_and_price_filters_are_computed_ad_hoc(self):
+        self.assertFalse(facets.is_precomputed({'search': 'phone'}))
+        data = self.facets(search='phone')
+        self.assertEqual(self.counts(data), ({'Electronics': 1}, [1, 0, 0, 0, 0]))
+        data = self.facets(min_price='50', max_price='100')
+        self.assertEqual(self.counts(data), ({'Electronics': 1, 'Kitchen': 1}, [0, 0, 2, 0, 0]))
+
+    def test_triggers_keep_the_table_current(self):
+        knife = Product.objects.get(name='Chef Knife')
+        knife.price = Decimal('250.00')
+        knife.save()
+        Product.objects.filter(name='Sold Out Pan').update(inventory_count=3)
+        Product.objects.filter(name='Phone Case').update(category='Accessories')
+        Product.objects.filter(name='Headphones').update(inventory_count=0)
+        Product.objects.filter(name='Television').delete()
+
+        self.assertEqual(
+            self.counts(facets.precomputed_facets()),
+            ({'Accessories': 1, 'Kitchen': 2}, [1, 1, 0, 0, 1])
+        )
+        self.assertEqual(
+            facets.precomputed_facets(),
+            facets.adhoc_facets(Product.objects.filter(inventory_count__gt=0))
+        )
+
+    def test_rebuild(self):
+        ProductFacet.objects.all().delete()
+        call_command('rebuild_product_facets', stdout=StringIO())
+        self.assertEqual(self.counts(facets.precomputed_facets())[0], {'Electronics': 3, 'Kitchen': 1})
+
+    def test_python_buckets_match_the_database(self):
+        for price in ('0.01', '24.99', '25.00', '99.99', '100.00', '200.00', '9999.00'):
+            product = make_product(price=Decimal(price), category='Bucket check')
+            bucket = ProductFacet.objects.get(category='Bucket check').price_bucket
+            self.assertEqual(facets.price_bucket(Decimal(price)), bucket, price)
+            product.delete()
+            ProductFacet.objects.filter(category='Bucket check').delete()
+
+
+FEED = """sku,name,description,price,inventory_count,image_url,category
+LAMP-1,Desk Lamp,A lamp,19.99,5,https://example.com/lamp.jpg,Home
+LAMP-2,Floor Lamp,A tall lamp,0.00,5,https://example.com/floor.jpg,Home
+CHAIR-1,Chair,A chair,49.00,3,not a url,Home
+,No Sku,Missing sku,10.00,1,https://example.com/x.jpg,Home
+RUG-1,Rug,A rug,89.50,2,https://example.com/rug.jpg,
+"""
+
+
+class ProductImportTests(TestCase):
+    def run_import(self, feed, format='csv', **kwargs):
+        errors = []
+        report = import_products(
+            read_rows(StringIO(feed), format),
+            on_error=lambda line, row, messages: errors.append((line, sorted(messages))),
+            **kwargs
+        )
+        return report, errors
+
+    def test_valid_rows_are_imported_and_bad_rows_reported(self):
+        report, errors = self.run_import(FEED)
+        self.assertEqual((report.rows, report.imported, report.errors), (5, 2, 3))
+        self.assertEqual(errors, [(3, ['price']), (4, ['image_url']), (5, ['sku'])])
+        rug = Product.objects.get(sku='RUG-1')
+        self.assertEqual(rug.price, Decimal('89.50'))
+        self.assertEqual(rug.category, 'General')
+        self.assertIsNotNone(rug.search_vector)
+
+    def test_existing_skus_are_updated_in_place(self):
+        lamp = make_product(sku='LAMP-1', name='Old Lamp', reserved_count=2)
+        self.run_import(FEED)
+        updated = Product.objects.get(sku='LAMP-1')
+        self.assertEqual(updated.id, lamp.id)
+        self.assertEqual((updated.name, updated.inventory_count), ('Desk Lamp', 5))
+        self.assertEqual(updated.reserved_count, 2)
+        self.assertEqual(updated.created_at, lamp.created_at)
+
+    def test_columns_missing_from_the_feed_keep_existing_values(self):
+        make_product(sku='LAMP-1', name='Old Lamp', inventory_count=7, category='Lighting')
+        feed = (
+            'sku,name,description,price,image_url,category\n'
+            'LAMP-1,Desk Lamp,A lamp,25.00,https://example.com/lamp.jpg,\n'
+        )
+        report, errors = self.run_import(feed)
+        self.assertEqual((report.imported, errors), (1, []))
+        lamp = Product.objects.get(sku='LAMP-1')
+        self.assertEqual((lamp.name, lamp.inventory_count, lamp.category), ('Desk Lamp', 7, 'Lighting'))
+
+    def test_partial_rows_update_existing_skus(self):
+        make_product(sku='LAMP-1', name='Old Lamp', inventory_count=7)
+        feed = 'sku,price\nLAMP-1,12.50\nNEW-1,3.00\n'
+        report, errors = self.run_import(feed)
+        self.assertEqual((report.imported, report.errors), (1, 1))
+        self.assertEqual(errors, [(3, ['description', 'image_url', 'name'])])
+        lamp = Product.objects.get(sku='LAMP-1')
+        self.assertEqual((lamp.name, lamp.price, lamp.inventory_count), ('Old Lamp', Decimal('12.50'), 7))
+        self.assertFalse(Product.objects.filter(sku='NEW-1').exists())
+
+    def test_jsonl_float_prices(self):
+        make_product(sku='LAMP-1')
+        feed = (
+            '{"sku": "MUG-1", "name": "Mug", "description": "A mug", "price": 19.99, '
+            '"inventory_count": 4, "image_url": "https://example.com/mug.jpg"}\n'
+            '{"sku": "LAMP-1", "price": 24.99}\n'
+        )
+        report, errors = self.run_import(feed, format='jsonl')
+        self.assertEqual((report.imported, errors), (2, []))
+        self.assertEqual(Product.objects.get(sku='MUG-1').price, Decimal('19.99'))
+        self.assertEqual(Product.objects.get(sku='LAMP-1').price, Decimal('24.99'))
+
+    def test_jsonl_and_repeated_skus(self):
+        feed = (
+            '{"sku": "MUG-1", "name": "Mug", "description": "A mug", "price": "8.00", '
+            '"inventory_count": 4, "image_url": "https://example.com/mug.jpg"}\n'
+            '\n'
+            '{"sku": "MUG-1", "name": "Big Mug", "description": "A mug", "price": 9.5, '
+            '"inventory_count": 4, "image_url": "https://example.com/mug.jpg"}\n'
+            '{not json}\n'
+        )
+        report, errors = self.run_import(feed, format='jsonl')
+        self.assertEqual((report.imported, report.errors), (1, 1))
+        self.assertEqual(errors, [(4, ['__all__'])])
+        mug = Product.objects.get(sku='MUG-1')
+        self.assertEqual((mug.name, mug.price), ('Big Mug', Decimal('9.50')))
+
+    def test_one_catalog_change_per_batch(self):
+        received = []
+        catalog_changed.connect(lambda **kwargs: received.append(1), weak=False, dispatch_uid='import-test')
+        self.addCleanup(catalog_changed.disconnect, dispatch_uid='import-test')
+        feed = 'sku,name,description,price,image_url\n' + ''.join(
+            f'SKU-{n},Item {n},Item,1.00,https://example.com/{n}.jpg\n' for n in range(5)
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            report, _ = self.run_import(feed, batch_size=2)
+        self.assertEqual(report.batches, 3)
+        self.assertEqual(len(received), 3)
+        self.assertEqual(Product.objects.filter(sku__startswith='SKU-').count(), 5)
+
+    def test_command(self):
+        path = self.tmp_feed(FEED)
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_products', path, stdout=stdout, stderr=stderr)
+        self.assertIn('Imported 2 of 5 row(s)', stdout.getvalue())
+        self.assertIn('Line 4 (CHAIR-1): image_url:', stderr.getvalue())
+        with self.assertRaisesMessage(CommandError, 'Stopped after 1 bad row(s)'):
+            call_command('import_products', path, max_errors=1, stdout=StringIO(), stderr=StringIO())
+
+    def tmp_feed(self, content):
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+
+class CartQueryCountTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='shopper', password='secret-pass-123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.products = [make_product(name=f'Item {i}', price=Decimal('2.50')) for i in range(5)]
+
+    def fill_cart(self, count):
+        for product in self.products[:count]:
+            CartItem.objects.create(user=self.user, product=product, quantity=2)
+
+    def test_cart_list_query_count_is_independent_of_size(self):
+        for size in (1, 5):
+            CartItem.objects.all().delete()
+            self.fill_cart(size)
+            with self.assertNumQueries(2):
+                response = self.client.get(reverse('cart-list'))
+            self.assertEqual(response.data['count'], size)
+            self.assertEqual(response.data['total'], Decimal('5.00') * size)
+            self.assertEqual(len(response.data['items']), size)
+
+    def test_cart_list_empty(self):
+        response = self.client.get(reverse('cart-list'))
+        self.assertEqual(response.data, {'items': [], 'total': 0, 'count': 0})
+
+    def test_add_to_cart_loads_product_once(self):
+        product = self.products[0]
+        # product, cart lookup, reservation (lock, read, count, upsert), insert,
+        # and two savepoints
+        with self.assertNumQueries(11):
+            response = self.client.post(
+                reverse('add-to-cart'), {'product_id': product.id, 'quantity': 2}, format='json'
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['product']['id'], product.id)
+
+        # the same, updating the cart line instead of inserting it
+        with self.assertNumQueries(11):
+            response = self.client.post(
+                reverse('add-to-cart'), {'product_id': product.id, 'quantity': 1}, format='json'
+            )
+        self.assertEqual(response.data['quantity'], 3)
+
+    def test_add_to_cart_with_an_idempotency_key_adds_once(self):
+        product = self.products[0]
+        for _ in range(2):
+            response = self.client.post(
+                reverse('add-to-cart'), {'product_id': product.id, 'quantity': 2}, format='json',
+                HTTP_IDEMPOTENCY_KEY='add-1',
+            )
+            self.assertEqual((response.status_code, response.data['quantity']), (201, 2))
+        self.assertEqual(response['Idempotent-Replayed'], 'true')
+        self.assertEqual(CartItem.objects.get(user=self.user).quantity, 2)
+        self.assertEqual(StockReservation.objects.get(user=self.user).quantity, 2)
+
+    def test_add_to_cart_rejects_unknown_and_out_of_stock_products(self):
+        response = self.client.post(reverse('add-to-cart'), {'product_id': 999999}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['product_id'], ['Product does not exist'])
+
+        sold_out = make_product(name='Sold out', inventory_count=0)
+        response = self.client.post(reverse('add-to-cart'), {'product_id': sold_out.id}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['product_id'], ['Product is out of stock'])
+
+    def test_update_cart_item_query_count(self):
+        self.fill_cart(1)
+        item = CartItem.objects.get()
+        with self.assertNumQueries(10):
+            response = self.client.put(
+                reverse('update-cart-item', args=[item.id]), {'quantity': 4}, format='json'
+            )
+        self.assertEqual(response.data['quantity'], 4)
+        self.assertEqual(response.data['total_price'], Decimal('10.00'))
+
+    def test_remove_from_cart(self):
+        self.fill_cart(1)
+        item = CartItem.objects.get()
+        with self.assertNumQueries(9):
+            response = self.client.delete(reverse('remove-from-cart', args=[item.id]))
+        self.assertEqual(response.status_code, 204)
+        response = self.client.delete(reverse('remove-from-cart', args=[item.id]))
+        self.assertEqual(response.status_code, 404)
+
+
+class CartBatchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='shopper', password='secret-pass-123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.mug = make_product(name='Mug', price=Decimal('8.00'), inventory_count=5)
+        self.lamp = make_product(name='Lamp', price=Decimal('20.00'), inventory_count=2)
+        self.pan = make_product(name='Pan', price=Decimal('30.00'), inventory_count=3)
+
+    def batch(self, operations, **extra):
+        return self.client.post(
+            reverse('batch-update-cart'), {'operations': operations, **extra}, format='json'
+        )
+
+    def cart(self):
+        return dict(CartItem.objects.filter(user=self.user).values_list('product__name', 'quantity'))
+
+    def held(self):
+        return dict(StockReservation.objects.filter(user=self.user).values_list('product__name', 'quantity'))
+
+    def test_applies_operations_in_order(self):
+        CartItem.objects.create(user=self.user, product=self.pan, quantity=1)
+        response = self.batch([
+            {'op': 'add', 'product_id': self.mug.id, 'quantity': 2},
+            {'op': 'add', 'product_id': self.mug.id},
+            {'op': 'set', 'product_id': self.lamp.id, 'quantity': 2},
+            {'op': 'remove', 'product_id': self.pan.id},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([line['status'] for line in response.data['results']], ['ok'] * 4)
+        self.assertEqual(self.cart(), {'Mug': 3, 'Lamp': 2})
+        self.assertEqual(self.held(), {'Mug': 3, 'Lamp': 2})
+        self.assertEqual(response.data['cart']['count'], 2)
+        self.assertEqual(response.data['cart']['total'], Decimal('64.00'))
+
+    def test_query_count_is_independent_of_batch_size(self):
+        for products in ([self.mug], [self.mug, self.lamp, self.pan]):
+            CartItem.objects.all().delete()
+            # products, cart, reservation (read, count, upsert), cart upsert,
+            # cart payload (2) and two savepoints
+            with self.assertNumQueries(12):
+                response = self.batch([
+                    {'op': 'set', 'product_id': product.id, 'quantity': 1} for product in products
+                ])
+            self.assertEqual(response.data['cart']['count'], len(products))
+
+    def test_bad_lines_are_reported_and_the_rest_applied(self):
+        sold_out = make_product(name='Sold out', inventory_count=0)
+        response = self.batch([
+            {'op': 'add', 'product_id': self.mug.id},
+            {'op': 'add', 'product_id': 999999},
+            {'op': 'set', 'product_id': self.lamp.id, 'quantity': 5},
+            {'op': 'add', 'product_id': sold_out.id},
+            {'op': 'frobnicate', 'product_id': self.pan.id},
+        ])
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        self.assertEqual(results[0], {'index': 0, 'status': 'ok'})
+        self.assertEqual(results[1]['error'], 'Product does not exist')
+        self.assertEqual(results[2], {'index': 2, 'status': 'error', 'error': 'Not enough inventory', 'available': 2})
+        self.assertEqual(results[3]['error'], 'Product is out of stock')
+        self.assertEqual(results[4]['error'], 'Invalid operation')
+        self.assertIn('op', results[4]['details'])
+        self.assertEqual(self.cart(), {'Mug': 1})
+        self.assertEqual(self.held(), {'Mug': 1})
+
+    def test_atomic_batches_are_all_or_nothing(self):
+        operations = [
+            {'op': 'add', 'product_id': self.mug.id},
+            {'op': 'set', 'product_id': self.lamp.id, 'quantity': 5},
+        ]
+        response = self.batch(operations, atomic=True)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'No operations were applied')
+        self.assertEqual(response.data['results'][0]['status'], 'ok')
+        self.assertEqual(self.cart(), {})
+        self.assertEqual(self.held(), {})
+        self.mug.refresh_from_db()
+        self.assertEqual(self.mug.reserved_count, 0)
+
+        operations[1]['quantity'] = 2
+        self.assertEqual(self.batch(operations, atomic=True).status_code, 200)
+        self.assertEqual(self.cart(), {'Mug': 1, 'Lamp': 2})
+
+    def test_rejects_malformed_batches(self):
+        self.assertEqual(self.batch([]).status_code, 400)
+        response = self.batch([{'op': 'add', 'product_id': self.mug.id}] * 101)
+        self.assertEqual(response.status_code, 400)
+
+
+class StockReservationTests(TestCase):
+    def setUp(self):
+        self.product = make_product(name='Limited Edition', inventory_count=5)
+        self.alice = self.client_for('alice')
+        self.bob = self.client_for('bob')
+
+    def client_for(self, username):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username=username))
+        return client
+
+    def add(self, client, quantity):
+        return client.post(
+            reverse('add-to-cart'), {'product_id': self.product.id, 'quantity': quantity}, format='json'
+        )
+
+    def reserved(self):
+        self.product.refresh_from_db()
+        return self.product.reserved_count
+
+    def test_cart_holds_stock_from_other_shoppers(self):
+        self.assertEqual(self.add(self.alice, 3).status_code, 201)
+        self.assertEqual(self.reserved(), 3)
+        self.assertEqual(self.product.available_count, 2)
+
+        response = self.add(self.bob, 3)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'error': 'Not enough inventory', 'available': 2})
+        self.assertEqual(self.add(self.bob, 2).status_code, 201)
+        self.assertEqual(self.reserved(), 5)
+
+    def test_updates_and_removals_adjust_the_hold(self):
+        item_id = self.add(self.alice, 3).data['id']
+        self.alice.put(reverse('update-cart-item', args=[item_id]), {'quantity': 5}, format='json')
+        self.assertEqual(self.reserved(), 5)
+        self.alice.put(reverse('update-cart-item', args=[item_id]), {'quantity': 1}, format='json')
+        self.assertEqual(self.reserved(), 1)
+        self.alice.delete(reverse('remove-from-cart', args=[item_id]))
+        self.assertEqual(self.reserved(), 0)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_sweeper_releases_expired_holds(self):
+        self.add(self.alice, 2)
+        self.add(self.bob, 1)
+        StockReservation.objects.filter(user__username='alice').update(expires_at=timezone.now())
+
+        call_command('release_expired_reservations', stdout=StringIO())
+        self.assertEqual(self.reserved(), 1)
+        self.assertEqual(list(StockReservation.objects.values_list('user__username', flat=True)), ['bob'])
+
+    def test_catalog_is_only_invalidated_when_availability_flips(self):
+        received = []
+        catalog_changed.connect(lambda **kwargs: received.append(1), weak=False, dispatch_uid='hold-test')
+        self.addCleanup(catalog_changed.disconnect, dispatch_uid='hold-test')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add(self.alice, 3)
+            self.add(self.bob, 1)
+        self.assertEqual(received, [])
+        # The last unit
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.add(self.bob, 1).status_code, 201)
+        self.assertEqual(len(received), 1)
+
+        StockReservation.objects.filter(user__username='bob').update(expires_at=timezone.now())
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('release_expired_reservations', stdout=StringIO())
+        self.assertEqual(len(received), 2)
+
+    def test_full_saves_leave_reserved_count_alone(self):
+        stale = Product.objects.get(id=self.product.id)
+        self.add(self.alice, 3)
+        stale.price = Decimal('12.00')
+        stale.save()
+        self.assertEqual(self.reserved(), 3)
+        self.assertEqual(self.product.price, Decimal('12.00'))
+
+
+class StoreAdminTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'secret-pass-123')
+        self.client.force_login(self.admin)
+
+    def changelist(self, name, **params):
+        response = self.client.get(reverse(f'admin:store_{name}_changelist'), params)
+        self.assertEqual(response.status_code, 200)
+        return list(response.context['cl'].result_list)
+
+    def test_product_search_uses_sku_and_full_text(self):
+        make_product(name='Desk Lamp', sku='LMP-001')
+        make_product(name='Rug', description='Goes well with a lamp')
+        make_product(name='Chair')
+        self.assertEqual(sorted(p.name for p in self.changelist('product', q='lamp')), ['Desk Lamp', 'Rug'])
+        self.assertEqual([p.name for p in self.changelist('product', q='LMP-001')], ['Desk Lamp'])
+
+    def test_cart_item_changelist_loads_users_and_products_up_front(self):
+        def fill(count):
+            for n in range(count):
+                user = User.objects.create_user(f'shopper{User.objects.count()}')
+                CartItem.objects.create(user=user, product=make_product(name=f'Item {n}'), quantity=1)
+
+        fill(1)
+        with CaptureQueriesContext(connection) as small:
+            self.changelist('cartitem')
+        fill(5)
+        with CaptureQueriesContext(connection) as large:
+            self.assertEqual(len(self.changelist('cartitem')), 6)
+        self.assertEqual(len(small), len(large))
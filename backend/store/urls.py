@@ -1,7 +1,16 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+if settings.ASYNC_VIEWS:
+    product_list = async_views.product_list
+    product_detail = async_views.product_detail
+else:
+    product_list = views.ProductListView.as_view()
+    product_detail = views.ProductDetailView.as_view()
 
 urlpatterns = [
-    path('', views.ProductListView.as_view(), name='product-list'),
-    path('<int:pk>/', views.ProductDetailView.as_view(), name='product-detail'),
-]
\ No newline at end of file
+    path('', product_list, name='product-list'),
+    path('facets/', views.product_facets, name='product-facets'),
+    path('<int:pk>/', product_detail, name='product-detail'),
+]
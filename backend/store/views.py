@@ -2,103 +2,196 @@ from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Sum
 from django.shortcuts import get_object_or_404
-from django.db.models import Q
+from core.idempotency import idempotent
+from core.pagination import relink
+from core.replicas import ReplicaReadsMixin, replica_reads
+from core.rows import RowSerializer
+from core.throttling import UserBucketThrottle
+from . import cache as catalog_cache
+from . import facets
+from .inventory import set_reservations
 from .models import Product, CartItem
-from .serializers import ProductSerializer, CartItemSerializer
+from .search import search_products
+from .cart import apply_cart_operations
+from .serializers import (
+    CART_ITEM_COMPUTED, PRODUCT_COMPUTED, PRODUCT_SUMMARY_FIELDS, ProductSerializer,
+    CartItemSerializer, CartOperationSerializer, CartBatchSerializer, product_columns, select_fields
+)
 
-class ProductListView(generics.ListAPIView):
+def filter_products(query_params):
+    """In-stock products matching the storefront's search and filter params"""
+    queryset = Product.objects.filter(inventory_count__gt=0)
+    
+    # Search functionality
+    search = query_params.get('search')
+    if search:
+        queryset = search_products(queryset, search)
+    
+    # Category filter
+    category = query_params.get('category')
+    if category:
+        queryset = queryset.filter(category__icontains=category)
+    
+    # Price range filter
+    min_price = query_params.get('min_price')
+    max_price = query_params.get('max_price')
+    if min_price:
+        queryset = queryset.filter(price__gte=min_price)
+    if max_price:
+        queryset = queryset.filter(price__lte=max_price)
+    
+    return queryset
+
+class SparseFieldsMixin:
+    """Serve the ProductSerializer fields picked by ?fields= and ?omit=, loading only their columns"""
+    default_fields = ProductSerializer.Meta.fields
+
+    def selected_fields(self):
+        if not hasattr(self, '_selected_fields'):
+            self._selected_fields = select_fields(
+                self.request.query_params, ProductSerializer.Meta.fields, self.default_fields
+            )
+        return self._selected_fields
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs['fields'] = self.selected_fields()
+        return super().get_serializer(*args, **kwargs)
+
+class SearchThrottle(UserBucketThrottle):
+    """Full-text search is the catalog's most expensive query, so it has its own limit"""
+    scope = 'search'
+
+    def get_cache_key(self, request, view):
+        if not request.query_params.get('search'):
+            return None
+        return super().get_cache_key(request, view)
+
+class ProductListView(ReplicaReadsMixin, SparseFieldsMixin, generics.ListAPIView):
     serializer_class = ProductSerializer
     permission_classes = []
+    throttle_classes = [*generics.ListAPIView.throttle_classes, SearchThrottle]
+    default_fields = PRODUCT_SUMMARY_FIELDS
+
+    def row_serializer(self):
+        if not hasattr(self, '_row_serializer'):
+            self._row_serializer = RowSerializer(self.get_serializer(), PRODUCT_COMPUTED)
+        return self._row_serializer
 
     def get_queryset(self):
-        queryset = Product.objects.filter(inventory_count__gt=0)
-        
-        # Search functionality
-        search = self.request.query_params.get('search')
-        if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) | Q(description__icontains=search)
-            )
-        
-        # Category filter
-        category = self.request.query_params.get('category')
-        if category:
-            queryset = queryset.filter(category__icontains=category)
-        
-        # Price range filter
-        min_price = self.request.query_params.get('min_price')
-        max_price = self.request.query_params.get('max_price')
-        if min_price:
-            queryset = queryset.filter(price__gte=min_price)
-        if max_price:
-            queryset = queryset.filter(price__lte=max_price)
-        
-        return queryset
+        queryset = filter_products(self.request.query_params)
+        # Keyset cursors read the ordering columns off the boundary rows
+        columns = self.row_serializer().columns + ['created_at']
+        if 'search_rank' in queryset.query.annotations:
+            columns.append('search_rank')
+        return queryset.values(*dict.fromkeys(columns))
+
+    def cache_key(self):
+        return 'list:' + catalog_cache.normalize_params(self.request.query_params)
 
-class ProductDetailView(generics.RetrieveAPIView):
-    queryset = Product.objects.all()
+    def list(self, request, *args, **kwargs):
+        # The cached page's links may come from another request's URL
+        return Response(relink(catalog_cache.cached_payload(self.cache_key(), self.build_page), request))
+
+    def build_page(self):
+        page = self.paginate_queryset(self.get_queryset())
+        return self.get_paginated_response(self.row_serializer().serialize(page)).data
+
+class ProductDetailView(ReplicaReadsMixin, SparseFieldsMixin, generics.RetrieveAPIView):
     serializer_class = ProductSerializer
     permission_classes = []
 
+    def get_queryset(self):
+        return Product.objects.only(*product_columns(self.selected_fields()))
+
+    def cache_key(self):
+        return f"detail:{self.kwargs['pk']}:{catalog_cache.normalize_params(self.request.query_params)}"
+
+    def retrieve(self, request, *args, **kwargs):
+        data = catalog_cache.cached_payload(
+            self.cache_key(),
+            lambda: super(ProductDetailView, self).retrieve(request, *args, **kwargs).data
+        )
+        return Response(data)
+
+@api_view(['GET'])
+@permission_classes([])
+def product_facets(request):
+    """Category and price-range counts for the current search and filters"""
+    params = request.query_params
+    key = 'facets:' + catalog_cache.normalize_params(params)
+    
+    def build():
+        if facets.is_precomputed(params):
+            return facets.precomputed_facets(params.get('category'))
+        return facets.adhoc_facets(filter_products(params))
+    
+    with replica_reads(request):
+        return Response(catalog_cache.cached_payload(key, build))
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def cart_list(request):
-    cart_items = CartItem.objects.filter(user=request.user)
-    serializer = CartItemSerializer(cart_items, many=True)
-    total = sum(item.total_price for item in cart_items)
-    return Response({
-        'items': serializer.data,
-        'total': total,
-        'count': cart_items.count()
-    })
+    return Response(cart_payload(request.user))
+
+def cart_payload(user):
+    cart_items = CartItem.objects.filter(user_id=user.id)
+    rows = RowSerializer(CartItemSerializer(), CART_ITEM_COMPUTED)
+    totals = cart_items.aggregate(
+        total=Sum(
+            F('quantity') * F('product__price'),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ),
+        count=Count('id'),
+    )
+    return {
+        'items': rows.serialize(cart_items.values(*rows.columns)),
+        'total': totals['total'] or 0,
+        'count': totals['count']
+    }
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent('add-to-cart')
 def add_to_cart(request):
     serializer = CartItemSerializer(data=request.data)
     if serializer.is_valid():
-        product_id = serializer.validated_data['product_id']
-        quantity = serializer.validated_data['quantity']
+        product = serializer.validated_data['product']
+        quantity = serializer.validated_data.get('quantity', 1)
         
-        try:
-            product = Product.objects.get(id=product_id)
-            if product.inventory_count < quantity:
-                return Response(
-                    {'error': 'Not enough inventory'}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            cart_item, created = CartItem.objects.get_or_create(
-                user=request.user,
-                product=product,
-                defaults={'quantity': quantity}
-            )
-            
-            if not created:
-                cart_item.quantity += quantity
-                if cart_item.quantity > product.inventory_count:
-                    return Response(
-                        {'error': 'Not enough inventory'}, 
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                cart_item.save()
+        with transaction.atomic():
+            cart_item = CartItem.objects.filter(user_id=request.user.id, product=product).first()
+            if cart_item is not None:
+                quantity += cart_item.quantity
             
-            response_serializer = CartItemSerializer(cart_item)
-            return Response(response_serializer.data, status=status.HTTP_201_CREATED)
+            # Hold the stock for this cart before writing it
+            shortages = set_reservations(request.user, {product.id: quantity})
+            if shortages:
+                return not_enough_inventory(shortages)
             
-        except Product.DoesNotExist:
-            return Response(
-                {'error': 'Product not found'}, 
-                status=status.HTTP_404_NOT_FOUND
-            )
+            if cart_item is None:
+                cart_item = CartItem.objects.create(
+                    user_id=request.user.id, product=product, quantity=quantity
+                )
+            else:
+                cart_item.quantity = quantity
+                cart_item.save(update_fields=['quantity', 'updated_at'])
+        # Reuse the validated product instead of lazily loading it again
+        cart_item.product = product
+        
+        response_serializer = CartItemSerializer(cart_item)
+        return Response(response_serializer.data, status=status.HTTP_201_CREATED)
     
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['PUT'])
 @permission_classes([IsAuthenticated])
 def update_cart_item(request, item_id):
-    cart_item = get_object_or_404(CartItem, id=item_id, user=request.user)
+    cart_item = get_object_or_404(
+        CartItem.objects.select_related('product'), id=item_id, user_id=request.user.id
+    )
     
     quantity = request.data.get('quantity')
     if not quantity or quantity <= 0:
@@ -107,14 +200,13 @@ def update_cart_item(request, item_id):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    if cart_item.product.inventory_count < quantity:
-        return Response(
-            {'error': 'Not enough inventory'}, 
-            status=status.HTTP_400_BAD_REQUEST
-        )
-    
-    cart_item.quantity = quantity
-    cart_item.save()
+    with transaction.atomic():
+        shortages = set_reservations(request.user, {cart_item.product_id: quantity})
+        if shortages:
+            return not_enough_inventory(shortages)
+        
+        cart_item.quantity = quantity
+        cart_item.save(update_fields=['quantity', 'updated_at'])
     
     serializer = CartItemSerializer(cart_item)
     return Response(serializer.data)
@@ -122,6 +214,55 @@ def update_cart_item(request, item_id):
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated])
 def remove_from_cart(request, item_id):
-    cart_item = get_object_or_404(CartItem, id=item_id, user=request.user)
-    cart_item.delete()
-    return Response(status=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
+    cart_item = get_object_or_404(
+        CartItem.objects.only('id', 'product_id'), id=item_id, user_id=request.user.id
+    )
+    with transaction.atomic():
+        cart_item.delete()
+        set_reservations(request.user, {cart_item.product_id: 0})
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@idempotent('batch-update-cart')
+def batch_update_cart(request):
+    """Apply a list of add/set/remove operations and return the cart"""
+    serializer = CartBatchSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    atomic = serializer.validated_data['atomic']
+    
+    # Validate the lines' shape; anything invalid is reported per line
+    errors = {}
+    operations = {}
+    for index, data in enumerate(serializer.validated_data['operations']):
+        line = CartOperationSerializer(data=data)
+        if line.is_valid():
+            operations[index] = line.validated_data
+        else:
+            errors[index] = {'error': 'Invalid operation', 'details': line.errors}
+    
+    if operations and not (errors and atomic):
+        indexes = list(operations)
+        line_errors = apply_cart_operations(
+            request.user, list(operations.values()), atomic=atomic
+        )
+        errors.update({indexes[position]: error for position, error in line_errors.items()})
+    
+    results = [
+        {'index': index, 'status': 'error', **errors[index]} if index in errors
+        else {'index': index, 'status': 'ok'}
+        for index in range(len(serializer.validated_data['operations']))
+    ]
+    if errors and atomic:
+        return Response(
+            {'error': 'No operations were applied', 'results': results},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return Response({'results': results, 'cart': cart_payload(request.user)})
+
+def not_enough_inventory(shortages):
+    return Response(
+        {'error': 'Not enough inventory', 'available': shortages[0]['available']}, 
+        status=status.HTTP_400_BAD_REQUEST
+    )
@@ -2,12 +2,26 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from core.admin import EstimatedCountPaginator
 from store.models import CartItem
-from orders.models import Order
+from orders.models import OrderHistory
 
 # Unregister the default User admin
 admin.site.unregister(User)
 
+def count_for_user(queryset):
+    """Correlated COUNT(*) of ``queryset`` rows belonging to the outer user"""
+    return Coalesce(
+        Subquery(
+            queryset.filter(user=OuterRef('pk')).order_by().values('user')
+            .annotate(count=Count('*')).values('count'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
 @admin.register(User)
 class EnhancedUserAdmin(BaseUserAdmin):
     list_display = [
@@ -18,13 +32,27 @@ class EnhancedUserAdmin(BaseUserAdmin):
     list_filter = [
         'is_staff', 'is_superuser', 'is_active', 'date_joined', 'last_login'
     ]
-    search_fields = ['username', 'email', 'first_name', 'last_name']
+    # Prefix and exact matches, served by the UPPER() indexes in
+    # users/migrations/0001; a leading-wildcard ILIKE would scan the table
+    search_fields = ['^username', '=email', '^first_name', '^last_name']
     ordering = ['-date_joined']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    
+    def get_queryset(self, request):
+        # Postgres evaluates the subqueries only for the rows on the page.
+        # Archived orders count too.
+        return super().get_queryset(request).annotate(
+            order_total=count_for_user(OrderHistory.objects.all()),
+            cart_item_total=count_for_user(CartItem.objects.all()),
+        )
     
     def total_orders(self, obj):
-        return Order.objects.filter(user=obj).count()
+        return obj.order_total
     total_orders.short_description = "Total Orders"
+    total_orders.admin_order_field = 'order_total'
     
     def cart_items_count(self, obj):
-        return CartItem.objects.filter(user=obj).count()
-    cart_items_count.short_description = "Cart Items"
\ No newline at end of file
+        return obj.cart_item_total
+    cart_items_count.short_description = "Cart Items"
+    cart_items_count.admin_order_field = 'cart_item_total'
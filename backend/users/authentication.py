@@ -0,0 +1,101 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, TokenError
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+# User fields copied into every access token
+PROFILE_CLAIMS = ['username', 'email', 'first_name', 'last_name', 'is_staff', 'is_superuser']
+
+
+def user_cache_key(user_id):
+    return f'user:{user_id}'
+
+
+def get_cached_user(user_id):
+    """The User with this id (None if there is none), cached for USER_CACHE_TIMEOUT seconds"""
+    key = user_cache_key(user_id)
+    user = cache.get(key)
+    if user is None:
+        user = User.objects.filter(pk=user_id).first()
+        if user is not None:
+            cache.set(key, user, settings.USER_CACHE_TIMEOUT)
+    return user
+
+
+class ClaimsUser(TokenUser):
+    """
+    A user read from access token claims, without a database query.
+    get_user() returns the full (cached) User for code that needs the model.
+    """
+
+    @cached_property
+    def email(self):
+        return self.token.get('email', '')
+
+    @cached_property
+    def first_name(self):
+        return self.token.get('first_name', '')
+
+    @cached_property
+    def last_name(self):
+        return self.token.get('last_name', '')
+
+    def get_user(self):
+        return get_cached_user(self.id)
+
+
+class ClaimsRefreshToken(RefreshToken):
+    @property
+    def access_token(self):
+        """
+        An access token carrying the user's current profile claims. Issuing
+        one (at login and on every refresh) re-reads the user, so deactivated
+        users can't refresh and profile changes reach the next access token.
+        """
+        access = super().access_token
+        user = get_cached_user(self[api_settings.USER_ID_CLAIM])
+        if user is None or not user.is_active:
+            raise TokenError('User not found or inactive')
+        for claim in PROFILE_CLAIMS:
+            access[claim] = getattr(user, claim)
+        return access
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = ClaimsRefreshToken
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = ClaimsRefreshToken
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication without the per-request User query. Tokens carrying
+    profile claims authenticate as a ClaimsUser; tokens issued before the
+    claims existed are checked against the database as before. With
+    CHECK_REVOKE_TOKEN on, every token is checked against the cached User.
+    """
+
+    def get_user(self, validated_token):
+        if 'username' not in validated_token:
+            return super().get_user(validated_token)
+        if api_settings.CHECK_REVOKE_TOKEN:
+            self.check_revoked(validated_token)
+        return api_settings.TOKEN_USER_CLASS(validated_token)
+
+    def check_revoked(self, validated_token):
+        user = get_cached_user(validated_token[api_settings.USER_ID_CLAIM])
+        if user is None:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+        if not user.is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed("The user's password has been changed.", code='password_changed')
@@ -0,0 +1,26 @@
+from django.db import migrations
+
+# Expression indexes matching the SQL Django emits for the user admin's
+# case-insensitive searches: UPPER(col::text) LIKE UPPER('term%') for ^field
+# and UPPER(col::text) = UPPER('term') for =field.
+INDEXES = [
+    ('users_auth_user_username_upper', 'UPPER(username::text) text_pattern_ops'),
+    ('users_auth_user_email_upper', 'UPPER(email::text)'),
+    ('users_auth_user_first_name_upper', 'UPPER(first_name::text) text_pattern_ops'),
+    ('users_auth_user_last_name_upper', 'UPPER(last_name::text) text_pattern_ops'),
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            f'CREATE INDEX IF NOT EXISTS {name} ON auth_user ({expression})',
+            f'DROP INDEX IF EXISTS {name}',
+        )
+        for name, expression in INDEXES
+    ]
@@ -0,0 +1,13 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .authentication import user_cache_key
+
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, **kwargs):
+    # After commit, so a concurrent request can't cache the old row again
+    key = user_cache_key(instance.pk)
+    transaction.on_commit(lambda: cache.delete(key))
@@ -1,3 +1,179 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from orders.models import Order
+from store.models import CartItem, Product
+from .authentication import ClaimsJWTAuthentication, get_cached_user
+
+
+class UserAdminTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'secret-pass-123')
+        self.client.force_login(self.admin)
+        self.product = Product.objects.create(
+            name='Lamp', description='A lamp', price=Decimal('10.00'),
+            inventory_count=50, image_url='https://example.com/lamp.jpg',
+        )
+
+    def add_shoppers(self, count):
+        for n in range(count):
+            user = User.objects.create_user(f'shopper{User.objects.count()}', f'shopper{n}@example.com')
+            for _ in range(2):
+                Order.objects.create(user=user, total_amount=Decimal('10.00'), shipping_address='x')
+            CartItem.objects.create(user=user, product=self.product, quantity=1)
+
+    def changelist(self, **params):
+        response = self.client.get(reverse('admin:auth_user_changelist'), params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_counts_are_annotated_not_queried_per_row(self):
+        self.add_shoppers(2)
+        with CaptureQueriesContext(connection) as small:
+            self.changelist()
+        self.add_shoppers(6)
+        with CaptureQueriesContext(connection) as large:
+            response = self.changelist()
+        self.assertEqual(len(small), len(large))
+
+        rows = {user.username: user for user in response.context['cl'].result_list}
+        self.assertEqual((rows['shopper1'].order_total, rows['shopper1'].cart_item_total), (2, 1))
+        self.assertEqual((rows['admin'].order_total, rows['admin'].cart_item_total), (0, 0))
+
+    def test_sorts_by_order_count(self):
+        self.add_shoppers(1)
+        response = self.changelist(o='9')  # total_orders column
+        self.assertEqual(response.context['cl'].result_list[0].username, 'admin')
+
+    def test_search_uses_prefix_and_exact_matches(self):
+        self.add_shoppers(2)
+        names = lambda response: sorted(user.username for user in response.context['cl'].result_list)
+        self.assertEqual(names(self.changelist(q='SHOPPER')), ['shopper1', 'shopper2'])
+        self.assertEqual(names(self.changelist(q='Shopper0@example.com')), ['shopper1'])
+        # Not a prefix of any username, nor a whole email
+        self.assertEqual(names(self.changelist(q='hopper')), [])
+
+
+class ClaimsAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            'shopper', 'shopper@example.com', 'secret-pass-123', first_name='Ada', last_name='L'
+        )
+        self.client = APIClient()
+
+    def login(self):
+        response = self.client.post(
+            reverse('token_obtain_pair'), {'username': 'shopper', 'password': 'secret-pass-123'}
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def authenticate(self, access):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+
+    def test_profile_is_served_from_the_token(self):
+        self.authenticate(self.login()['access'])
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('user-profile'))
+        self.assertEqual(response.data, {
+            'id': self.user.id, 'username': 'shopper', 'email': 'shopper@example.com',
+            'first_name': 'Ada', 'last_name': 'L',
+        })
+
+    def test_cart_skips_the_user_query(self):
+        self.authenticate(self.login()['access'])
+        with self.assertNumQueries(2):
+            self.client.get(reverse('cart-list'))
+        # Tokens without claims still load the user
+        self.authenticate(AccessToken.for_user(self.user))
+        with self.assertNumQueries(3):
+            self.client.get(reverse('cart-list'))
+
+    def test_staff_claim_grants_admin_endpoints(self):
+        self.authenticate(self.login()['access'])
+        self.assertEqual(self.client.get(reverse('daily-sales')).status_code, 403)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_staff = True
+            self.user.save()
+        self.authenticate(self.login()['access'])
+        self.assertEqual(self.client.get(reverse('daily-sales')).status_code, 200)
+
+    def test_refresh_reissues_claims_and_rejects_inactive_users(self):
+        refresh = self.login()['refresh']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = 'Grace'
+            self.user.save()
+        response = self.client.post(reverse('token_refresh'), {'refresh': refresh})
+        self.assertEqual(AccessToken(response.data['access'])['first_name'], 'Grace')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        response = self.client.post(reverse('token_refresh'), {'refresh': response.data['refresh']})
+        self.assertEqual(response.status_code, 401)
+
+    def test_user_cache_is_cleared_on_save(self):
+        self.assertEqual(get_cached_user(self.user.id).email, 'shopper@example.com')
+        with self.assertNumQueries(0):
+            get_cached_user(self.user.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.email = 'new@example.com'
+            self.user.save()
+        self.assertEqual(get_cached_user(self.user.id).email, 'new@example.com')
+
+    def test_revocation_check_uses_the_cached_user(self):
+        token = AccessToken.for_user(self.user)
+        token['hash_password'] = get_md5_hash_password(self.user.password)
+        get_cached_user(self.user.id)
+        with self.assertNumQueries(0):
+            ClaimsJWTAuthentication().check_revoked(token)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password('another-pass-456')
+            self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            ClaimsJWTAuthentication().check_revoked(token)
+
+
+class AuthThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_registration_is_limited_per_client(self):
+        rates = {**settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], 'register': '2/hour'}
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates}):
+            for n in range(2):
+                response = self.client.post(reverse('register'), {
+                    'username': f'new{n}', 'email': f'new{n}@example.com', 'password': 'secret-pass-123',
+                })
+                self.assertEqual(response.status_code, 201)
+            response = self.client.post(reverse('register'), {
+                'username': 'new2', 'email': 'new2@example.com', 'password': 'secret-pass-123',
+            })
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual(response['Retry-After'], '1800')
+            # Another address has its own bucket
+            response = self.client.post(reverse('register'), {
+                'username': 'new2', 'email': 'new2@example.com', 'password': 'secret-pass-123',
+            }, REMOTE_ADDR='10.0.0.2')
+            self.assertEqual(response.status_code, 201)
+
+    def test_login_is_limited(self):
+        User.objects.create_user('shopper', 'shopper@example.com', 'secret-pass-123')
+        rates = {**settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], 'login': '1/min'}
+        credentials = {'username': 'shopper', 'password': 'wrong'}
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates}):
+            self.assertEqual(self.client.post(reverse('token_obtain_pair'), credentials).status_code, 401)
+            self.assertEqual(self.client.post(reverse('token_obtain_pair'), credentials).status_code, 429)
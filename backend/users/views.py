@@ -1,11 +1,20 @@
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from django.contrib.auth.models import User
+from core.throttling import AnonBucketThrottle, UserBucketThrottle
+
+# Both hash a password, which is deliberately slow
+class LoginThrottle(UserBucketThrottle):
+    scope = 'login'
+
+class RegisterThrottle(UserBucketThrottle):
+    scope = 'register'
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([AnonBucketThrottle, RegisterThrottle])
 def register(request):
     data = request.data
     
@@ -1,4 +1,4 @@
-import React from 'react';
+import React, { useState } from 'react';
 import { Link } from 'react-router-dom';
 import { useCart } from '../contexts/CartContext';
 import { useAuth } from '../contexts/AuthContext';
@@ -7,6 +7,7 @@ import './Cart.css';
 const Cart = () => {
   const { cartItems, cartTotal, updateCartItem, removeFromCart, loading } = useCart();
   const { user } = useAuth();
+  const [error, setError] = useState('');
 
   if (!user) {
     return (
@@ -34,7 +35,9 @@ const Cart = () => {
 
   const handleQuantityChange = async (itemId, newQuantity) => {
     if (newQuantity < 1) return;
-    await updateCartItem(itemId, newQuantity);
+    // Stock limits are enforced by the API; the cart only carries in-stock status
+    const result = await updateCartItem(itemId, newQuantity);
+    setError(result.success ? '' : result.error);
   };
 
   const handleRemoveItem = async (itemId) => {
@@ -44,6 +47,7 @@ const Cart = () => {
   return (
     <div className="cart-container">
       <h2>Shopping Cart</h2>
+      {error && <div className="error-message">{error}</div>}
       
       <div className="cart-items">
         {cartItems.map((item) => (
@@ -72,7 +76,7 @@ const Cart = () => {
                 <button
                   onClick={() => handleQuantityChange(item.id, item.quantity + 1)}
                   className="quantity-button"
-                  disabled={item.quantity >= item.product.inventory_count}
+                  disabled={!item.product.is_in_stock}
                 >
                   +
                 </button>
@@ -65,6 +65,7 @@ const ProductGrid = () => {
             setLoading(true);
             const params = new URLSearchParams({
                 page: currentPage,
+                fields: 'id,name,price,image_url,category,inventory_count,is_in_stock',
                 ...(debouncedSearchTerm && { search: debouncedSearchTerm }),
                 ...(categoryFilter && { category: categoryFilter }),
                 ...(debouncedMinPrice && { min_price: debouncedMinPrice }),